@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+class AlarmEventLog:
+    """Fixed-size ring buffer of alarm on/off events.
+
+    Events get consecutive ids, so event `i` lives in slot `i % capacity`
+    for as long as it is retained; lookups by id are O(1). Timestamps are
+    appended in order, which makes time-range bounds a binary search over
+    ids. A per-reason id index answers reason filters without scanning
+    unrelated events. Appending never copies the buffer.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self._capacity = max(1, int(capacity))
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * self._capacity
+        self._by_reason: Dict[str, deque] = {}
+        self._first_id = 1
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._last_id
+
+    def append(self, event: str, reason: str, ts: Optional[float] = None) -> Dict[str, Any]:
+        with self._lock:
+            self._last_id += 1
+            eid = self._last_id
+            entry = {"id": eid, "ts": time.time() if ts is None else float(ts), "event": event, "reason": reason}
+            self._slots[eid % self._capacity] = entry
+            if eid - self._first_id >= self._capacity:
+                self._first_id = eid - self._capacity + 1
+
+            ids = self._by_reason.setdefault(reason, deque())
+            ids.append(eid)
+            # Drop index entries that fell out of the ring (other reasons are
+            # bounded the same way and filtered by id range at query time)
+            while ids[0] < self._first_id:
+                ids.popleft()
+            return entry
+
+    def _get(self, eid: int) -> Dict[str, Any]:
+        return self._slots[eid % self._capacity]  # type: ignore[return-value]
+
+    def _bisect_ts(self, ts: float, right: bool = False) -> int:
+        """First retained id with event ts >= ts (or > ts when right=True)."""
+        lo, hi = self._first_id, self._last_id + 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_ts = self._get(mid)["ts"]
+            if mid_ts < ts or (right and mid_ts == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(
+        self,
+        *,
+        limit: int = 50,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        reason: Optional[str] = None,
+        event: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Filtered page of events.
+
+        Default order is newest first, continued with `before=<next_cursor>`.
+        With `after=<id>` the page is oldest first (id > after), which is what
+        a client following new events wants; continue with `after=<next_cursor>`.
+        `next_cursor` is None when there are no more matching events.
+        """
+        limit = max(1, min(int(limit), 500))
+        with self._lock:
+            lo, hi = self._first_id, self._last_id
+            if since is not None:
+                lo = max(lo, self._bisect_ts(float(since)))
+            if until is not None:
+                hi = min(hi, self._bisect_ts(float(until), right=True) - 1)
+            if before is not None:
+                hi = min(hi, int(before) - 1)
+            ascending = after is not None
+            if ascending:
+                lo = max(lo, int(after) + 1)
+
+            if reason is not None:
+                candidates = [i for i in self._by_reason.get(reason, ()) if lo <= i <= hi]
+                if not ascending:
+                    candidates.reverse()
+            else:
+                candidates = range(lo, hi + 1) if ascending else range(hi, lo - 1, -1)
+
+            page: List[Dict[str, Any]] = []
+            more = False
+            for eid in candidates:
+                entry = self._get(eid)
+                if event is not None and entry["event"] != event:
+                    continue
+                if len(page) == limit:
+                    more = True
+                    break
+                page.append(dict(entry))
+
+        next_cursor = page[-1]["id"] if more else None
+        return {"events": page, "next_cursor": next_cursor}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "capacity": self._capacity,
+                "size": self._last_id - self._first_id + 1,
+                "first_id": self._first_id,
+                "last_id": self._last_id,
+                "reasons": len(self._by_reason),
+            }
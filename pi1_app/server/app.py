@@ -2,149 +2,159 @@ import os
 import json
 import threading
 import time
-from datetime import datetime
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 import paho.mqtt.client as mqtt
 from system_state import SystemState
+from influx_writer import InfluxBatchWriter
+from influx_spool import InfluxSpool, SpoolReplayer
+from ingest import IngestPool, DEFAULT_TELEMETRY_TOPICS
+from mqtt_publisher import MqttPublisher
+from scheduler import Scheduler
+from state_stream import StateBroadcaster
+from sensor_registry import SensorRegistry, DEFAULT_ROUTES
+from codec import get_codec
+from line_protocol import LineProtocolEncoder
+import wire
 
 # Optional InfluxDB v2
 INFLUX_URL = os.getenv("INFLUX_URL", "http://localhost:8086")
 INFLUX_TOKEN = os.getenv("INFLUX_TOKEN", "")
 INFLUX_ORG = os.getenv("INFLUX_ORG", "iot")
 INFLUX_BUCKET = os.getenv("INFLUX_BUCKET", "smart_home")
+INFLUX_BATCH_SIZE = int(os.getenv("INFLUX_BATCH_SIZE", "500"))
+INFLUX_FLUSH_INTERVAL_SEC = float(os.getenv("INFLUX_FLUSH_INTERVAL_SEC", "1.0"))
+INFLUX_MAX_QUEUE = int(os.getenv("INFLUX_MAX_QUEUE", "50000"))
+INFLUX_MAX_RETRIES = int(os.getenv("INFLUX_MAX_RETRIES", "5"))
+# On-disk spool for points written while InfluxDB is down ("" disables it)
+INFLUX_SPOOL_DIR = os.getenv("INFLUX_SPOOL_DIR", os.path.join(os.path.dirname(__file__), "influx_spool"))
+INFLUX_SPOOL_MAX_MB = float(os.getenv("INFLUX_SPOOL_MAX_MB", "256"))
+INFLUX_SPOOL_SEGMENT_MB = float(os.getenv("INFLUX_SPOOL_SEGMENT_MB", "4"))
+INFLUX_REPLAY_BATCH = int(os.getenv("INFLUX_REPLAY_BATCH", "5000"))
 
 MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
 MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
 MQTT_TOPIC = os.getenv("MQTT_TOPIC", "home/#")
+# print every decoded MQTT payload (floods stdout at telemetry rates)
+MQTT_DEBUG = os.getenv("MQTT_DEBUG", "").strip().lower() in ("1", "true", "yes", "on")
+# Extra/overriding device routes, e.g. SENSOR_ROUTES='{"DHT*": "dht", "KDS*": "door"}'
+SENSOR_ROUTES = {**DEFAULT_ROUTES, **json.loads(os.getenv("SENSOR_ROUTES", "{}"))}
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_OVERFLOW = os.getenv("INGEST_OVERFLOW", "block")
+INGEST_TELEMETRY_TOPICS = [
+    p.strip() for p in os.getenv("INGEST_TELEMETRY_TOPICS", ",".join(DEFAULT_TELEMETRY_TOPICS)).split(",")
+]
 WEBC_URL = os.getenv("WEBC_URL", "http://localhost:8080/?action=stream")
 
+# JSON codec for MQTT payloads (orjson when installed, see codec.py)
+mqtt_codec = get_codec()
+
 # Ensure templates folder is found
 app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
-system_state = SystemState()
+scheduler = Scheduler()
+scheduler.start()
+system_state = SystemState(scheduler)
 
 _influx_write = None
+_influx_writer = None
+_influx_spool = None
+_influx_replayer = None
+# Line-protocol encoder (per-device cached tag prefixes), see line_protocol.py
+line_encoder = LineProtocolEncoder()
 try:
-    from influxdb_client import InfluxDBClient, Point, WritePrecision
+    from influxdb_client import InfluxDBClient, WritePrecision
+    from influxdb_client.client.write_api import SYNCHRONOUS
     if INFLUX_TOKEN:
         _influx = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
-        _influx_write = _influx.write_api()
+        # Batching is done by InfluxBatchWriter, so the client itself writes synchronously
+        _influx_write = _influx.write_api(write_options=SYNCHRONOUS)
     else:
         _influx = None
 except Exception:
     _influx = None
     _influx_write = None
 
+
+def _write_lines(lines: list):
+    _influx_write.write(
+        bucket=INFLUX_BUCKET,
+        org=INFLUX_ORG,
+        record=b"\n".join(lines),
+        write_precision=WritePrecision.NS,
+    )
+
+
+if _influx_write is not None:
+    if INFLUX_SPOOL_DIR:
+        _influx_spool = InfluxSpool(
+            INFLUX_SPOOL_DIR,
+            segment_bytes=int(INFLUX_SPOOL_SEGMENT_MB * 1024 * 1024),
+            max_bytes=int(INFLUX_SPOOL_MAX_MB * 1024 * 1024),
+        )
+        _influx_replayer = SpoolReplayer(_influx_spool, _write_lines, batch_size=INFLUX_REPLAY_BATCH)
+        _influx_replayer.start()
+    _influx_writer = InfluxBatchWriter(
+        _write_lines,
+        batch_size=INFLUX_BATCH_SIZE,
+        flush_interval_sec=INFLUX_FLUSH_INTERVAL_SEC,
+        max_queue=INFLUX_MAX_QUEUE,
+        max_retries=INFLUX_MAX_RETRIES,
+        spool=_influx_spool,
+    )
+    _influx_writer.start()
+
+
+def _ts_ns(ts) -> int:
+    """Epoch seconds (float) -> epoch nanoseconds, keeps sub-second precision."""
+    return int(float(ts) * 1_000_000_000)
+
 def write_to_influx(topic: str, payload: dict):
-    """Write one message to InfluxDB (if configured)."""
-    if _influx_write is None:
+    """Queue one message for InfluxDB (if configured)."""
+    if _influx_writer is None:
         return
 
     # Use measurement based on code if present, else topic tail
     code = payload.get("code") or topic.split("/")[-1]
-    measurement = f"sensor_{code}".lower()
-
-    p = Point(measurement)
-    # tags
-    p = p.tag("pi", str(payload.get("pi", "")))
-    p = p.tag("code", str(code))
-    p = p.tag("device_name", str(payload.get("device_name", "")))
-    p = p.tag("simulated", str(payload.get("simulated", False)).lower())
-    p = p.tag("topic", topic)
-
-    # fields
-    val = payload.get("value")
-    # Influx requires numeric/bool/string fields; we store as string if complex
-    if isinstance(val, (int, float, bool)):
-        p = p.field("value", val)
-    elif isinstance(val, str):
-        if str(code).upper() == "DMS":
-            key_map = {
-                "0": 0, "1": 1, "2": 2, "3": 3, "4": 4,
-                "5": 5, "6": 6, "7": 7, "8": 8, "9": 9,
-                "*": 10, "#": 11, "A": 12, "B": 13, "C": 14, "D": 15,
-            }
-            mapped = key_map.get(val.upper())
-            if mapped is not None:
-                p = p.field("value_num", mapped)
-            p = p.field("value_str", val)
-        else:
-            p = p.field("value", val)
-    elif isinstance(val, dict):
-        # DHT-friendly flattening for Grafana panels
-        if "temperature_c" in val:
-            try:
-                p = p.field("temperature_c", float(val.get("temperature_c")))
-            except Exception:
-                pass
-        if "humidity_pct" in val:
-            try:
-                p = p.field("humidity_pct", float(val.get("humidity_pct")))
-            except Exception:
-                pass
-        if "display" in val:
-            p = p.field("display", str(val.get("display")))
-        if "text" in val:
-            p = p.field("text", str(val.get("text")))
-        if "color" in val:
-            p = p.field("color", str(val.get("color")))
-        if "action" in val:
-            p = p.field("action", str(val.get("action")))
-        if "blink" in val:
-            p = p.field("blink", bool(val.get("blink")))
-        if "state" in val:
-            p = p.field("state", bool(val.get("state")))
-        if "ms" in val:
-            try:
-                p = p.field("ms", int(val.get("ms")))
-            except Exception:
-                pass
-        if "count" in val:
-            try:
-                p = p.field("count", int(val.get("count")))
-            except Exception:
-                pass
-        if "gap_ms" in val:
-            try:
-                p = p.field("gap_ms", int(val.get("gap_ms")))
-            except Exception:
-                pass
-        p = p.field("value_str", json.dumps(val))
-    else:
-        p = p.field("value_str", json.dumps(val))
+    line = line_encoder.sensor_line(topic, code, payload, payload.get("value"), payload.get("ts"))
+    if line is not None:
+        _influx_writer.submit(line)
 
-    # timestamp
-    ts = payload.get("ts")
-    if ts:
-        # ts is epoch seconds
-        p = p.time(datetime.utcfromtimestamp(float(ts)), WritePrecision.S)
 
-    _influx_write.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=p)
+def write_columns_to_influx(topic: str, block: dict):
+    """Queue a columnar block (one header, parallel ts[]/value[]) for InfluxDB."""
+    if _influx_writer is None:
+        return
+
+    code = block.get("code") or topic.split("/")[-1]
+    for ts, val in zip(block.get("ts") or (), block.get("value") or ()):
+        line = line_encoder.sensor_line(topic, code, block, val, ts)
+        if line is not None:
+            _influx_writer.submit(line)
 
 
 def write_alarm_event_to_influx(event: dict):
-    if _influx_write is None:
+    if _influx_writer is None:
         return
 
     ts = float(event.get("ts", time.time()))
     state = str(event.get("event", ""))
     reason = str(event.get("reason", ""))
 
-    p = Point("alarm_event")
-    p = p.tag("source", "system")
-    p = p.tag("event", state)
-    p = p.tag("reason", reason)
-    p = p.field("active", 1 if state == "on" else 0)
-    p = p.field("reason_text", reason)
-    p = p.time(datetime.utcfromtimestamp(ts), WritePrecision.S)
+    line = line_encoder.line(
+        "alarm_event",
+        {"source": "system", "event": state, "reason": reason},
+        {"active": 1 if state == "on" else 0, "reason_text": reason},
+        _ts_ns(ts),
+    )
+    _influx_writer.submit(line)
+
 
-    _influx_write.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=p)
+_publisher = MqttPublisher(MQTT_BROKER, MQTT_PORT, codec=mqtt_codec)
+_publisher.start()
 
 
 def _publish_cmd(topic: str, data: dict):
-    pub = mqtt.Client()
-    pub.connect(MQTT_BROKER, MQTT_PORT, 60)
-    pub.publish(topic, json.dumps(data))
-    pub.disconnect()
+    _publisher.publish(topic, data)
 
 
 def _record_actuator_state(pi: str, code: str, device_name: str, value, topic: str):
@@ -171,17 +181,21 @@ def _publish_alarm_buzzer(active: bool):
     _record_actuator_state("PI1", "DB", "Door Buzzer", state, topic)
 
 
+DL_ON_SEC = 10.0
+
+
+def _dl_off():
+    topic = "home/pi1/cmd/led"
+    _publish_cmd(topic, {"state": False})
+    _record_actuator_state("PI1", "DL", "Door Light", False, topic)
+
+
 def _trigger_dl_10s():
     topic = "home/pi1/cmd/led"
     _publish_cmd(topic, {"state": True})
     _record_actuator_state("PI1", "DL", "Door Light", True, topic)
-
-    def _off_later():
-        time.sleep(10.0)
-        _publish_cmd(topic, {"state": False})
-        _record_actuator_state("PI1", "DL", "Door Light", False, topic)
-
-    threading.Thread(target=_off_later, daemon=True).start()
+    # Re-triggerable: new motion replaces the pending "off" and extends the timeout
+    scheduler.call_later(DL_ON_SEC, _dl_off, key="dl_off")
 
 
 def _sync_4sd(timer_seconds: int, blink: bool):
@@ -209,38 +223,60 @@ def _sync_brgb(state: bool, color: str):
     _publish_cmd(topic, value)
     _record_actuator_state("PI3", "BRGB", "Bedroom RGB", value, topic)
 
+def _on_motion(code: str, value, reading: dict):
+    out = system_state.handle_motion(code, value, reading.get("ts"))
+    if out.get("trigger_dl"):
+        _trigger_dl_10s()
+
+
+SENSOR_HANDLERS = {
+    "door": lambda code, value, reading: system_state.handle_door_sensor(code, value),
+    "pin": lambda code, value, reading: system_state.check_pin(value),
+    "distance": lambda code, value, reading: system_state.update_distance(code, value, reading.get("ts")),
+    "motion": _on_motion,
+    "gsg": lambda code, value, reading: system_state.handle_gsg(value),
+    "dht": lambda code, value, reading: system_state.update_dht(code, value),
+    "button": lambda code, value, reading: system_state.handle_btn(value),
+    "ir": lambda code, value, reading: system_state.apply_ir(value),
+}
+
+sensor_registry = SensorRegistry.from_config(SENSOR_ROUTES, SENSOR_HANDLERS)
+
+
 def _handle_system_state(reading: dict):
-    sensor = reading.get("code")
-    value = reading.get("value")
-
-    if sensor in {"DS1", "DS2"}:
-        system_state.handle_door_sensor(sensor, value)
-    elif sensor == "DMS":
-        system_state.check_pin(value)
-    elif sensor in {"DUS1", "DUS2"}:
-        system_state.update_distance(sensor, value)
-    elif sensor in {"DPIR1", "DPIR2", "DPIR3"}:
-        out = system_state.handle_motion(sensor, value)
-        if out.get("trigger_dl"):
-            _trigger_dl_10s()
-    elif sensor == "GSG":
-        system_state.handle_gsg(value)
-    elif sensor in {"DHT1", "DHT2", "DHT3"}:
-        system_state.update_dht(sensor, value)
-    elif sensor == "BTN":
-        system_state.handle_btn(value)
-    elif sensor == "IR":
-        system_state.apply_ir(value)
+    sensor_registry.dispatch(reading)
+
+
+def _handle_columns(topic: str, block: dict):
+    # columnar batch: one header for many readings of the same device
+    sensor_registry.dispatch_columns(block)
+    write_columns_to_influx(topic, block)
+
+
+LCD_ROTATE_SEC = 4.0
 
 
 def _system_rules_thread():
+    """Push actuator state whenever SystemState changes.
+
+    The thread sleeps on SystemState's change condition and only wakes when
+    something changed, a time rule (entry delay / door timeout) is due, or
+    the LCD has to rotate - whichever comes first.
+    """
     last_alarm = None
     last_timer = None
     last_brgb = None
-    last_lcd_rotate_ts = 0.0
+    version = -1
+    next_lcd_rotate_ts = 0.0
 
     while True:
         try:
+            wake_at = next_lcd_rotate_ts
+            deadline = system_state.next_rule_deadline()
+            if deadline is not None:
+                wake_at = min(wake_at, deadline)
+            version = system_state.wait_for_change(version, timeout=max(0.0, wake_at - time.time()))
+
             system_state.check_time_rules()
             for event in system_state.pop_alarm_events():
                 write_alarm_event_to_influx(event)
@@ -267,33 +303,52 @@ def _system_rules_thread():
                 last_brgb = brgb_key
 
             now = time.time()
-            if now - last_lcd_rotate_ts >= 4.0:
+            if now >= next_lcd_rotate_ts:
                 text = system_state.next_lcd_text()
                 _sync_lcd(text)
-                last_lcd_rotate_ts = now
+                next_lcd_rotate_ts = now + LCD_ROTATE_SEC
         except Exception as e:
             print(f"[STATE] rules error: {e}")
-        time.sleep(0.25)
+            time.sleep(0.25)
 
-def on_message(client, userdata, msg):
+def _process_message(topic: str, raw: bytes):
+    """Runs on an ingest worker thread (never on the paho network thread)."""
     try:
-        payload = json.loads(msg.payload.decode("utf-8"))
+        # JSON or binary batch (detected from the header), see wire.py
+        payload = wire.decode(raw, mqtt_codec)
     except Exception:
-        payload = {"raw": msg.payload.decode("utf-8", errors="ignore")}
-    print(f"[MQTT] {msg.topic} -> {payload}")
+        payload = {"raw": raw.decode("utf-8", errors="ignore")}
+    if MQTT_DEBUG:
+        print(f"[MQTT] {topic} -> {payload}")
     try:
         # KT2 batch mode: payload can be a LIST of readings
-        if isinstance(payload, list):
-            for item in payload:
-                if isinstance(item, dict):
-                    _handle_system_state(item)
-                    write_to_influx(msg.topic, item)
-        elif isinstance(payload, dict):
-            _handle_system_state(payload)
-            write_to_influx(msg.topic, payload)
+        # (plain dicts and/or columnar blocks, see wire.to_columnar)
+        items = payload if isinstance(payload, list) else [payload]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            if wire.is_columnar(item):
+                _handle_columns(topic, item)
+            else:
+                _handle_system_state(item)
+                write_to_influx(topic, item)
     except Exception as e:
         print(f"[INFLUX] write error: {e}")
 
+
+_ingest = IngestPool(
+    _process_message,
+    workers=INGEST_WORKERS,
+    queue_size=INGEST_QUEUE_SIZE,
+    overflow=INGEST_OVERFLOW,
+    telemetry_topics=INGEST_TELEMETRY_TOPICS,
+)
+_ingest.start()
+
+
+def on_message(client, userdata, msg):
+    _ingest.submit(msg.topic, msg.payload)
+
 def mqtt_thread():
     c = mqtt.Client(client_id="smart-home-server")
     c.on_message = on_message
@@ -309,18 +364,78 @@ t.start()
 t_rules = threading.Thread(target=_system_rules_thread, daemon=True)
 t_rules.start()
 
+# Push channel for dashboards (SSE)
+state_stream = StateBroadcaster(system_state)
+state_stream.start()
+
 @app.get("/health")
 def health():
     return jsonify({
         "status": "ok",
-        "mqtt": {"broker": MQTT_BROKER, "port": MQTT_PORT, "topic": MQTT_TOPIC},
-        "influx": {"enabled": _influx_write is not None, "url": INFLUX_URL, "bucket": INFLUX_BUCKET, "org": INFLUX_ORG}
+        "mqtt": {"broker": MQTT_BROKER, "port": MQTT_PORT, "topic": MQTT_TOPIC, "codec": mqtt_codec.name},
+        "ingest": _ingest.stats(),
+        "publisher": _publisher.stats(),
+        "scheduler": scheduler.stats(),
+        "stream": state_stream.stats(),
+        "alarm_log": system_state.alarm_log.stats(),
+        "influx": {
+            "enabled": _influx_write is not None,
+            "url": INFLUX_URL,
+            "bucket": INFLUX_BUCKET,
+            "org": INFLUX_ORG,
+            "writer": _influx_writer.stats() if _influx_writer is not None else None,
+            "encoder": line_encoder.stats(),
+            "spool": _influx_spool.stats() if _influx_spool is not None else None,
+            "replayer": _influx_replayer.stats() if _influx_replayer is not None else None,
+        },
     })
 
 
+def _state() -> dict:
+    """Current state dict, shared with the /state cache (read-only)."""
+    return system_state.serialized_snapshot().data
+
+
 @app.get("/state")
 def get_state():
-    return jsonify(system_state.snapshot())
+    """Full state, or only what changed when called as /state?since=<version>.
+
+    Full responses carry the version in the X-State-Version / X-State-Epoch
+    headers; pass them back as ?since=<version>&epoch=<epoch>.
+    """
+    since = request.args.get("since", type=int)
+    if since is not None:
+        epoch = request.args.get("epoch", type=int)
+        return jsonify(system_state.delta_since(since, epoch))
+
+    snap = system_state.serialized_snapshot()
+
+    if snap.etag is not None and snap.etag in request.if_none_match:
+        resp = Response(status=304)
+        resp.set_etag(snap.etag)
+        return resp
+
+    if request.accept_encodings["gzip"]:
+        resp = Response(snap.body_gzip, mimetype="application/json")
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = Response(snap.body, mimetype="application/json")
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-State-Version"] = str(snap.version)
+    resp.headers["X-State-Epoch"] = str(system_state.epoch)
+    if snap.etag is not None:
+        resp.set_etag(snap.etag)
+    return resp
+
+
+@app.get("/state/stream")
+def get_state_stream():
+    """Server-Sent Events: `state` (full) first, then `delta` events as the state changes."""
+    resp = Response(state_stream.stream(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
 
 
 @app.get("/")
@@ -331,26 +446,26 @@ def web_index():
 @app.post("/api/system/arm")
 def api_system_arm():
     system_state.arm_system()
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/system/disarm")
 def api_system_disarm():
     system_state.disarm_system()
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/alarm/on")
 def api_alarm_on():
     system_state.activate_alarm("web")
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/alarm/off")
 def api_alarm_off():
     system_state.deactivate_alarm()
     system_state.disarm_system()
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/pin")
@@ -358,14 +473,39 @@ def api_pin_submit():
     data = request.get_json(force=True, silent=True) or {}
     pin = str(data.get("pin", "")).strip()
     if not pin:
-        return jsonify({"ok": False, "error": "pin is required", "state": system_state.snapshot()}), 400
+        return jsonify({"ok": False, "error": "pin is required", "state": _state()}), 400
     system_state.check_pin(pin)
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
+
+
+@app.get("/api/alarm-events")
+def api_alarm_events():
+    """Alarm event history, newest first.
+
+    Query params: limit (<=500), cursor (next_cursor of the previous page),
+    after (id; oldest-first page of newer events), since/until (epoch s),
+    reason, event (on|off).
+    """
+    args = request.args
+    event = args.get("event")
+    if event is not None and event not in {"on", "off"}:
+        return jsonify({"ok": False, "error": "event must be on or off"}), 400
+
+    result = system_state.alarm_log.query(
+        limit=args.get("limit", 50, type=int),
+        before=args.get("cursor", type=int),
+        after=args.get("after", type=int),
+        since=args.get("since", type=float),
+        until=args.get("until", type=float),
+        reason=args.get("reason"),
+        event=event,
+    )
+    return jsonify({"ok": True, **result})
 
 
 @app.get("/api/alarm-controls")
 def api_alarm_controls_get():
-    snap = system_state.snapshot()
+    snap = _state()
     return jsonify({"ok": True, "controls": snap.get("alarm_controls", {})})
 
 
@@ -382,7 +522,7 @@ def api_alarm_controls_set():
     if not ok:
         return jsonify({"ok": False, "error": "invalid control"}), 400
 
-    snap = system_state.snapshot()
+    snap = _state()
     return jsonify({"ok": True, "controls": snap.get("alarm_controls", {}), "alarm": snap.get("alarm_active")})
 
 
@@ -397,7 +537,7 @@ def api_scenario():
 
     result = system_state.trigger_scenario(str(name), params)
     status = 200 if result.get("ok") else 400
-    snap = system_state.snapshot()
+    snap = _state()
     result["state"] = {
         "alarm": snap.get("alarm_active"),
         "armed": snap.get("system_armed"),
@@ -411,7 +551,7 @@ def api_timer_set():
     data = request.get_json(force=True, silent=True) or {}
     seconds = int(data.get("seconds", 0))
     system_state.set_timer(seconds)
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/timer/add")
@@ -419,7 +559,7 @@ def api_timer_add():
     data = request.get_json(force=True, silent=True) or {}
     seconds = int(data.get("seconds", 0))
     system_state.add_timer_seconds(seconds)
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/timer/step")
@@ -427,25 +567,25 @@ def api_timer_step():
     data = request.get_json(force=True, silent=True) or {}
     seconds = int(data.get("seconds", 30))
     system_state.set_timer_add_step(seconds)
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/timer/start")
 def api_timer_start():
     system_state.start_timer()
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/timer/stop")
 def api_timer_stop():
     system_state.stop_timer()
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/timer/ack")
 def api_timer_ack():
     system_state.ack_timer_blink()
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.post("/api/brgb")
@@ -454,7 +594,7 @@ def api_brgb():
     state = data.get("state")
     color = data.get("color")
     system_state.set_brgb(state=state, color=color)
-    return jsonify({"ok": True, "state": system_state.snapshot()})
+    return jsonify({"ok": True, "state": _state()})
 
 
 @app.get("/api/camera")
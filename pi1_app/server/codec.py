@@ -0,0 +1,67 @@
+"""JSON codec selection for MQTT payloads.
+
+orjson is used when it is installed (several times faster on batch
+payloads, which matters on Pi Zero-class edges); otherwise the stdlib json
+module is used. Both produce the same wire format, so edges and server can
+run different codecs.
+
+Selection: env MQTT_JSON_CODEC overrides the name passed to get_codec (the
+edge passes settings.json global.mqtt.json_codec); values are "auto"
+(default), "orjson" or "json".
+
+The edge (simulation/utils/codec.py) and the server (server/codec.py, deployed
+on its own) each ship a copy of this module; the two files must stay
+identical (checked by tests/test_mirrors.py).
+"""
+import json
+import os
+from typing import Any, Optional
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+
+class StdlibJsonCodec:
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """orjson-backed codec.
+
+    Note: orjson writes NaN/Infinity as null (strict JSON), while the stdlib
+    writes the non-standard `Infinity` token. loads() falls back to the
+    stdlib for such payloads so mixed fleets keep working.
+    """
+
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+
+
+def get_codec(name: Optional[str] = None):
+    """Return a codec instance for `name` (see module docstring)."""
+    choice = (os.getenv("MQTT_JSON_CODEC") or name or "auto").strip().lower()
+    if choice == "json":
+        return StdlibJsonCodec()
+    if choice == "orjson":
+        if orjson is None:
+            raise RuntimeError("orjson codec requested but orjson is not installed")
+        return OrjsonCodec()
+    if choice != "auto":
+        raise ValueError(f"unknown json codec: {choice}")
+    return OrjsonCodec() if orjson is not None else StdlibJsonCodec()
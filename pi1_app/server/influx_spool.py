@@ -0,0 +1,268 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+WriteFn = Callable[[List[bytes]], None]
+
+_SUFFIX = ".lp"
+_REJECTED = "rejected.lp"
+
+# 4xx answers that go away once config or load is fixed (token, bucket,
+# timeouts, rate limit); any other 4xx means InfluxDB will never accept the
+# request as is (malformed line, field type conflict, too large)
+_RETRYABLE_4XX = frozenset((401, 403, 404, 408, 429))
+
+
+def is_rejected(exc: BaseException) -> bool:
+    """True if InfluxDB rejected a write for good (4xx ApiException); retrying is pointless."""
+    status = getattr(exc, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in _RETRYABLE_4XX
+
+
+class InfluxSpool:
+    """Append-only, segmented, size-capped on-disk spool of line-protocol points.
+
+    Points that could not be written to InfluxDB are appended to the current
+    segment file (`<seq>.lp`, one line per point). A segment is closed once
+    it reaches `segment_bytes`; when the spool grows past `max_bytes` the
+    oldest closed segments are deleted (counted as evicted). Segments left
+    over from a previous run are picked up on start.
+
+    Every line carries its own timestamp, so replaying it later keeps the
+    original time. A segment is deleted only after all of it was written;
+    replaying a segment twice after a crash is harmless because InfluxDB
+    overwrites points with the same series and timestamp.
+
+    Lines InfluxDB rejected for good (see is_rejected) are moved to
+    `rejected.lp` for inspection instead of being retried; when it reaches
+    `max_rejected_bytes` it is renamed to `rejected.lp.1` (replacing the
+    previous one).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024,
+                 max_bytes: int = 256 * 1024 * 1024, fsync: bool = False,
+                 max_rejected_bytes: int = 16 * 1024 * 1024):
+        self._dir = directory
+        self._segment_bytes = max(1024, int(segment_bytes))
+        self._max_bytes = max(self._segment_bytes, int(max_bytes))
+        self._fsync = bool(fsync)
+        self._max_rejected = max(1024, int(max_rejected_bytes))
+        os.makedirs(self._dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._closed: List[int] = []
+        self._sizes: Dict[int, int] = {}
+        for name in os.listdir(self._dir):
+            if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit():
+                seq = int(name[:-len(_SUFFIX)])
+                size = os.path.getsize(self._path(seq))
+                if size:
+                    self._closed.append(seq)
+                    self._sizes[seq] = size
+                else:
+                    os.remove(self._path(seq))
+        self._closed.sort()
+        self._seq = (self._closed[-1] + 1) if self._closed else 0
+        self._file = None
+        self._file_size = 0
+        self._total = sum(self._sizes.values())
+
+        self._spooled = 0
+        self._replayed = 0
+        self._evicted_segments = 0
+        self._evicted_bytes = 0
+        self._rejected = 0
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self._dir, f"{seq:010d}{_SUFFIX}")
+
+    def append(self, lines: List[bytes]) -> None:
+        if not lines:
+            return
+        data = b"\n".join(lines) + b"\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path(self._seq), "ab")
+                self._file_size = 0
+            self._file.write(data)
+            self._file.flush()
+            if self._fsync:
+                os.fsync(self._file.fileno())
+            self._file_size += len(data)
+            self._total += len(data)
+            self._spooled += len(lines)
+            if self._file_size >= self._segment_bytes:
+                self._rotate_locked()
+            self._evict_locked()
+
+    def _rotate_locked(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._closed.append(self._seq)
+        self._sizes[self._seq] = self._file_size
+        self._seq += 1
+        self._file_size = 0
+
+    def _evict_locked(self) -> None:
+        while self._total > self._max_bytes and self._closed:
+            seq = self._closed.pop(0)
+            size = self._sizes.pop(seq, 0)
+            self._total -= size
+            self._evicted_segments += 1
+            self._evicted_bytes += size
+            try:
+                os.remove(self._path(seq))
+            except OSError:
+                pass
+            print(f"[INFLUX] spool full, evicted segment {seq} ({size} bytes)")
+
+    def pending(self) -> bool:
+        with self._lock:
+            return self._total > 0
+
+    def next_segment(self) -> Optional[int]:
+        """Oldest segment to replay (closes the current one if it is the only one)."""
+        with self._lock:
+            if not self._closed and self._file is not None:
+                self._rotate_locked()
+            return self._closed[0] if self._closed else None
+
+    def read_segment(self, seq: int) -> List[bytes]:
+        try:
+            with open(self._path(seq), "rb") as f:
+                return [line for line in f.read().split(b"\n") if line]
+        except FileNotFoundError:
+            return []
+
+    def commit(self, seq: int, lines: int) -> None:
+        """Segment `seq` was fully written to InfluxDB; delete it."""
+        with self._lock:
+            if seq in self._sizes:
+                self._closed.remove(seq)
+                self._total -= self._sizes.pop(seq)
+            self._replayed += lines
+        try:
+            os.remove(self._path(seq))
+        except OSError:
+            pass
+
+    def quarantine(self, lines: List[bytes]) -> None:
+        """Keep lines InfluxDB rejected (see is_rejected) out of the replay queue."""
+        if not lines:
+            return
+        data = b"\n".join(lines) + b"\n"
+        path = os.path.join(self._dir, _REJECTED)
+        with self._lock:
+            self._rejected += len(lines)
+            try:
+                if os.path.getsize(path) + len(data) > self._max_rejected:
+                    os.replace(path, path + ".1")
+            except OSError:
+                pass
+            with open(path, "ab") as f:
+                f.write(data)
+
+    def close(self) -> None:
+        with self._lock:
+            self._rotate_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "dir": self._dir,
+                "segments": len(self._closed) + (1 if self._file is not None else 0),
+                "bytes": self._total,
+                "max_bytes": self._max_bytes,
+                "spooled": self._spooled,
+                "replayed": self._replayed,
+                "evicted_segments": self._evicted_segments,
+                "evicted_bytes": self._evicted_bytes,
+                "rejected": self._rejected,
+            }
+
+
+class SpoolReplayer(threading.Thread):
+    """Daemon thread that drains an InfluxSpool back into InfluxDB.
+
+    Segments are replayed oldest first in requests of `batch_size` lines.
+    After a failed write the replayer backs off (doubling up to
+    `max_backoff_sec`) and retries from the line where it stopped, so an
+    outage costs one probe request per backoff period. A chunk InfluxDB
+    rejected for good (is_rejected, e.g. a field type conflict) is not
+    retried: it is quarantined and the replay moves on to the next chunk.
+    """
+
+    def __init__(self, spool: InfluxSpool, write_fn: WriteFn, batch_size: int = 5000,
+                 idle_sec: float = 1.0, max_backoff_sec: float = 30.0):
+        super().__init__(daemon=True)
+        self._spool = spool
+        self._write = write_fn
+        self._batch_size = max(1, int(batch_size))
+        self._idle = max(0.05, float(idle_sec))
+        self._max_backoff = max(self._idle, float(max_backoff_sec))
+        self._stop_event = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._failures = 0
+        self._rejected = 0
+        self._last_error: Optional[str] = None
+        self._last_replay_ts: Optional[float] = None
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "last_error": self._last_error,
+                "last_replay_ts": self._last_replay_ts,
+            }
+
+    def run(self) -> None:
+        backoff = self._idle
+        while not self._stop_event.is_set():
+            seq = self._spool.next_segment()
+            if seq is None:
+                self._stop_event.wait(self._idle)
+                continue
+
+            lines = self._spool.read_segment(seq)
+            pos = rejected = 0
+            while pos < len(lines) and not self._stop_event.is_set():
+                chunk = lines[pos:pos + self._batch_size]
+                try:
+                    self._write(chunk)
+                except Exception as e:
+                    with self._stats_lock:
+                        self._failures += 1
+                        self._last_error = str(e)
+                    if is_rejected(e):
+                        self._spool.quarantine(chunk)
+                        with self._stats_lock:
+                            self._rejected += len(chunk)
+                        print(f"[INFLUX] {len(chunk)} spooled points rejected (segment {seq}), quarantined: {e}")
+                        pos += len(chunk)
+                        rejected += len(chunk)
+                        continue
+                    self._stop_event.wait(backoff)
+                    backoff = min(self._max_backoff, backoff * 2)
+                    continue
+                backoff = self._idle
+                pos += len(chunk)
+                with self._stats_lock:
+                    self._batches += 1
+                    self._last_replay_ts = time.time()
+
+            if pos >= len(lines):
+                self._spool.commit(seq, len(lines) - rejected)
+                if len(lines) > rejected:
+                    print(f"[INFLUX] replayed {len(lines) - rejected} spooled points (segment {seq})")
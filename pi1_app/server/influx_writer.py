@@ -0,0 +1,196 @@
+import threading
+import time
+import queue
+from typing import Any, Callable, Dict, List, Optional
+
+from influx_spool import is_rejected
+
+WriteFn = Callable[[List[bytes]], None]
+
+_WAKE = object()
+
+
+class InfluxBatchWriter(threading.Thread):
+    """Daemon thread that writes line-protocol points to InfluxDB in batches.
+
+    Producers (MQTT handler, rules thread, HTTP handlers) only call submit(),
+    which is a non-blocking queue put. The writer thread:
+      - flushes when `batch_size` points are buffered OR the oldest buffered
+        point is `flush_interval_sec` old (whichever comes first)
+      - sends the whole batch as ONE line-protocol request via `write_fn`
+      - retries a failed batch with exponential backoff, then drops it
+      - never retries (or spools) a batch InfluxDB rejected for good
+        (4xx, see influx_spool.is_rejected): it is counted as `rejected` and
+        quarantined in the spool if there is one
+      - with a `spool` (InfluxSpool), a failed batch is written to disk
+        instead of being retried/dropped, and while the spool still holds
+        points new batches go there too; a SpoolReplayer drains it once
+        InfluxDB is back
+
+    `write_fn` receives a list of line-protocol lines (bytes); keeping the Influx
+    client outside this class means the writer has no hard dependency on it.
+    """
+
+    def __init__(
+        self,
+        write_fn: WriteFn,
+        batch_size: int = 500,
+        flush_interval_sec: float = 1.0,
+        max_queue: int = 50000,
+        max_retries: int = 5,
+        retry_backoff_sec: float = 0.5,
+        spool=None,
+    ):
+        super().__init__(daemon=True)
+        self._write = write_fn
+        self._batch_size = max(1, int(batch_size))
+        self._interval = max(0.01, float(flush_interval_sec))
+        self._max_retries = max(0, int(max_retries))
+        self._backoff = max(0.0, float(retry_backoff_sec))
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop_event = threading.Event()
+        self._spool = spool
+
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._retries = 0
+        self._spooled = 0
+        self._rejected = 0
+        self._flushes = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._last_error: Optional[str] = None
+
+    def submit(self, line: bytes) -> bool:
+        """Queue one line-protocol point. Returns False if the queue is full."""
+        try:
+            self._q.put_nowait(line)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            return False
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop_event.set()
+        try:
+            self._q.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            avg = self._total_flush_ms / self._flushes if self._flushes else 0.0
+            return {
+                "queue_depth": self._q.qsize(),
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "retries": self._retries,
+                "spooled": self._spooled,
+                "rejected": self._rejected,
+                "flushes": self._flushes,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "avg_flush_ms": round(avg, 2),
+                "max_flush_ms": round(self._max_flush_ms, 2),
+                "last_error": self._last_error,
+            }
+
+    def _to_spool(self, lines: List[bytes]) -> bool:
+        try:
+            self._spool.append(lines)
+        except Exception as e:
+            print(f"[INFLUX] spool write error: {e}")
+            return False
+        with self._stats_lock:
+            self._spooled += len(lines)
+        return True
+
+    def _flush(self, lines: List[bytes]) -> None:
+        # Backlog on disk: keep order and let the replayer talk to InfluxDB
+        if self._spool is not None and self._spool.pending() and self._to_spool(lines):
+            return
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                self._write(lines)
+            except Exception as e:
+                with self._stats_lock:
+                    self._last_error = str(e)
+                if is_rejected(e):
+                    with self._stats_lock:
+                        self._rejected += len(lines)
+                    if self._spool is not None:
+                        self._spool.quarantine(lines)
+                    print(f"[INFLUX] batch of {len(lines)} rejected: {e}")
+                    return
+                if self._spool is not None and self._to_spool(lines):
+                    return
+                if attempt >= self._max_retries or self._stop_event.is_set():
+                    with self._stats_lock:
+                        self._failed += len(lines)
+                    print(f"[INFLUX] batch of {len(lines)} dropped after {attempt + 1} attempts: {e}")
+                    return
+                with self._stats_lock:
+                    self._retries += 1
+                self._stop_event.wait(self._backoff * (2 ** attempt))
+                attempt += 1
+                continue
+
+            took_ms = (time.perf_counter() - started) * 1000.0
+            with self._stats_lock:
+                self._written += len(lines)
+                self._flushes += 1
+                self._last_flush_ms = took_ms
+                self._total_flush_ms += took_ms
+                self._max_flush_ms = max(self._max_flush_ms, took_ms)
+            return
+
+    def _drain_into(self, buf: List[bytes]) -> None:
+        while len(buf) < self._batch_size:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _WAKE:
+                buf.append(item)
+
+    def run(self) -> None:
+        buf: List[bytes] = []
+        oldest = 0.0
+
+        while not self._stop_event.is_set():
+            if buf:
+                timeout = max(0.0, oldest + self._interval - time.monotonic())
+            else:
+                timeout = self._interval
+
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = _WAKE
+
+            if item is not _WAKE:
+                if not buf:
+                    oldest = time.monotonic()
+                buf.append(item)
+                self._drain_into(buf)
+
+            if buf and (len(buf) >= self._batch_size or time.monotonic() - oldest >= self._interval):
+                self._flush(buf)
+                buf = []
+
+        # Shutdown: flush whatever is still buffered or queued
+        while True:
+            self._drain_into(buf)
+            if not buf:
+                break
+            self._flush(buf)
+            buf = []
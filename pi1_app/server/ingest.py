@@ -0,0 +1,128 @@
+import threading
+import queue
+from fnmatch import fnmatch
+from typing import Any, Callable, Dict, List, Sequence
+
+Handler = Callable[[str, bytes], None]
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_TELEMETRY = "drop_telemetry"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_TELEMETRY)
+
+DEFAULT_TELEMETRY_TOPICS = ("*/dht", "*/distance")
+
+
+class IngestPool:
+    """Bounded, sharded worker pool for incoming MQTT messages.
+
+    The paho network thread only calls submit(topic, raw_bytes); decoding,
+    SystemState updates and Influx writes run on the worker threads.
+
+    Every edge device publishes on its own topic, so messages are sharded by
+    topic: all readings of one (pi, code) land on the same worker queue and
+    are processed in the order they were received.
+
+    Overflow policy when a shard queue is full:
+      - block:          wait for space (backpressure to the network thread)
+      - drop_oldest:    discard the oldest queued message of that shard
+      - drop_telemetry: discard the new message if its topic matches one of
+                        `telemetry_topics`, otherwise block (alarm-relevant
+                        messages are never dropped)
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        workers: int = 4,
+        queue_size: int = 10000,
+        overflow: str = OVERFLOW_BLOCK,
+        telemetry_topics: Sequence[str] = DEFAULT_TELEMETRY_TOPICS,
+    ):
+        overflow = str(overflow).lower().replace("-", "_")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {overflow}")
+
+        self._handler = handler
+        self._overflow = overflow
+        self._telemetry_topics = tuple(p for p in telemetry_topics if p)
+        self._queues: List["queue.Queue[Any]"] = [
+            queue.Queue(maxsize=max(1, int(queue_size))) for _ in range(max(1, int(workers)))
+        ]
+        self._threads: List[threading.Thread] = []
+
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._processed = 0
+        self._dropped = 0
+        self._errors = 0
+
+    def start(self) -> None:
+        for i, q in enumerate(self._queues):
+            t = threading.Thread(target=self._worker, args=(q,), name=f"ingest-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def is_telemetry(self, topic: str) -> bool:
+        return any(fnmatch(topic, pattern) for pattern in self._telemetry_topics)
+
+    def _shard(self, topic: str) -> "queue.Queue[Any]":
+        return self._queues[hash(topic) % len(self._queues)]
+
+    def submit(self, topic: str, raw: bytes) -> bool:
+        """Queue one raw MQTT message. Returns False if it was dropped."""
+        q = self._shard(topic)
+        item = (topic, raw)
+
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            if self._overflow == OVERFLOW_DROP_OLDEST:
+                while True:
+                    try:
+                        q.get_nowait()
+                        with self._stats_lock:
+                            self._dropped += 1
+                    except queue.Empty:
+                        pass
+                    try:
+                        q.put_nowait(item)
+                        break
+                    except queue.Full:
+                        continue
+            elif self._overflow == OVERFLOW_DROP_TELEMETRY and self.is_telemetry(topic):
+                with self._stats_lock:
+                    self._dropped += 1
+                return False
+            else:
+                q.put(item)
+
+        with self._stats_lock:
+            self._queued += 1
+        return True
+
+    def _worker(self, q: "queue.Queue[Any]") -> None:
+        while True:
+            topic, raw = q.get()
+            try:
+                self._handler(topic, raw)
+            except Exception as e:
+                with self._stats_lock:
+                    self._errors += 1
+                print(f"[INGEST] handler error for {topic}: {e}")
+            with self._stats_lock:
+                self._processed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [q.qsize() for q in self._queues]
+        with self._stats_lock:
+            return {
+                "workers": len(self._queues),
+                "overflow": self._overflow,
+                "queue_depth": sum(depths),
+                "shard_depths": depths,
+                "queued": self._queued,
+                "processed": self._processed,
+                "dropped": self._dropped,
+                "errors": self._errors,
+            }
@@ -0,0 +1,252 @@
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# Same escaping rules as influxdb_client's Point
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_STRING = str.maketrans({'"': r"\"", "\\": r"\\"})
+
+# Keypad (DMS) key -> numeric value, so Grafana can plot key presses
+DMS_KEY_MAP: Dict[str, int] = {
+    "0": 0, "1": 1, "2": 2, "3": 3, "4": 4,
+    "5": 5, "6": 6, "7": 7, "8": 8, "9": 9,
+    "*": 10, "#": 11, "A": 12, "B": 13, "C": 14, "D": 15,
+}
+
+Fields = List[Tuple[str, str]]
+
+
+def _tag(value: Any) -> str:
+    out = str(value).translate(_ESCAPE_KEY)
+    if out.endswith("\\"):
+        out += " "
+    return out
+
+
+def _fmt_float(value: float) -> Optional[str]:
+    if not math.isfinite(value):
+        return None
+    s = str(value)
+    return s[:-2] if s.endswith(".0") else s
+
+
+def _fmt_string(value: Any) -> str:
+    return '"' + str(value).translate(_ESCAPE_STRING) + '"'
+
+
+def _fmt_value(value: Any) -> Optional[str]:
+    """Format a field value the way Point does (None = skip the field)."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return _fmt_float(value)
+    if isinstance(value, str):
+        return _fmt_string(value)
+    raise ValueError(f'Type: "{type(value)}" of field is not supported.')
+
+
+# -- per-type field extractors ------------------------------------------------
+
+def _float_field(v: Any) -> Optional[str]:
+    try:
+        return _fmt_float(float(v))
+    except Exception:
+        return None
+
+
+def _int_field(v: Any) -> Optional[str]:
+    try:
+        return f"{int(v)}i"
+    except Exception:
+        return None
+
+
+def _str_field(v: Any) -> str:
+    return _fmt_string(v)
+
+
+def _bool_field(v: Any) -> str:
+    return "true" if bool(v) else "false"
+
+
+# Dict values (DHT, actuator states/events) flattened for Grafana panels
+_DICT_FIELDS: Dict[str, Callable[[Any], Optional[str]]] = {
+    "temperature_c": _float_field,
+    "humidity_pct": _float_field,
+    "display": _str_field,
+    "text": _str_field,
+    "color": _str_field,
+    "action": _str_field,
+    "blink": _bool_field,
+    "state": _bool_field,
+    "ms": _int_field,
+    "count": _int_field,
+    "gap_ms": _int_field,
+}
+
+
+def _number_fields(val: Any) -> Fields:
+    s = _fmt_value(val)
+    return [("value", s)] if s is not None else []
+
+
+def _string_fields(val: str) -> Fields:
+    return [("value", _fmt_string(val))]
+
+
+def _keypad_fields(val: str) -> Fields:
+    mapped = DMS_KEY_MAP.get(val.upper())
+    out = [] if mapped is None else [("value_num", f"{mapped}i")]
+    out.append(("value_str", _fmt_string(val)))
+    return out
+
+
+def _dict_fields(val: dict) -> Fields:
+    out = []
+    for key in sorted(k for k in val if k in _DICT_FIELDS):
+        s = _DICT_FIELDS[key](val[key])
+        if s is not None:
+            out.append((key, s))
+    out.append(("value_str", _fmt_string(json.dumps(val))))
+    return out
+
+
+def _other_fields(val: Any) -> Fields:
+    return [("value_str", _fmt_string(json.dumps(val)))]
+
+
+# Edge window aggregates ("agg": {min, max, mean, count, window_s}); `value` is the last sample
+_AGG_FIELDS = (
+    ("count", "value_count", _int_field),
+    ("max", "value_max", _float_field),
+    ("mean", "value_mean", _float_field),
+    ("min", "value_min", _float_field),
+    ("window_s", "window_s", _float_field),
+)
+
+
+def _agg_fields(agg: dict) -> Fields:
+    out = []
+    for key, field, fmt in _AGG_FIELDS:
+        v = agg.get(key)
+        s = fmt(v) if v is not None else None
+        if s is not None:
+            out.append((field, s))
+    return out
+
+
+class _Device:
+    __slots__ = ("prefix", "str_fields")
+
+    def __init__(self, prefix: str, str_fields: Callable[[str], Fields]):
+        self.prefix = prefix
+        self.str_fields = str_fields
+
+
+class LineProtocolEncoder:
+    """Encodes sensor readings straight to InfluxDB line-protocol bytes.
+
+    The escaped `measurement,tags` prefix of a device only depends on its
+    header (topic, code, pi, device_name, simulated), so it is built once and
+    cached; each reading then only formats its fields and timestamp. Field
+    extraction is picked by value type, and string values of the keypad (DMS)
+    use a precomputed key -> number map. Output matches `Point.to_line_protocol()`
+    (tags and fields sorted, same escaping and number formatting), except that
+    a reading without `ts` is stamped with the current time.
+    """
+
+    _MAX_CACHED = 4096
+
+    def __init__(self):
+        self._devices: Dict[tuple, _Device] = {}
+
+    def _device(self, topic: str, code: str, header: Mapping[str, Any]) -> _Device:
+        pi = header.get("pi", "")
+        device_name = header.get("device_name", "")
+        simulated = header.get("simulated", False)
+        key = (topic, code, pi, device_name, simulated)
+        dev = self._devices.get(key)
+        if dev is not None:
+            return dev
+
+        tags = (
+            ("code", code),
+            ("device_name", device_name),
+            ("pi", pi),
+            ("simulated", str(simulated).lower()),
+            ("topic", topic),
+        )
+        parts = [f"sensor_{code}".lower().translate(_ESCAPE_MEASUREMENT)]
+        for name, value in tags:
+            if value is None:
+                continue
+            value = _tag(value)
+            if value != "":
+                parts.append(f"{name}={value}")
+        str_fields = _keypad_fields if str(code).upper() == "DMS" else _string_fields
+        dev = _Device(",".join(parts), str_fields)
+
+        if len(self._devices) >= self._MAX_CACHED:
+            self._devices.clear()
+        self._devices[key] = dev
+        return dev
+
+    def sensor_line(self, topic: str, code: str, header: Mapping[str, Any], val: Any, ts: Any) -> Optional[bytes]:
+        """One reading -> line-protocol bytes, or None if it has no writable field."""
+        dev = self._device(topic, code, header)
+
+        if isinstance(val, (int, float, bool)):
+            fields = _number_fields(val)
+        elif isinstance(val, str):
+            fields = dev.str_fields(val)
+        elif isinstance(val, dict):
+            fields = _dict_fields(val)
+        else:
+            fields = _other_fields(val)
+        agg = header.get("agg")
+        if isinstance(agg, dict):
+            fields = sorted(fields + _agg_fields(agg))
+        if not fields:
+            return None
+
+        line = dev.prefix + " " + ",".join(f"{k}={v}" for k, v in fields)
+        if ts:
+            # ts is epoch seconds (float); keep sub-second precision
+            line += f" {int(float(ts) * 1_000_000_000)}"
+        else:
+            # always stamp the point, so a spooled/replayed line keeps its time
+            line += f" {time.time_ns()}"
+        return line.encode("utf-8")
+
+    def line(self, measurement: str, tags: Mapping[str, Any], fields: Mapping[str, Any],
+             ts_ns: Optional[int] = None) -> Optional[bytes]:
+        """Generic (uncached) point -> line-protocol bytes."""
+        parts = [measurement.translate(_ESCAPE_MEASUREMENT)]
+        for name in sorted(tags):
+            value = tags[name]
+            if value is None:
+                continue
+            value = _tag(value)
+            if value != "":
+                parts.append(f"{_tag(name)}={value}")
+
+        out = []
+        for name in sorted(fields):
+            s = _fmt_value(fields[name])
+            if s is not None:
+                out.append(f"{name.translate(_ESCAPE_KEY)}={s}")
+        if not out:
+            return None
+
+        line = ",".join(parts) + " " + ",".join(out)
+        line += f" {time.time_ns() if ts_ns is None else int(ts_ns)}"
+        return line.encode("utf-8")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached_devices": len(self._devices)}
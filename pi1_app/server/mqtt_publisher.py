@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+import paho.mqtt.client as mqtt
+
+from codec import get_codec
+
+
+class MqttPublisher:
+    """Long-lived MQTT connection for server -> device commands.
+
+    One client is connected once and kept open; paho's network loop
+    reconnects it automatically (with backoff) after a broker restart.
+    Messages published while disconnected are kept in a bounded queue and
+    sent, oldest first, as soon as the connection is back.
+
+    Publish latency is measured from publish() to paho's on_publish
+    callback (the moment the message leaves the client), so time spent
+    waiting for a reconnect is included.
+    """
+
+    def __init__(self, broker: str, port: int = 1883, client_id: str = "smart-home-server-pub",
+                 keepalive: int = 60, max_pending: int = 1000, codec=None):
+        self._codec = codec or get_codec()
+        self._broker = broker
+        self._port = int(port)
+        self._keepalive = int(keepalive)
+
+        self._client = mqtt.Client(client_id=client_id)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_publish = self._on_publish
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
+
+        self._lock = threading.Lock()
+        self._connected = False
+        self._pending: deque = deque(maxlen=max(1, int(max_pending)))
+
+        # mid -> publish() start time; `_early` covers on_publish firing before
+        # publish() has stored the mid (paho sends from its own thread)
+        self._mid_lock = threading.Lock()
+        self._inflight: Dict[int, float] = {}
+        self._early: Dict[int, float] = {}
+
+        self._published = 0
+        self._queued_offline = 0
+        self._dropped = 0
+        self._connects = 0
+        self._lat_count = 0
+        self._lat_total_ms = 0.0
+        self._lat_last_ms = 0.0
+        self._lat_max_ms = 0.0
+
+    def start(self) -> None:
+        self._client.connect_async(self._broker, self._port, self._keepalive)
+        self._client.loop_start()
+
+    def stop(self) -> None:
+        try:
+            self._client.loop_stop()
+            self._client.disconnect()
+        except Exception:
+            pass
+
+    def publish(self, topic: str, data: Any, qos: int = 0) -> None:
+        payload = self._codec.dumps(data)
+        started = time.perf_counter()
+        with self._lock:
+            if not self._connected:
+                self._enqueue(topic, payload, qos, started)
+                return
+            self._send(topic, payload, qos, started)
+
+    def _enqueue(self, topic: str, payload: bytes, qos: int, started: float) -> None:
+        if len(self._pending) == self._pending.maxlen:
+            self._dropped += 1
+        self._pending.append((topic, payload, qos, started))
+        self._queued_offline += 1
+
+    def _send(self, topic: str, payload: bytes, qos: int, started: float) -> None:
+        info = self._client.publish(topic, payload, qos=qos, retain=False)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            # connection dropped between the check and the send
+            self._connected = False
+            self._enqueue(topic, payload, qos, started)
+            return
+
+        self._published += 1
+        with self._mid_lock:
+            sent = self._early.pop(info.mid, None)
+            if sent is None:
+                self._inflight[info.mid] = started
+        if sent is not None:
+            self._record_latency(started, sent)
+
+    def _record_latency(self, started: float, sent: float) -> None:
+        took_ms = (sent - started) * 1000.0
+        with self._mid_lock:
+            self._lat_count += 1
+            self._lat_total_ms += took_ms
+            self._lat_last_ms = took_ms
+            self._lat_max_ms = max(self._lat_max_ms, took_ms)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"[MQTT-PUB] connect failed rc={rc}")
+            return
+        with self._lock:
+            self._connected = True
+            self._connects += 1
+            while self._pending and self._connected:
+                topic, payload, qos, started = self._pending.popleft()
+                self._send(topic, payload, qos, started)
+
+    def _on_disconnect(self, client, userdata, rc):
+        with self._lock:
+            self._connected = False
+        if rc != 0:
+            print(f"[MQTT-PUB] disconnected rc={rc}, reconnecting...")
+
+    def _on_publish(self, client, userdata, mid):
+        sent = time.perf_counter()
+        with self._mid_lock:
+            started = self._inflight.pop(mid, None)
+            if started is None:
+                self._early[mid] = sent
+                return
+        self._record_latency(started, sent)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            connected = self._connected
+            pending = len(self._pending)
+            published = self._published
+            queued_offline = self._queued_offline
+            dropped = self._dropped
+            connects = self._connects
+        with self._mid_lock:
+            avg = self._lat_total_ms / self._lat_count if self._lat_count else 0.0
+            return {
+                "connected": connected,
+                "connects": connects,
+                "pending": pending,
+                "published": published,
+                "queued_offline": queued_offline,
+                "dropped": dropped,
+                "latency_last_ms": round(self._lat_last_ms, 3),
+                "latency_avg_ms": round(avg, 3),
+                "latency_max_ms": round(self._lat_max_ms, 3),
+            }
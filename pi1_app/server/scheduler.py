@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class Job:
+    """Handle for one scheduled call; pass it (or its key) to Scheduler.cancel()."""
+
+    __slots__ = ("when", "fn", "args", "key", "cancelled", "popped")
+
+    def __init__(self, when: float, fn: Callable[..., Any], args: Tuple[Any, ...], key: Optional[Hashable]):
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.cancelled = False
+        self.popped = False  # taken off the heap (running or done)
+
+
+class Scheduler(threading.Thread):
+    """Single daemon thread that runs delayed callbacks (heap of deadlines).
+
+    Replaces "start a thread that sleeps N seconds" for every delayed action.
+    Deadlines use time.monotonic().
+
+    Keyed jobs are re-triggerable: scheduling a job with a key that is
+    already pending cancels the old deadline and installs the new one
+    (e.g. every motion event pushes the door-light "off" further out).
+
+    Callbacks run on the scheduler thread and must be short; anything slow
+    should hand off to another queue.
+    """
+
+    _COMPACT_MIN = 64
+
+    def __init__(self):
+        super().__init__(daemon=True, name="scheduler")
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._keys: Dict[Hashable, Job] = {}
+        self._seq = itertools.count()
+        self._stopped = False
+
+        self._executed = 0
+        self._cancelled = 0
+        self._errors = 0
+        self._dead = 0  # cancelled jobs still sitting in the heap
+        self._max_lag_ms = 0.0
+
+    def call_at(self, when: float, fn: Callable[..., Any], *args: Any, key: Optional[Hashable] = None) -> Job:
+        """Run fn(*args) at monotonic time `when`."""
+        job = Job(float(when), fn, args, key)
+        with self._cond:
+            if key is not None:
+                old = self._keys.get(key)
+                if old is not None:
+                    self._cancel_locked(old)
+                self._keys[key] = job
+            heapq.heappush(self._heap, (job.when, next(self._seq), job))
+            if self._heap[0][2] is job:
+                self._cond.notify()
+        return job
+
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any, key: Optional[Hashable] = None) -> Job:
+        """Run fn(*args) after `delay` seconds."""
+        return self.call_at(time.monotonic() + max(0.0, float(delay)), fn, *args, key=key)
+
+    def cancel(self, job_or_key: Any) -> bool:
+        with self._cond:
+            job = job_or_key if isinstance(job_or_key, Job) else self._keys.get(job_or_key)
+            if job is None or job.cancelled or job.popped:
+                return False
+            self._cancel_locked(job)
+            return True
+
+    def is_pending(self, key: Hashable) -> bool:
+        with self._cond:
+            return key in self._keys
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _cancel_locked(self, job: Job) -> None:
+        if job.popped:
+            return  # already ran (or is running); nothing left in the heap
+        job.cancelled = True
+        if job.key is not None and self._keys.get(job.key) is job:
+            del self._keys[job.key]
+        self._cancelled += 1
+        self._dead += 1
+        # Lazy deletion keeps cancel O(1); rebuild once dead entries dominate
+        if self._dead > self._COMPACT_MIN and self._dead * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def _next_job(self) -> Optional[Job]:
+        with self._cond:
+            while not self._stopped:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._dead -= 1
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, job = heapq.heappop(self._heap)
+                job.popped = True
+                if job.key is not None and self._keys.get(job.key) is job:
+                    del self._keys[job.key]
+                return job
+            return None
+
+    def run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            lag_ms = (time.monotonic() - job.when) * 1000.0
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                with self._cond:
+                    self._errors += 1
+                print(f"[SCHED] job error: {e}")
+            with self._cond:
+                self._executed += 1
+                self._max_lag_ms = max(self._max_lag_ms, lag_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._heap) - self._dead,
+                "executed": self._executed,
+                "cancelled": self._cancelled,
+                "errors": self._errors,
+                "max_lag_ms": round(self._max_lag_ms, 2),
+            }
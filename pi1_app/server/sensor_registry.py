@@ -0,0 +1,119 @@
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# handler(code, value, reading)
+SensorHandler = Callable[[str, Any, dict], None]
+
+# Device code (or fnmatch pattern) -> handler name. Overridable from config.
+DEFAULT_ROUTES: Dict[str, str] = {
+    "DS*": "door",
+    "DMS": "pin",
+    "DUS*": "distance",
+    "DPIR*": "motion",
+    "GSG": "gsg",
+    "DHT*": "dht",
+    "BTN": "button",
+    "IR": "ir",
+}
+
+
+def _is_pattern(code: str) -> bool:
+    return any(ch in code for ch in "*?[")
+
+
+def _storage_only(reading: dict) -> bool:
+    # Written to Influx but kept away from state rules (alarms, distance
+    # history), because the value is not a live reading:
+    #  - an edge window summary ("agg", see simulation/utils/aggregator.py)
+    #    carries a past sample
+    #  - a "replayed" reading was spooled on the edge during a broker outage
+    #    and arrives late, possibly after newer events of the same device
+    return isinstance(reading.get("agg"), dict) or bool(reading.get("replayed"))
+
+
+class SensorRegistry:
+    """Maps device codes (exact or fnmatch patterns) to reading handlers.
+
+    Exact codes are a dict lookup. Pattern matches are resolved the first
+    time a code is seen and cached, so dispatch stays O(1) per reading no
+    matter how many devices or patterns are configured. Exact codes win
+    over patterns; among patterns the first registered wins.
+    """
+
+    _MAX_CACHED = 4096
+
+    def __init__(self):
+        self._exact: Dict[str, SensorHandler] = {}
+        self._patterns: List[Tuple[str, SensorHandler]] = []
+        self._resolved: Dict[str, Optional[SensorHandler]] = {}
+
+    @classmethod
+    def from_config(cls, routes: Mapping[str, str], handlers: Mapping[str, SensorHandler]) -> "SensorRegistry":
+        registry = cls()
+        for code, name in routes.items():
+            handler = handlers.get(name)
+            if handler is None:
+                raise ValueError(f"unknown sensor handler '{name}' for '{code}'")
+            registry.register(code, handler)
+        return registry
+
+    def register(self, code: str, handler: SensorHandler) -> None:
+        code = str(code).upper()
+        if _is_pattern(code):
+            self._patterns.append((code, handler))
+        else:
+            self._exact[code] = handler
+        self._resolved.clear()
+
+    def resolve(self, code: str) -> Optional[SensorHandler]:
+        try:
+            return self._resolved[code]
+        except KeyError:
+            pass
+
+        key = code.upper()
+        handler = self._exact.get(key)
+        if handler is None:
+            for pattern, candidate in self._patterns:
+                if fnmatchcase(key, pattern):
+                    handler = candidate
+                    break
+
+        if len(self._resolved) >= self._MAX_CACHED:
+            self._resolved.clear()
+        self._resolved[code] = handler
+        return handler
+
+    def dispatch(self, reading: dict) -> bool:
+        code = reading.get("code")
+        if not code:
+            return False
+        if _storage_only(reading):
+            return False
+        handler = self.resolve(str(code))
+        if handler is None:
+            return False
+        handler(str(code), reading.get("value"), reading)
+        return True
+
+    def dispatch_columns(self, block: dict) -> bool:
+        """Dispatch every value of a columnar block; the handler is resolved once.
+
+        Handlers get a row view of the block whose "ts" is the value's own
+        timestamp (one dict reused for the whole block; do not keep it).
+        """
+        code = block.get("code")
+        if not code:
+            return False
+        if _storage_only(block):
+            return False
+        code = str(code)
+        handler = self.resolve(code)
+        if handler is None:
+            return False
+        row = {k: v for k, v in block.items() if k not in ("ts", "value")}
+        ts = block.get("ts") or ()
+        for i, value in enumerate(block.get("value") or ()):
+            row["ts"] = ts[i] if i < len(ts) else None
+            handler(code, value, row)
+        return True
@@ -0,0 +1,120 @@
+import json
+import queue
+import threading
+from typing import Any, Dict, Iterator, List
+
+from system_state import SystemState
+
+_RESYNC = object()
+
+
+class Subscriber:
+    def __init__(self, max_pending: int):
+        self.q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(max_pending)))
+
+
+class StateBroadcaster(threading.Thread):
+    """Fan-out of SystemState changes to Server-Sent Events clients.
+
+    One thread waits for state changes, builds ONE delta per change and
+    hands the same pre-encoded SSE frame to every subscriber queue, so the
+    cost per change does not grow with the number of open dashboards.
+    Alarm events recorded since the previous frame ride along in the
+    frame's `alarm_events` list.
+
+    A subscriber whose queue is full (slow client) has its backlog dropped
+    and receives a full state again instead of an ever-growing queue.
+    """
+
+    def __init__(self, state: SystemState, max_pending: int = 64, keepalive_sec: float = 15.0):
+        super().__init__(daemon=True, name="state-stream")
+        self._state = state
+        self._max_pending = int(max_pending)
+        self._keepalive = float(keepalive_sec)
+        self._lock = threading.Lock()
+        self._subs: List[Subscriber] = []
+
+        self._broadcasts = 0
+        self._resyncs = 0
+
+    @staticmethod
+    def _frame(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def _fan_out(self, frame: Any) -> None:
+        with self._lock:
+            subs = list(self._subs)
+            self._broadcasts += 1
+        for sub in subs:
+            try:
+                sub.q.put_nowait(frame)
+            except queue.Full:
+                # Slow consumer: drop its backlog and make it resync from a full state
+                while True:
+                    try:
+                        sub.q.get_nowait()
+                    except queue.Empty:
+                        break
+                sub.q.put_nowait(_RESYNC)
+                with self._lock:
+                    self._resyncs += 1
+
+    def run(self) -> None:
+        version = self._state.version
+        last_event_id = self._state.alarm_log.last_id
+        while True:
+            try:
+                # While an entry delay runs, push its countdown once per second
+                live = self._state.serialized_snapshot().etag is None
+                timeout = 1.0 if live else self._keepalive
+                new_version = self._state.wait_for_change(version, timeout=timeout)
+
+                with self._lock:
+                    has_subs = bool(self._subs)
+
+                if new_version == version and not live:
+                    if has_subs:
+                        self._fan_out(": keepalive\n\n")
+                    continue
+
+                events = self._state.alarm_log.query(after=last_event_id, limit=500)["events"]
+                if events:
+                    last_event_id = events[-1]["id"]
+                if has_subs:
+                    delta = self._state.delta_since(version, self._state.epoch)
+                    if events:
+                        delta["alarm_events"] = events
+                    event = "state" if delta.get("full") else "delta"
+                    self._fan_out(self._frame(event, delta))
+                version = new_version
+            except Exception as e:
+                print(f"[SSE] broadcast error: {e}")
+                self._state.wait_for_change(version, timeout=1.0)
+
+    def stream(self) -> Iterator[str]:
+        """Generator for one SSE response: full state first, then deltas."""
+        sub = Subscriber(self._max_pending)
+        with self._lock:
+            self._subs.append(sub)
+        try:
+            # Registered before the snapshot: deltas queued from now on are
+            # relative to a version <= this one, so nothing is missed.
+            yield self._frame("state", self._state.delta_since(-1))
+            while True:
+                item = sub.q.get()
+                if item is _RESYNC:
+                    yield self._frame("state", self._state.delta_since(-1))
+                else:
+                    yield item
+        finally:
+            with self._lock:
+                if sub in self._subs:
+                    self._subs.remove(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subs),
+                "broadcasts": self._broadcasts,
+                "resyncs": self._resyncs,
+            }
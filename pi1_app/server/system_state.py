@@ -1,19 +1,62 @@
+import gzip
+import json
 import threading
 import time
 from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from alarm_log import AlarmEventLog
+from scheduler import Scheduler
+
+
+@dataclass(frozen=True)
+class SerializedSnapshot:
+    """snapshot() rendered once for a given state version (shared, do not mutate)."""
+    version: int
+    data: Dict[str, Any]
+    body: bytes
+    body_gzip: bytes
+    etag: Optional[str]
+
+
+def _reading_ts(ts, default=None) -> float:
+    """Edge timestamp of a reading as float seconds, else `default` / now."""
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return float(ts)
+    return time.time() if default is None else default
+
 
 class SystemState:
-    def __init__(self):
+    def __init__(self, scheduler: Scheduler | None = None):
         self.lock = threading.Lock()
 
+        # All delayed actions (arming, timer ticks) run on one scheduler thread
+        if scheduler is None:
+            scheduler = Scheduler()
+            scheduler.start()
+        self.scheduler = scheduler
+
+        # Change notification: every mutation bumps _version and wakes waiters
+        self._changed = threading.Condition(self.lock)
+        self._version = 0
+        self._snapshot_cache: SerializedSnapshot | None = None
+
+        # Delta tracking: version at which each snapshot field last changed.
+        # `_epoch` identifies this process so clients notice a server restart.
+        self._epoch = int(time.time() * 1000)
+        self._field_versions: Dict[str, int] = {}
+        self._last_built: Dict[str, Any] | None = None
+
         # Alarm
         self.alarm_active = False
         self.system_armed = False
         self.pending_arm = False
         self._arm_delay_sec = 10.0
         self._alarm_reasons = set()
-        self._alarm_events = []
-        self._alarm_event_queue = []
+        # Event history is served by /api/alarm-events, not embedded in snapshot()
+        self.alarm_log = AlarmEventLog(capacity=1000)
+        self._alarm_event_queue: deque = deque(maxlen=1000)  # pending Influx writes
         self.alarm_controls = {
             "door_open_too_long": True,
             "entry_delay_alarm": True,
@@ -54,6 +97,9 @@ class SystemState:
             "DPIR3": 0.0,
         }
         self._motion_debounce_sec = 2.0
+        # distance samples up to this long after the motion event (edge ts)
+        # still count for its direction
+        self._direction_slack_sec = 0.5
 
         # Environment / display / RGB
         self.gsg_alarm_threshold = 20.0
@@ -64,26 +110,62 @@ class SystemState:
         self.brgb_state = False
         self.brgb_color = "#ffffff"
 
+    # -------------------
+    # CHANGE NOTIFICATION
+    # -------------------
+
+    def _touch(self):
+        """Mark state as changed. Caller must hold self.lock."""
+        self._version += 1
+        self._changed.notify_all()
+
+    @property
+    def version(self) -> int:
+        with self.lock:
+            return self._version
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def wait_for_change(self, since_version: int, timeout: float | None = None) -> int:
+        """Block until version != since_version or timeout; returns current version."""
+        with self._changed:
+            if self._version == since_version:
+                self._changed.wait(timeout)
+            return self._version
+
+    def next_rule_deadline(self):
+        """Earliest epoch time at which check_time_rules() can change state (or None)."""
+        with self.lock:
+            deadlines = []
+            if self._entry_delay_start is not None:
+                deadlines.append(self._entry_delay_start + self.entry_delay_sec)
+            if self.alarm_controls.get("door_open_too_long", True):
+                for sensor, open_since in self._door_open_since.items():
+                    if open_since is None or f"{sensor}_open_too_long" in self._alarm_reasons:
+                        continue
+                    deadlines.append(open_since + self.ds_timeout_sec)
+            return min(deadlines) if deadlines else None
+
     # -------------------
     # ALARM
     # -------------------
 
     def _record_alarm_event(self, event: str, reason: str):
-        entry = {"ts": time.time(), "event": event, "reason": reason}
-        self._alarm_events.append(entry)
+        entry = self.alarm_log.append(event, reason)
         self._alarm_event_queue.append(entry)
-        if len(self._alarm_events) > 500:
-            self._alarm_events = self._alarm_events[-250:]
-        if len(self._alarm_event_queue) > 1000:
-            self._alarm_event_queue = self._alarm_event_queue[-500:]
 
     def activate_alarm(self, reason: str = "manual"):
         with self.lock:
-            self._alarm_reasons.add(reason)
+            if reason not in self._alarm_reasons:
+                self._alarm_reasons.add(reason)
+                self._touch()
             if not self.alarm_active:
                 print("ALARM ACTIVATED")
                 self.alarm_active = True
                 self._record_alarm_event("on", reason)
+                self._touch()
 
     def deactivate_alarm(self, reason: str | None = None):
         with self.lock:
@@ -96,11 +178,14 @@ class SystemState:
                 print("ALARM DEACTIVATED")
                 self.alarm_active = False
                 self._record_alarm_event("off", reason or "clear_all")
+            self._touch()
 
     def disarm_system(self):
         with self.lock:
             self.system_armed = False
             self.pending_arm = False
+            self._touch()
+        self.scheduler.cancel("arm")
 
     def set_alarm_control(self, name: str, enabled: bool):
         with self.lock:
@@ -108,6 +193,7 @@ class SystemState:
                 return False
 
             self.alarm_controls[name] = bool(enabled)
+            self._touch()
             if enabled:
                 return True
 
@@ -134,6 +220,7 @@ class SystemState:
                 return {"ok": False, "error": "invalid sensor"}
             with self.lock:
                 self._door_open_since[sensor] = time.time() - self.ds_timeout_sec - 0.2
+                self._touch()
             self.check_time_rules()
             return {"ok": True, "scenario": name, "sensor": sensor}
 
@@ -146,6 +233,7 @@ class SystemState:
                 self.pending_arm = False
                 self._entry_delay_start = time.time() - self.entry_delay_sec - 0.2
                 self._entry_delay_active_for = sensor
+                self._touch()
             self.check_time_rules()
             return {"ok": True, "scenario": name, "sensor": sensor}
 
@@ -156,6 +244,7 @@ class SystemState:
             with self.lock:
                 self.person_count = 0
                 self._last_motion_ts[sensor] = 0.0
+                self._touch()
             self.handle_motion(sensor, True)
             return {"ok": True, "scenario": name, "sensor": sensor}
 
@@ -174,26 +263,29 @@ class SystemState:
             if self.system_armed or self.pending_arm:
                 return
             self.pending_arm = True
+            self._touch()
 
-        def delayed_arm():
-            time.sleep(self._arm_delay_sec)
-            with self.lock:
-                if not self.pending_arm:
-                    return
-                self.system_armed = True
-                self.pending_arm = False
-                print("SYSTEM ARMED")
+        self.scheduler.call_later(self._arm_delay_sec, self._delayed_arm, key="arm")
 
-        threading.Thread(target=delayed_arm, daemon=True).start()
+    def _delayed_arm(self):
+        with self.lock:
+            if not self.pending_arm:
+                return
+            self.system_armed = True
+            self.pending_arm = False
+            self._touch()
+            print("SYSTEM ARMED")
 
     def _check_pin_code(self, entered_pin: str):
         if entered_pin == self.correct_pin:
             # Cancel entry delay if active
-            if self._entry_delay_start is not None:
-                print(f"PIN OK — entry delay cancelled ({self._entry_delay_active_for})")
-                self._entry_delay_start = None
-                self._entry_delay_active_for = None
-            
+            with self.lock:
+                if self._entry_delay_start is not None:
+                    print(f"PIN OK — entry delay cancelled ({self._entry_delay_active_for})")
+                    self._entry_delay_start = None
+                    self._entry_delay_active_for = None
+                    self._touch()
+
             if self.alarm_active:
                 print("PIN OK — deactivating alarm")
                 self.deactivate_alarm()
@@ -240,33 +332,36 @@ class SystemState:
     def person_entered(self):
         with self.lock:
             self.person_count += 1
+            self._touch()
             print("PERSON ENTERED:", self.person_count)
 
     def person_left(self):
         with self.lock:
             if self.person_count > 0:
                 self.person_count -= 1
+                self._touch()
             print("PERSON LEFT:", self.person_count)
 
     def handle_door_sensor(self, sensor: str, value):
-        if sensor not in self._door_open_since:
-            return
-
+        # Any door code routed here is tracked (DS1/DS2 are pre-registered for scenarios)
         active = bool(value)
         now = time.time()
 
         with self.lock:
-            open_since = self._door_open_since[sensor]
+            open_since = self._door_open_since.get(sensor)
             if active:
                 if open_since is None:
                     self._door_open_since[sensor] = now
+                    self._touch()
                 if self.system_armed and self._entry_delay_start is None:
                     # Start entry delay grace period instead of immediate alarm
                     self._entry_delay_start = now
                     self._entry_delay_active_for = sensor
+                    self._touch()
                     print(f"ENTRY DELAY STARTED ({sensor}): {self.entry_delay_sec}s to enter PIN or alarm sounds")
             else:
                 self._door_open_since[sensor] = None
+                self._touch()
                 # If door closes during entry delay, cancel it
                 if self._entry_delay_start is not None and self._entry_delay_active_for == sensor:
                     print(f"Entry delay cancelled ({sensor} closed)")
@@ -294,6 +389,7 @@ class SystemState:
                             self._record_alarm_event("on", f"{sensor}_armed")
                     self._entry_delay_start = None
                     self._entry_delay_active_for = None
+                    self._touch()
             
             # Check DS timeout (door open too long)
             for sensor, open_since in self._door_open_since.items():
@@ -301,41 +397,111 @@ class SystemState:
                     continue
 
                 if now - open_since >= self.ds_timeout_sec and self.alarm_controls.get("door_open_too_long", True):
-                    self._alarm_reasons.add(f"{sensor}_open_too_long")
+                    reason = f"{sensor}_open_too_long"
+                    if reason not in self._alarm_reasons:
+                        self._alarm_reasons.add(reason)
+                        self._touch()
                     if not self.alarm_active:
                         print("ALARM ACTIVATED")
                         self.alarm_active = True
                         self._record_alarm_event("on", f"{sensor}_open_too_long")
+                        self._touch()
 
     def snapshot(self):
         with self.lock:
-            now = time.time()
-            entry_delay_remaining = 0
-            if self._entry_delay_start is not None:
-                remaining = self.entry_delay_sec - (now - self._entry_delay_start)
-                entry_delay_remaining = max(0, remaining)
-            
-            return {
-                "alarm_active": self.alarm_active,
-                "system_armed": self.system_armed,
-                "pending_arm": self.pending_arm,
-                "entry_delay_active": self._entry_delay_start is not None,
-                "entry_delay_remaining": entry_delay_remaining,
-                "entry_delay_sensor": self._entry_delay_active_for,
-                "alarm_controls": dict(self.alarm_controls),
-                "person_count": self.person_count,
-                "alarm_reasons": sorted(self._alarm_reasons),
-                "alarm_events": list(self._alarm_events[-100:]),
-                "door_open_since": dict(self._door_open_since),
-                "timer_seconds": self.timer_seconds,
-                "timer_running": self.timer_running,
-                "timer_blink": self._timer_blink,
-                "timer_add_step": self.timer_add_step,
-                "dht_values": dict(self.dht_values),
-                "lcd_text": self.lcd_text,
-                "brgb_state": self.brgb_state,
-                "brgb_color": self.brgb_color,
-            }
+            return self._snapshot_locked()
+
+    def serialized_snapshot(self) -> SerializedSnapshot:
+        """Snapshot + JSON + gzip, rebuilt only when the state version changes.
+
+        While an entry delay is running `entry_delay_remaining` changes with
+        wall time, so that state is never cached and gets no ETag. The ETag
+        is "<epoch>-<version>": versions restart at 0 with the process, so
+        the epoch keeps an old client's If-None-Match from matching a
+        different state after a server restart.
+        """
+        with self.lock:
+            cached = self._snapshot_cache
+            live = self._entry_delay_start is not None
+            if cached is not None and cached.version == self._version and not live:
+                return cached
+            version = self._version
+            data = self._snapshot_locked()
+            self._track_changes(version, data)
+
+        body = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        entry = SerializedSnapshot(
+            version=version,
+            data=data,
+            body=body,
+            body_gzip=gzip.compress(body, compresslevel=6),
+            etag=None if live else f"{self._epoch}-{version}",
+        )
+        if not live:
+            with self.lock:
+                if self._version == version:
+                    self._snapshot_cache = entry
+        return entry
+
+    def _track_changes(self, version: int, data: Dict[str, Any]):
+        """Stamp fields that differ from the previous build. Caller holds self.lock."""
+        prev = self._last_built
+        for key, value in data.items():
+            if prev is None or prev.get(key) != value:
+                self._field_versions[key] = version
+        self._last_built = data
+
+    def delta_since(self, since: int, epoch: int | None = None) -> Dict[str, Any]:
+        """Fields changed after `since` (a version from an earlier response).
+
+        If `since` is unknown (future version or other epoch) the full state
+        is returned; since=-1 always asks for the full state.
+        """
+        snap = self.serialized_snapshot()
+        data = snap.data
+        with self.lock:
+            base = {"version": snap.version, "epoch": self._epoch}
+            stale = (
+                since < 0
+                or since > snap.version
+                or (epoch is not None and epoch != self._epoch)
+            )
+            if stale:
+                return {**base, "full": True, "state": data}
+
+            changed = {k: v for k, v in data.items() if self._field_versions.get(k, 0) > since}
+
+        if data.get("entry_delay_active"):
+            changed["entry_delay_remaining"] = data["entry_delay_remaining"]
+        return {**base, "full": False, "changed": changed}
+
+    def _snapshot_locked(self):
+        now = time.time()
+        entry_delay_remaining = 0
+        if self._entry_delay_start is not None:
+            remaining = self.entry_delay_sec - (now - self._entry_delay_start)
+            entry_delay_remaining = max(0, remaining)
+
+        return {
+            "alarm_active": self.alarm_active,
+            "system_armed": self.system_armed,
+            "pending_arm": self.pending_arm,
+            "entry_delay_active": self._entry_delay_start is not None,
+            "entry_delay_remaining": entry_delay_remaining,
+            "entry_delay_sensor": self._entry_delay_active_for,
+            "alarm_controls": dict(self.alarm_controls),
+            "person_count": self.person_count,
+            "alarm_reasons": sorted(self._alarm_reasons),
+            "door_open_since": dict(self._door_open_since),
+            "timer_seconds": self.timer_seconds,
+            "timer_running": self.timer_running,
+            "timer_blink": self._timer_blink,
+            "timer_add_step": self.timer_add_step,
+            "dht_values": dict(self.dht_values),
+            "lcd_text": self.lcd_text,
+            "brgb_state": self.brgb_state,
+            "brgb_color": self.brgb_color,
+        }
 
     def pop_alarm_events(self):
         with self.lock:
@@ -345,18 +511,28 @@ class SystemState:
             self._alarm_event_queue.clear()
             return events
 
-    def update_distance(self, sensor: str, value):
-        if sensor not in self._distance_history:
-            return
+    def update_distance(self, sensor: str, value, ts=None):
+        """`ts` is the reading's edge timestamp (arrival time if missing)."""
         try:
             dist = float(value)
         except Exception:
             return
+        t = _reading_ts(ts)
         with self.lock:
-            self._distance_history[sensor].append((time.time(), dist))
-
-    def _infer_direction(self, dus_sensor: str):
-        hist = list(self._distance_history.get(dus_sensor, []))
+            hist = self._distance_history.get(sensor)
+            if hist is None:
+                hist = self._distance_history[sensor] = deque(maxlen=8)
+            hist.append((t, dist))
+            if len(hist) > 1 and t < hist[-2][0]:
+                # arrived out of order (e.g. separate MQTT batches)
+                self._distance_history[sensor] = deque(sorted(hist), maxlen=8)
+
+    def _infer_direction(self, dus_sensor: str, at: float):
+        # DUS and DPIR timestamps come from the same edge clock, so the
+        # samples taken before the motion are picked by ts, not arrival order
+        with self.lock:
+            hist = [(t, v) for t, v in self._distance_history.get(dus_sensor, ())
+                    if t <= at + self._direction_slack_sec]
         if len(hist) < 4:
             return None
 
@@ -371,22 +547,21 @@ class SystemState:
             return "exit"
         return None
 
-    def handle_motion(self, sensor: str, value):
-        if sensor not in self._last_motion_ts:
-            return {"direction": None, "trigger_dl": False}
-
+    def handle_motion(self, sensor: str, value, ts=None):
         active = bool(value)
         if not active:
             return {"direction": None, "trigger_dl": False}
 
         now = time.time()
+        at = _reading_ts(ts, now)
         with self.lock:
-            if now - self._last_motion_ts[sensor] < self._motion_debounce_sec:
+            if now - self._last_motion_ts.get(sensor, 0.0) < self._motion_debounce_sec:
                 return {"direction": None, "trigger_dl": False}
             self._last_motion_ts[sensor] = now
 
-        dus_sensor = "DUS1" if sensor == "DPIR1" else "DUS2" if sensor == "DPIR2" else None
-        direction = self._infer_direction(dus_sensor) if dus_sensor else None
+        # DPIR<n> is paired with DUS<n> (if that ultrasonic sensor reports)
+        dus_sensor = "DUS" + sensor[len("DPIR"):] if sensor.startswith("DPIR") else None
+        direction = self._infer_direction(dus_sensor, at) if dus_sensor else None
 
         if direction == "enter":
             self.person_entered()
@@ -400,6 +575,7 @@ class SystemState:
                     print("ALARM ACTIVATED")
                     self.alarm_active = True
                     self._record_alarm_event("on", "motion_empty_house")
+                self._touch()
 
         return {"direction": direction, "trigger_dl": sensor == "DPIR1"}
 
@@ -413,22 +589,25 @@ class SystemState:
             self.activate_alarm("gsg_tilt")
 
     def update_dht(self, sensor: str, value):
-        if sensor not in {"DHT1", "DHT2", "DHT3"}:
-            return
         if not isinstance(value, dict):
             return
         with self.lock:
+            if sensor not in self._lcd_order:
+                self._lcd_order = sorted(self._lcd_order + [sensor])
             self.dht_values[sensor] = {
                 "temperature_c": value.get("temperature_c"),
                 "humidity_pct": value.get("humidity_pct"),
                 "ts": time.time(),
             }
+            self._touch()
 
     def next_lcd_text(self):
         with self.lock:
             available = [key for key in self._lcd_order if key in self.dht_values]
             if not available:
-                self.lcd_text = "No DHT data"
+                if self.lcd_text != "No DHT data":
+                    self.lcd_text = "No DHT data"
+                    self._touch()
                 return self.lcd_text
 
             pick = available[self._lcd_index % len(available)]
@@ -437,11 +616,13 @@ class SystemState:
             t = d.get("temperature_c")
             h = d.get("humidity_pct")
             self.lcd_text = f"{pick} T:{t}C H:{h}%"
+            self._touch()
             return self.lcd_text
 
     def set_timer_add_step(self, seconds: int):
         with self.lock:
             self.timer_add_step = max(1, int(seconds))
+            self._touch()
 
     def handle_btn(self, pressed):
         if not bool(pressed):
@@ -449,6 +630,7 @@ class SystemState:
         with self.lock:
             add = self.timer_add_step
             self._timer_blink = False
+            self._touch()
         self.add_timer_seconds(add)
 
     def set_brgb(self, state: bool | None = None, color: str | None = None):
@@ -457,6 +639,7 @@ class SystemState:
                 self.brgb_state = bool(state)
             if color:
                 self.brgb_color = str(color)
+            self._touch()
 
     def apply_ir(self, value):
         if isinstance(value, dict):
@@ -473,6 +656,7 @@ class SystemState:
         elif cmd in {"toggle", "power"}:
             with self.lock:
                 self.brgb_state = not self.brgb_state
+                self._touch()
         elif cmd.startswith("color:"):
             self.set_brgb(state=True, color=cmd.split(":", 1)[1])
         elif color:
@@ -482,14 +666,18 @@ class SystemState:
         with self.lock:
             self.timer_seconds = max(0, int(seconds))
             self._timer_blink = False
+            self._touch()
 
     def add_timer_seconds(self, seconds: int):
         with self.lock:
             self.timer_seconds = max(0, self.timer_seconds + int(seconds))
+            self._touch()
 
     def stop_timer(self):
         with self.lock:
             self.timer_running = False
+            self._touch()
+        self.scheduler.cancel("kitchen_timer")
 
     def start_timer(self):
         with self.lock:
@@ -497,25 +685,30 @@ class SystemState:
                 return
             self.timer_running = True
             self._timer_blink = False
+            self._touch()
+
+        due = time.monotonic() + 1.0
+        self.scheduler.call_at(due, self._timer_tick, due, key="kitchen_timer")
 
-        def loop():
-            while True:
-                time.sleep(1.0)
-                with self.lock:
-                    if not self.timer_running:
-                        return
+    def _timer_tick(self, due: float):
+        with self.lock:
+            if not self.timer_running:
+                return
 
-                    if self.timer_seconds > 0:
-                        self.timer_seconds -= 1
+            if self.timer_seconds > 0:
+                self.timer_seconds -= 1
+            self._touch()
 
-                    if self.timer_seconds <= 0:
-                        self.timer_seconds = 0
-                        self.timer_running = False
-                        self._timer_blink = True
-                        return
+            if self.timer_seconds <= 0:
+                self.timer_seconds = 0
+                self.timer_running = False
+                self._timer_blink = True
+                return
 
-        threading.Thread(target=loop, daemon=True).start()
+        # Fixed-rate: next tick is relative to the previous deadline, not to "now"
+        self.scheduler.call_at(due + 1.0, self._timer_tick, due + 1.0, key="kitchen_timer")
 
     def ack_timer_blink(self):
         with self.lock:
-            self._timer_blink = False
\ No newline at end of file
+            self._timer_blink = False
+            self._touch()
\ No newline at end of file
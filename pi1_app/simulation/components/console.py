@@ -6,10 +6,11 @@ HELP = """Komande:
   led on|off|toggle|status
   buzzer on|off|beep <ms> <count>|status
   status
+  sched
   exit
 """
 
-def run_console(led: Any, buzzer: Any, state: SharedState, pi_id: str = "PI1"):
+def run_console(led: Any, buzzer: Any, state: SharedState, pi_id: str = "PI1", scheduler: Optional[Any] = None):
     print(f"\n--- {pi_id} Console Control ---")
     print(HELP)
     pending = None  # holds a command word awaiting args
@@ -50,6 +51,16 @@ def run_console(led: Any, buzzer: Any, state: SharedState, pi_id: str = "PI1"):
                     print(f"{k}: {v}")
             continue
 
+        if cmd == "sched":
+            if scheduler is None:
+                print("Scheduler nije uključen (sensor_mode: scheduler)"); continue
+            st = scheduler.stats()
+            print(f"events: {st['posted']} (lat avg {st['post_latency_avg_ms']} ms, max {st['post_latency_max_ms']} ms)")
+            for code, d in st["devices"].items():
+                print(f"{code}: every {d['period_s']}s runs={d['runs']} missed={d['missed']} "
+                      f"jitter avg={d['jitter_avg_ms']}ms max={d['jitter_max_ms']}ms")
+            continue
+
         if cmd == "led":
             if led is None:
                 print("LED (DL) nije omogućen u settings.json"); continue
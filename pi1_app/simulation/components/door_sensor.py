@@ -5,7 +5,7 @@ from utils.printing import banner
 from utils.state import SharedState
 from utils.device_payload import build_payload
 
-from simulators.button import run_button_simulator
+from simulators.button import button_simulator_step, run_button_simulator
 
 
 def ds1_callback(pressed: bool, code: str, device_name: str, simulated: bool, topic: Optional[str],
@@ -20,7 +20,7 @@ def ds1_callback(pressed: bool, code: str, device_name: str, simulated: bool, to
 
 
 def run_ds1(settings: dict, threads: list, stop_event: threading.Event, state: SharedState,
-            pi_id: str = "PI1", batch_sender=None):
+            pi_id: str = "PI1", batch_sender=None, scheduler=None):
     if not settings.get("enabled", True):
         return
 
@@ -32,6 +32,22 @@ def run_ds1(settings: dict, threads: list, stop_event: threading.Event, state: S
 
     cb = lambda v, c: ds1_callback(v, c, device_name, simulated, topic, pi_id, batch_sender, state)
 
+    if scheduler is not None:
+        if simulated:
+            scheduler.every(code, poll_s, button_simulator_step(cb, code))
+        else:
+            from sensors.button import ButtonSensor, watch_button
+
+            sensor = ButtonSensor(
+                pin=int(settings["pin"]),
+                pull=settings.get("pull", "UP"),
+                invert=settings.get("invert"),
+            )
+            watch_button(sensor, poll_s, cb, code, scheduler,
+                         use_events=bool(settings.get("use_events", True)),
+                         bouncetime_ms=int(settings.get("debounce_ms", 150)))
+        return
+
     if simulated:
         t = threading.Thread(target=run_button_simulator, args=(poll_s, cb, stop_event, code), daemon=True)
     else:
@@ -6,21 +6,51 @@ from typing import Optional
 from utils.printing import banner
 from utils.state import SharedState
 from utils.device_payload import build_payload
+from utils.report_filter import ReportFilter
+from utils.aggregator import WindowAggregator, route_sample
 
 
 def _emit_value(value, code: str, device_name: str, simulated: bool, topic: Optional[str],
-                pi_id: str, batch_sender, state: SharedState, extra: Optional[dict] = None):
+                pi_id: str, batch_sender, state: SharedState, extra: Optional[dict] = None,
+                report_filter: Optional[ReportFilter] = None, aggregator: Optional[WindowAggregator] = None):
     banner(code)
     print(f"Value: {value}")
     state.set(code, {"value": value})
 
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        send_raw, window = route_sample(value, aggregator, report_filter)
+    else:
+        send_raw, window = report_filter is None or report_filter.should_send(value), None
+
     if batch_sender is not None and topic:
-        payload = build_payload(pi_id, code, device_name, value, simulated, extra=extra or {})
-        batch_sender.enqueue(topic, payload)
+        if window is not None:
+            agg = {k: v for k, v in window.items() if k != "last"}
+            payload = build_payload(pi_id, code, device_name, window["last"], simulated,
+                                    extra={**(extra or {}), "agg": agg})
+            batch_sender.enqueue(topic, payload)
+        if send_raw:
+            payload = build_payload(pi_id, code, device_name, value, simulated, extra=extra or {})
+            batch_sender.enqueue(topic, payload)
+
+
+def _start_polling(step, code: str, poll_s: float, threads: list, stop_event: threading.Event, scheduler=None):
+    """Run `step` every `poll_s`: on the shared scheduler if given, else on its own thread."""
+    if scheduler is not None:
+        scheduler.every(code, poll_s, step)
+        return
+
+    def loop():
+        while not stop_event.is_set():
+            step()
+            time.sleep(poll_s)
+
+    t = threading.Thread(target=loop, daemon=True)
+    t.start()
+    threads.append(t)
 
 
 def run_dht(settings: dict, threads: list, stop_event: threading.Event, state: SharedState,
-            pi_id: str = "PI1", batch_sender=None):
+            pi_id: str = "PI1", batch_sender=None, scheduler=None):
     if not settings.get("enabled", True):
         return
 
@@ -34,36 +64,34 @@ def run_dht(settings: dict, threads: list, stop_event: threading.Event, state: S
     temp_max = float(settings.get("temp_max", 28.0))
     hum_min = float(settings.get("hum_min", 30.0))
     hum_max = float(settings.get("hum_max", 65.0))
-
-    def loop():
-        while not stop_event.is_set():
-            temperature = round(random.uniform(temp_min, temp_max), 1)
-            humidity = round(random.uniform(hum_min, hum_max), 1)
-
-            payload_value = {
-                "temperature_c": temperature,
-                "humidity_pct": humidity,
-            }
-            _emit_value(
-                payload_value,
-                code,
-                device_name,
-                simulated,
-                topic,
-                pi_id,
-                batch_sender,
-                state,
-                extra={"kind": "dht"},
-            )
-            time.sleep(poll_s)
-
-    t = threading.Thread(target=loop, daemon=True)
-    t.start()
-    threads.append(t)
+    report_filter = ReportFilter.from_settings(settings)
+
+    def step():
+        temperature = round(random.uniform(temp_min, temp_max), 1)
+        humidity = round(random.uniform(hum_min, hum_max), 1)
+
+        payload_value = {
+            "temperature_c": temperature,
+            "humidity_pct": humidity,
+        }
+        _emit_value(
+            payload_value,
+            code,
+            device_name,
+            simulated,
+            topic,
+            pi_id,
+            batch_sender,
+            state,
+            extra={"kind": "dht"},
+            report_filter=report_filter,
+        )
+
+    _start_polling(step, code, poll_s, threads, stop_event, scheduler)
 
 
 def run_gsg(settings: dict, threads: list, stop_event: threading.Event, state: SharedState,
-            pi_id: str = "PI1", batch_sender=None):
+            pi_id: str = "PI1", batch_sender=None, scheduler=None):
     if not settings.get("enabled", True):
         return
 
@@ -77,34 +105,34 @@ def run_gsg(settings: dict, threads: list, stop_event: threading.Event, state: S
     spike_chance = float(settings.get("spike_chance", 0.08))
     spike_min = float(settings.get("spike_min_deg", 20.0))
     spike_max = float(settings.get("spike_max_deg", 55.0))
-
-    def loop():
-        while not stop_event.is_set():
-            if random.random() < spike_chance:
-                movement = round(random.uniform(spike_min, spike_max), 2)
-            else:
-                movement = round(random.uniform(0.0, base_jitter), 2)
-
-            _emit_value(
-                movement,
-                code,
-                device_name,
-                simulated,
-                topic,
-                pi_id,
-                batch_sender,
-                state,
-                extra={"unit": "deg", "kind": "gyro"},
-            )
-            time.sleep(poll_s)
-
-    t = threading.Thread(target=loop, daemon=True)
-    t.start()
-    threads.append(t)
+    report_filter = ReportFilter.from_settings(settings)
+    aggregator = WindowAggregator.from_settings(settings)
+
+    def step():
+        if random.random() < spike_chance:
+            movement = round(random.uniform(spike_min, spike_max), 2)
+        else:
+            movement = round(random.uniform(0.0, base_jitter), 2)
+
+        _emit_value(
+            movement,
+            code,
+            device_name,
+            simulated,
+            topic,
+            pi_id,
+            batch_sender,
+            state,
+            extra={"unit": "deg", "kind": "gyro"},
+            report_filter=report_filter,
+            aggregator=aggregator,
+        )
+
+    _start_polling(step, code, poll_s, threads, stop_event, scheduler)
 
 
 def run_ir(settings: dict, threads: list, stop_event: threading.Event, state: SharedState,
-           pi_id: str = "PI1", batch_sender=None):
+           pi_id: str = "PI1", batch_sender=None, scheduler=None):
     if not settings.get("enabled", True):
         return
 
@@ -117,17 +145,13 @@ def run_ir(settings: dict, threads: list, stop_event: threading.Event, state: Sh
     colors = settings.get("colors", ["#ff0000", "#00ff00", "#0000ff", "#ffffff"])
     cmds = settings.get("commands", ["toggle", "color", "off", "on"])
 
-    def loop():
-        while not stop_event.is_set():
-            cmd = random.choice(cmds)
-            if cmd == "color":
-                value = {"command": "color", "color": random.choice(colors)}
-            else:
-                value = {"command": cmd}
+    def step():
+        cmd = random.choice(cmds)
+        if cmd == "color":
+            value = {"command": "color", "color": random.choice(colors)}
+        else:
+            value = {"command": cmd}
 
-            _emit_value(value, code, device_name, simulated, topic, pi_id, batch_sender, state, extra={"kind": "ir"})
-            time.sleep(poll_s)
+        _emit_value(value, code, device_name, simulated, topic, pi_id, batch_sender, state, extra={"kind": "ir"})
 
-    t = threading.Thread(target=loop, daemon=True)
-    t.start()
-    threads.append(t)
+    _start_polling(step, code, poll_s, threads, stop_event, scheduler)
@@ -5,7 +5,7 @@ from utils.printing import banner
 from utils.state import SharedState
 from utils.device_payload import build_payload
 
-from simulators.membrane_switch import run_membrane_simulator
+from simulators.membrane_switch import membrane_simulator_step, run_membrane_simulator
 
 
 def dms_callback(
@@ -34,6 +34,7 @@ def run_dms(
     state: SharedState,
     pi_id: str = "PI1",
     batch_sender=None,
+    scheduler=None,
 ):
     if not settings.get("enabled", True):
         return
@@ -48,19 +49,32 @@ def run_dms(
     cb = lambda v, c: dms_callback(v, c, device_name, simulated, topic, pi_id, batch_sender, state)
 
     if simulated:
+        if scheduler is not None:
+            scheduler.every(code, poll_s, membrane_simulator_step(keys, cb, code))
+            return
         t = threading.Thread(target=run_membrane_simulator, args=(poll_s, keys, cb, stop_event, code), daemon=True)
     else:
+        # the keypad thread sleeps on its column interrupt; in scheduler mode
+        # only the key presses are handed to the loop
+        if scheduler is not None:
+            post_cb = cb
+            cb = lambda v, c: scheduler.post(post_cb, v, c)
+
         from sensors.membrane_switch import run_membrane_switch_loop
 
         row_pins = settings.get("row_pins", [])
         col_pins = settings.get("col_pins", [])
         keymap = settings.get("keymap", [["1","2","3","A"],["4","5","6","B"],["7","8","9","C"],["*","0","#","D"]])
-        debounce_ms = int(settings.get("debounce_ms", 200))
+        debounce_ms = int(settings.get("debounce_ms", 30))
 
         t = threading.Thread(
             target=run_membrane_switch_loop,
             args=(row_pins, col_pins, keymap, poll_s, cb, stop_event, code),
-            kwargs={"debounce_ms": debounce_ms},
+            kwargs={
+                "debounce_ms": debounce_ms,
+                "use_events": bool(settings.get("edge_detect", True)),
+                "scan_ms": float(settings.get("scan_ms", 10)),
+            },
             daemon=True,
         )
 
@@ -5,7 +5,7 @@ from utils.printing import banner
 from utils.state import SharedState
 from utils.device_payload import build_payload
 
-from simulators.pir import run_pir_simulator
+from simulators.pir import pir_simulator_step, run_pir_simulator
 
 def pir_callback(motion: bool, code: str, device_name: str, simulated: bool, topic: Optional[str],
                  pi_id: str, batch_sender, state: SharedState):
@@ -18,7 +18,7 @@ def pir_callback(motion: bool, code: str, device_name: str, simulated: bool, top
         batch_sender.enqueue(topic, payload)
 
 def run_dpir1(settings: dict, threads: list, stop_event: threading.Event, state: SharedState,
-              pi_id: str = "PI1", batch_sender=None):
+              pi_id: str = "PI1", batch_sender=None, scheduler=None):
     if not settings.get("enabled", True):
         return
     code = settings.get("code", "DPIR1")
@@ -29,6 +29,15 @@ def run_dpir1(settings: dict, threads: list, stop_event: threading.Event, state:
 
     cb = lambda v, c: pir_callback(v, c, device_name, simulated, topic, pi_id, batch_sender, state)
 
+    if scheduler is not None:
+        if simulated:
+            scheduler.every(code, poll_s, pir_simulator_step(cb, code))
+        else:
+            from sensors.pir import PirSensor, watch_pir
+            sensor = PirSensor(int(settings["pin"]), pull=settings.get("pull"))
+            watch_pir(sensor, poll_s, cb, code, scheduler, use_events=bool(settings.get("use_events", True)))
+        return
+
     if simulated:
         t = threading.Thread(target=run_pir_simulator, args=(poll_s, cb, stop_event, code), daemon=True)
     else:
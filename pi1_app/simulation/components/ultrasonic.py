@@ -4,21 +4,31 @@ from typing import Optional
 from utils.printing import banner
 from utils.state import SharedState
 from utils.device_payload import build_payload
+from utils.report_filter import ReportFilter
+from utils.aggregator import WindowAggregator, route_sample
 
-from simulators.ultrasonic import run_ultrasonic_simulator
+from simulators.ultrasonic import run_ultrasonic_simulator, ultrasonic_simulator_step
 
 def dus_callback(distance_cm: float, code: str, device_name: str, simulated: bool, topic: Optional[str],
-                 pi_id: str, batch_sender, state: SharedState):
+                 pi_id: str, batch_sender, state: SharedState, report_filter: Optional[ReportFilter] = None,
+                 aggregator: Optional[WindowAggregator] = None):
     banner(code)
     print(f"Distance: {distance_cm:.1f} cm")
     state.set(code, {"distance_cm": float(distance_cm)})
 
+    send_raw, window = route_sample(float(distance_cm), aggregator, report_filter)
     if batch_sender is not None and topic:
-        payload = build_payload(pi_id, code, device_name, float(distance_cm), simulated, extra={"unit": "cm", "kind": "ultrasonic"})
-        batch_sender.enqueue(topic, payload)
+        extra = {"unit": "cm", "kind": "ultrasonic"}
+        if window is not None:
+            agg = {k: v for k, v in window.items() if k != "last"}
+            payload = build_payload(pi_id, code, device_name, float(window["last"]), simulated, extra={**extra, "agg": agg})
+            batch_sender.enqueue(topic, payload)
+        if send_raw:
+            payload = build_payload(pi_id, code, device_name, float(distance_cm), simulated, extra=extra)
+            batch_sender.enqueue(topic, payload)
 
 def run_dus1(settings: dict, threads: list, stop_event: threading.Event, state: SharedState,
-             pi_id: str = "PI1", batch_sender=None):
+             pi_id: str = "PI1", batch_sender=None, scheduler=None):
     if not settings.get("enabled", True):
         return
     code = settings.get("code", "DUS1")
@@ -26,14 +36,32 @@ def run_dus1(settings: dict, threads: list, stop_event: threading.Event, state:
     simulated = bool(settings.get("simulated", False))
     device_name = settings.get("device_name", "Door Ultrasonic Sensor")
     topic = settings.get("topic")
+    report_filter = ReportFilter.from_settings(settings)
+    aggregator = WindowAggregator.from_settings(settings)
 
-    cb = lambda v, c: dus_callback(v, c, device_name, simulated, topic, pi_id, batch_sender, state)
+    cb = lambda v, c: dus_callback(v, c, device_name, simulated, topic, pi_id, batch_sender, state,
+                                   report_filter, aggregator)
 
     if simulated:
+        if scheduler is not None:
+            scheduler.every(code, poll_s, ultrasonic_simulator_step(cb, code))
+            return
         t = threading.Thread(target=run_ultrasonic_simulator, args=(poll_s, cb, stop_event, code), daemon=True)
     else:
+        # a ping blocks for up to tens of ms, so the real sensor keeps its own
+        # thread; in scheduler mode only its readings are handed to the loop
+        if scheduler is not None:
+            post_cb = cb
+            cb = lambda v, c: scheduler.post(post_cb, v, c)
         from sensors.ultrasonic import UltrasonicSensor, run_ultrasonic_loop
-        sensor = UltrasonicSensor(settings["trigger_pin"], settings["echo_pin"])
+        sensor = UltrasonicSensor(
+            settings["trigger_pin"], settings["echo_pin"],
+            use_events=bool(settings.get("edge_timing", True)),
+            burst=int(settings.get("burst", 1)),
+            burst_gap_s=float(settings.get("burst_gap_s", 0.06)),
+            max_dev_cm=float(settings.get("max_dev_cm", 5.0)),
+            max_range_cm=float(settings.get("max_range_cm", 400.0)),
+        )
         t = threading.Thread(target=run_ultrasonic_loop, args=(sensor, poll_s, cb, stop_event, code), daemon=True)
     t.start()
     threads.append(t)
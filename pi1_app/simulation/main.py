@@ -14,30 +14,32 @@ from components.environment import run_dht, run_gsg, run_ir
 from components.led import build_led
 from components.buzzer import build_buzzer
 from components.console import run_console
+from utils.scheduler import MODE_SCHEDULER, SENSOR_MODES, SensorScheduler
 
 
 def start_sensors(devices: dict, threads: list, stop_event: threading.Event, state: SharedState,
-                  pi_id: str, batch_sender=None):
+                  pi_id: str, batch_sender=None, scheduler=None):
+    """Start every enabled device: one thread each, or on `scheduler` if given."""
     for code, cfg in devices.items():
         settings = dict(cfg)
         settings["code"] = code
 
         if code.startswith("DS"):
-            run_ds1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_ds1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code.startswith("DPIR"):
-            run_dpir1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_dpir1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code.startswith("DUS"):
-            run_dus1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_dus1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code == "DMS":
-            run_dms(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_dms(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code == "BTN":
-            run_ds1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_ds1(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code.startswith("DHT"):
-            run_dht(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_dht(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code == "GSG":
-            run_gsg(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_gsg(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
         elif code == "IR":
-            run_ir(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+            run_ir(settings, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
 
 
 if __name__ == "__main__":
@@ -59,6 +61,10 @@ if __name__ == "__main__":
     mqtt_client = None
     batch_sender = None
 
+    sensor_mode = str(os.getenv("SIM_SENSOR_MODE") or global_cfg.get("sensor_mode", "threads")).lower()
+    if sensor_mode not in SENSOR_MODES:
+        print(f"[SCHED] unknown sensor_mode '{sensor_mode}', using threads")
+
     # KT2: optional MQTT + batch sender
     mqtt_cfg = global_cfg.get("mqtt") or {}
     mqtt_enabled = bool(mqtt_cfg.get("enabled", False))
@@ -67,15 +73,48 @@ if __name__ == "__main__":
         try:
             from utils.mqtt_client import MQTTClient
             from utils.batch_sender import BatchSender
+            from utils.codec import get_codec
+            from utils.wire import resolve_compression, resolve_format
+            from utils.spool import EdgeSpool
 
             broker = mqtt_cfg.get("broker", "localhost")
             port = int(mqtt_cfg.get("port", 1883))
             interval = float(mqtt_cfg.get("batch_interval_sec", 5))
 
-            mqtt_client = MQTTClient(broker, port=port, client_id=f"{pi_id.lower()}-app")
-            batch_sender = BatchSender(mqtt_client, batch_interval_sec=interval)
+            codec = get_codec(mqtt_cfg.get("json_codec"))
+            batch_format = resolve_format(mqtt_cfg.get("batch_format"))
+            compressor = resolve_compression(mqtt_cfg)
+
+            # store-and-forward while the broker is unreachable
+            spool_cfg = mqtt_cfg.get("spool") or {}
+            spool = None
+            if spool_cfg.get("enabled", True):
+                spool_dir = spool_cfg.get("dir") or f"spool_{pi_id.lower()}"
+                spool = EdgeSpool(
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), spool_dir),
+                    segment_bytes=int(float(spool_cfg.get("segment_kb", 512)) * 1024),
+                    max_bytes=int(float(spool_cfg.get("max_mb", 32)) * 1024 * 1024),
+                )
+
+            mqtt_client = MQTTClient(broker, port=port, client_id=f"{pi_id.lower()}-app", codec=codec,
+                                     batch_format=batch_format, compressor=compressor,
+                                     spool=spool, replay_rate=float(spool_cfg.get("replay_rate", 20)))
+            layout = str(mqtt_cfg.get("batch_layout", "rows")).lower()
+            batch_sender = BatchSender(mqtt_client, batch_interval_sec=interval,
+                                       max_batch=int(mqtt_cfg.get("max_batch", 500)),
+                                       columnar=(layout == "columnar"),
+                                       max_queue=int(mqtt_cfg.get("max_queue", 10000)),
+                                       overflow=mqtt_cfg.get("overflow", "drop_oldest"),
+                                       priorities={code: cfg.get("priority", "bulk") for code, cfg in devices.items()},
+                                       critical_interval_sec=float(mqtt_cfg.get("critical_interval_sec", 0.01)),
+                                       critical_max_batch=int(mqtt_cfg.get("critical_max_batch", 50)),
+                                       # every device shares the scheduler thread: never block it
+                                       block_timeout_sec=(float(mqtt_cfg.get("scheduler_block_timeout_sec", 0.005))
+                                                          if sensor_mode == MODE_SCHEDULER else None))
             batch_sender.start()
-            print(f"[MQTT] enabled -> broker={broker}:{port} batch_interval={interval}s")
+            print(f"[MQTT] enabled -> broker={broker}:{port} batch_interval={interval}s "
+                  f"codec={codec.name} format={batch_format} layout={layout} "
+                  f"compression={compressor.algo if compressor else 'off'} spool={'on' if spool else 'off'}")
         except Exception as e:
             print(f"[MQTT] FAILED to start MQTT/batch sender: {e}")
             mqtt_client = None
@@ -156,15 +195,22 @@ if __name__ == "__main__":
         mqtt_client.subscribe_prefix(cmd_prefix, handle_cmd)
         print(f"[MQTT] command listener ON -> {cmd_prefix}/#")
 
-    # Start sensors threads
-    start_sensors(devices, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender)
+    # Start sensors: a thread per device, or one scheduler thread for all
+    scheduler = SensorScheduler() if sensor_mode == MODE_SCHEDULER else None
+    start_sensors(devices, threads, stop_event, state, pi_id=pi_id, batch_sender=batch_sender, scheduler=scheduler)
+    if scheduler is not None:
+        scheduler.start()
+        print(f"[SCHED] sensor scheduler ON -> {scheduler.stats()['jobs']} polled devices, "
+              f"{len(threads)} device threads")
 
     try:
         # Console runs in main thread (clean Ctrl+C handling)
-        run_console(led, buzzer, state, pi_id=pi_id)
+        run_console(led, buzzer, state, pi_id=pi_id, scheduler=scheduler)
     finally:
         # stop loops
         stop_event.set()
+        if scheduler is not None:
+            scheduler.stop()
         if batch_sender is not None:
             batch_sender.stop()
         if mqtt_client is not None:
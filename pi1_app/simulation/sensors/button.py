@@ -87,3 +87,41 @@ def run_button(
             GPIO.remove_event_detect(sensor.pin)
         except Exception:
             pass
+
+
+def watch_button(
+    sensor: ButtonSensor,
+    poll_s: float,
+    callback: Callable[[bool, str], None],
+    code: str,
+    scheduler,
+    *,
+    use_events: bool = True,
+    bouncetime_ms: int = 150,
+) -> None:
+    """Scheduler-mode counterpart of run_button (no thread of its own).
+
+    The GPIO edge callback only posts a pin check into `scheduler`, so the
+    device callback runs on the scheduler thread. Without edge detection
+    the scheduler polls the pin every `poll_s`.
+    """
+    sensor.setup()
+
+    last = sensor.read_pressed()
+    scheduler.post(callback, last, code)
+
+    def check() -> None:
+        nonlocal last
+        cur = sensor.read_pressed()
+        if cur != last:
+            last = cur
+            callback(cur, code)
+
+    if GPIO is not None and use_events:
+        try:
+            GPIO.add_event_detect(sensor.pin, GPIO.BOTH, callback=lambda _ch: scheduler.post(check),
+                                  bouncetime=int(bouncetime_ms))
+            return
+        except Exception as e:
+            print(f"[{code}] edge detection nije dostupan, koristi se polling: {e}")
+    scheduler.every(code, poll_s, check)
@@ -1,9 +1,150 @@
 import time
 import threading
-from typing import Callable, Sequence
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
 
 from utils.gpio_compat import GPIO
 
+Key = Tuple[int, int]  # (row index, column index)
+
+
+class MembraneKeypad:
+    """Matrix keypad (4x4 typical) with debounced, multi-key scanning.
+
+    Scanning follows the standard approach shown in lab exercises: all row
+    pins LOW, drive one row HIGH at a time and read the column inputs
+    (pulled down); a HIGH column means the key at (row, col) is pressed.
+
+    Debouncing: a press is reported on the first scan that sees it (low
+    latency; membrane contacts do not close on their own), after which the
+    key has to read released for `debounce_ms` before it counts as released
+    and can be pressed again. Several keys held together are each reported.
+    Without diodes, three keys on the corners of a rectangle make the fourth
+    read as pressed ("ghosting"); new presses in such a scan are ignored
+    until it clears.
+
+    `gpio` replaces the RPi.GPIO module, e.g. with utils.fake_gpio.FakeGPIO.
+    """
+
+    def __init__(self, row_pins: Sequence[int], col_pins: Sequence[int], keymap: Sequence[Sequence[str]],
+                 *, gpio=None, debounce_ms: float = 30.0, settle_s: float = 0.0008):
+        self.rows = [int(p) for p in row_pins]
+        self.cols = [int(p) for p in col_pins]
+        if len(keymap) != len(self.rows) or any(len(r) != len(self.cols) for r in keymap):
+            raise ValueError("keymap dimenzije moraju odgovarati row_pins i col_pins")
+        self.keymap = [[str(k) for k in row] for row in keymap]
+        self._gpio = gpio if gpio is not None else GPIO
+        self._debounce = max(0.0, float(debounce_ms)) / 1000.0
+        self._settle = max(0.0, float(settle_s))
+
+        self._down: Set[Key] = set()
+        self._released_at: Dict[Key, float] = {}
+        self._edge_cols: List[int] = []
+
+        self.scans = 0
+        self.presses = 0
+        self.ghosted_scans = 0
+
+    def setup(self) -> None:
+        gpio = self._gpio
+        if gpio is None:
+            raise RuntimeError("RPi.GPIO nije dostupan.")
+        for r in self.rows:
+            gpio.setup(r, gpio.OUT)
+            gpio.output(r, gpio.LOW)
+        for c in self.cols:
+            gpio.setup(c, gpio.IN, pull_up_down=gpio.PUD_DOWN)
+
+    def drive_rows(self, level: int) -> None:
+        for r in self.rows:
+            self._gpio.output(r, level)
+
+    def idle_rows(self) -> None:
+        """Drive every row HIGH, so any key press raises its column."""
+        self.drive_rows(self._gpio.HIGH)
+
+    def enable_edge_detect(self, callback: Callable[[int], None]) -> None:
+        """Call `callback(channel)` on a rising edge of any column.
+
+        All columns or none: if one cannot be armed, the ones already armed
+        are released and the error is raised.
+        """
+        gpio = self._gpio
+        try:
+            for c in self.cols:
+                gpio.add_event_detect(c, gpio.RISING, callback=callback)
+                self._edge_cols.append(c)
+        except Exception:
+            self.disable_edge_detect()
+            raise
+
+    def disable_edge_detect(self) -> None:
+        for c in self._edge_cols:
+            try:
+                self._gpio.remove_event_detect(c)
+            except Exception:
+                pass
+        self._edge_cols = []
+
+    def any_column_high(self) -> bool:
+        gpio = self._gpio
+        return any(gpio.input(c) == gpio.HIGH for c in self.cols)
+
+    def scan(self) -> FrozenSet[Key]:
+        """Raw matrix scan; leaves all rows LOW."""
+        gpio = self._gpio
+        self.drive_rows(gpio.LOW)
+        pressed = set()
+        for ri, rpin in enumerate(self.rows):
+            gpio.output(rpin, gpio.HIGH)
+            # Small settle time
+            time.sleep(self._settle)
+            for ci, cpin in enumerate(self.cols):
+                if gpio.input(cpin) == gpio.HIGH:
+                    pressed.add((ri, ci))
+            gpio.output(rpin, gpio.LOW)
+        self.scans += 1
+        return frozenset(pressed)
+
+    @staticmethod
+    def _ghosted(raw: FrozenSet[Key]) -> bool:
+        # two rows sharing two pressed columns: one of the four may be a phantom
+        by_row: Dict[int, Set[int]] = {}
+        for ri, ci in raw:
+            by_row.setdefault(ri, set()).add(ci)
+        rows = [cols for cols in by_row.values() if len(cols) > 1]
+        return any(len(a & b) > 1 for i, a in enumerate(rows) for b in rows[i + 1:])
+
+    def update(self, raw: FrozenSet[Key], now: Optional[float] = None) -> List[str]:
+        """Feed one scan into the debouncer; returns keys newly pressed."""
+        now = time.monotonic() if now is None else now
+        new: List[str] = []
+
+        for key in list(self._down):
+            if key in raw:
+                self._released_at.pop(key, None)
+                continue
+            since = self._released_at.setdefault(key, now)
+            if now - since >= self._debounce:
+                self._down.discard(key)
+                del self._released_at[key]
+
+        if self._ghosted(raw):
+            self.ghosted_scans += 1
+            return new
+
+        for key in sorted(raw - self._down):
+            self._down.add(key)
+            self.presses += 1
+            new.append(self.keymap[key[0]][key[1]])
+        return new
+
+    def idle(self) -> bool:
+        """True when no key is held or still settling after release."""
+        return not self._down
+
+    def stats(self) -> dict:
+        return {"scans": self.scans, "presses": self.presses, "ghosted_scans": self.ghosted_scans}
+
 
 def run_membrane_switch_loop(
     row_pins: Sequence[int],
@@ -13,54 +154,59 @@ def run_membrane_switch_loop(
     callback: Callable[[str, str], None],
     stop_event: threading.Event,
     code: str,
-    debounce_ms: int = 200,
+    debounce_ms: int = 30,
+    *,
+    use_events: bool = True,
+    scan_ms: float = 10.0,
+    gpio=None,
 ) -> None:
-    """Matrix keypad scanning (4x4 typical).
-
-    Based on the standard approach shown in lab exercises:
-    - Set all row pins LOW
-    - Drive one row HIGH at a time and read column inputs
-    - If a column reads HIGH, the key at (row, col) is pressed
+    """Runs the keypad loop; `callback(key, code)` once per key press.
 
-    Debounce is applied so holding a key does not spam.
+    With edge detection (default) the keypad idles with all rows driven
+    HIGH and a rising-edge interrupt on every column, so nothing runs until
+    a key closes a row/column contact. Then the matrix is scanned every
+    `scan_ms` until all keys are released, and the keypad goes back to
+    idle. Without edge detection (or if it cannot be enabled) the matrix
+    is scanned every `poll_s`.
     """
+    keypad = MembraneKeypad(row_pins, col_pins, keymap, gpio=gpio, debounce_ms=debounce_ms)
+    keypad.setup()
 
-    if GPIO is None:
-        raise RuntimeError("RPi.GPIO nije dostupan.")
-
-    rows = [int(p) for p in row_pins]
-    cols = [int(p) for p in col_pins]
-
-    if len(keymap) != len(rows) or any(len(r) != len(cols) for r in keymap):
-        raise ValueError("keymap dimenzije moraju odgovarati row_pins i col_pins")
+    def emit(raw: FrozenSet[Key]) -> None:
+        for key in keypad.update(raw):
+            callback(key, code)
 
-    # Setup
-    for r in rows:
-        GPIO.setup(r, GPIO.OUT)
-        GPIO.output(r, GPIO.LOW)
+    edge = threading.Event()
+    armed = False
+    if use_events:
+        try:
+            keypad.enable_edge_detect(lambda _ch: edge.set())
+            armed = True
+        except Exception as e:
+            print(f"[{code}] edge detection nije dostupan, koristi se polling: {e}")
 
-    for c in cols:
-        GPIO.setup(c, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-
-    last_key = None
-    last_ts = 0.0
-
-    def emit(key: str):
-        nonlocal last_key, last_ts
-        now = time.time()
-        if key == last_key and (now - last_ts) * 1000.0 < float(debounce_ms):
+    try:
+        if not armed:
+            while not stop_event.is_set():
+                emit(keypad.scan())
+                stop_event.wait(float(poll_s))
             return
-        last_key = key
-        last_ts = now
-        callback(key, code)
 
-    while not stop_event.is_set():
-        for ri, rpin in enumerate(rows):
-            GPIO.output(rpin, GPIO.HIGH)
-            # Small settle time
-            time.sleep(0.0008)
-            for ci, cpin in enumerate(cols):
-                if GPIO.input(cpin) == GPIO.HIGH:
-                    emit(str(keymap[ri][ci]))
-            GPIO.output(rpin, GPIO.LOW)
-        time.sleep(float(poll_s))
+        scan_s = max(0.001, float(scan_ms) / 1000.0)
+        while not stop_event.is_set():
+            # idle: all rows HIGH, wait for a column to rise
+            edge.clear()
+            keypad.idle_rows()
+            while not stop_event.is_set() and not edge.is_set() and not keypad.any_column_high():
+                edge.wait(0.5)
+            if stop_event.is_set():
+                break
+
+            # active: scan until everything is released and debounced
+            while not stop_event.is_set():
+                emit(keypad.scan())
+                if keypad.idle():
+                    break
+                stop_event.wait(scan_s)
+    finally:
+        keypad.disable_edge_detect()
@@ -1,47 +1,182 @@
+import math
 import time, threading
-from typing import Callable
+from typing import Callable, List, Optional, Sequence
 from utils.gpio_compat import GPIO
 
+SOUND_CM_PER_S = 34300.0
+
+
+def filter_burst(samples: Sequence[float], max_dev_cm: float = 5.0, min_valid: int = 1) -> float:
+    """Median of a burst of distances with outliers removed.
+
+    Timeouts (`inf`/`nan`) are dropped first; if fewer than `min_valid`
+    readings are left the burst counts as "nothing in range" (`inf`).
+    Readings further than `max_dev_cm` from the median are rejected and the
+    median of the rest is returned.
+    """
+    valid = sorted(s for s in samples if math.isfinite(s))
+    if not valid or len(valid) < min_valid:
+        return math.inf
+    med = _median(valid)
+    kept = [s for s in valid if abs(s - med) <= max_dev_cm]
+    return _median(kept) if kept else med
+
+
+def _median(values: List[float]) -> float:
+    n = len(values)
+    mid = n // 2
+    return values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2.0
+
+
 class UltrasonicSensor:
-    def __init__(self, trigger_pin: int, echo_pin: int):
+    """HC-SR04 style trigger/echo distance sensor.
+
+    With edge detection (default) the echo pulse is timed from GPIO edge
+    callbacks using `time.perf_counter()`, so the measuring thread sleeps on
+    an Event instead of spinning on `GPIO.input()`. If edge detection cannot
+    be enabled it falls back to polling the echo pin.
+
+    `burst` > 1 takes that many pings `burst_gap_s` apart per reading and
+    returns their filtered median (see filter_burst). No echo within
+    `timeout_s`, or a distance outside `max_range_cm`, reads as `inf`.
+
+    `gpio` replaces the RPi.GPIO module, e.g. with utils.fake_gpio.FakeGPIO.
+    """
+
+    def __init__(self, trigger_pin: int, echo_pin: int, *, gpio=None, use_events: bool = True,
+                 burst: int = 1, burst_gap_s: float = 0.06, max_dev_cm: float = 5.0,
+                 max_range_cm: float = 400.0):
         self.trig = int(trigger_pin)
         self.echo = int(echo_pin)
+        self._gpio = gpio if gpio is not None else GPIO
+        self.use_events = bool(use_events)
+        self.burst = max(1, int(burst))
+        self.burst_gap_s = max(0.0, float(burst_gap_s))
+        self.max_dev_cm = float(max_dev_cm)
+        self.max_range_cm = float(max_range_cm)
+
+        self._armed = False
+        self._rise: Optional[float] = None
+        self._fall: Optional[float] = None
+        self._done = threading.Event()
+        self._events_on = False
+
+        self.measurements = 0
+        self.timeouts = 0
+        self.out_of_range = 0
 
     def setup(self):
-        if GPIO is None:
+        gpio = self._gpio
+        if gpio is None:
             raise RuntimeError("RPi.GPIO nije dostupan.")
-        GPIO.setup(self.trig, GPIO.OUT)
-        GPIO.setup(self.echo, GPIO.IN)
-        GPIO.output(self.trig, GPIO.LOW)
+        gpio.setup(self.trig, gpio.OUT)
+        gpio.setup(self.echo, gpio.IN)
+        gpio.output(self.trig, gpio.LOW)
+        if self.use_events and not self._events_on:
+            try:
+                gpio.add_event_detect(self.echo, gpio.BOTH, callback=self._on_edge)
+                self._events_on = True
+            except Exception as e:
+                print(f"[DUS] edge detection nije dostupan, koristi se polling: {e}")
         time.sleep(0.05)
 
-    def measure_cm(self, timeout_s: float = 0.03) -> float:
-        if GPIO is None:
-            return 0.0
+    def close(self) -> None:
+        if self._events_on:
+            self._events_on = False
+            try:
+                self._gpio.remove_event_detect(self.echo)
+            except Exception:
+                pass
 
-        GPIO.output(self.trig, GPIO.HIGH)
+    def _on_edge(self, _channel: int) -> None:
+        # runs on the GPIO callback thread. The pin level tells the edges
+        # apart: a falling edge left over from the previous ping (or from an
+        # echo that timed out) must not be taken as the start of this one.
+        now = time.perf_counter()
+        if not self._armed:
+            return
+        if self._gpio.input(self.echo) == self._gpio.HIGH:
+            self._rise = now
+        elif self._rise is not None:
+            self._fall = now
+            self._armed = False
+            self._done.set()
+
+    def _trigger(self) -> None:
+        gpio = self._gpio
+        gpio.output(self.trig, gpio.HIGH)
         time.sleep(0.00001)  # 10us
-        GPIO.output(self.trig, GPIO.LOW)
+        gpio.output(self.trig, gpio.LOW)
+
+    def _pulse_events(self, timeout_s: float) -> Optional[float]:
+        self._rise = self._fall = None
+        self._done.clear()
+        self._armed = True
+        self._trigger()
+        # echo has to start and end within timeout_s each
+        if not self._done.wait(2.0 * timeout_s):
+            self._armed = False
+            return None
+        return self._fall - self._rise
+
+    def _pulse_polling(self, timeout_s: float) -> Optional[float]:
+        gpio = self._gpio
+        self._trigger()
 
-        start = time.time()
-        while GPIO.input(self.echo) == GPIO.LOW:
-            if time.time() - start > timeout_s:
-                return float("inf")
-        pulse_start = time.time()
+        start = time.perf_counter()
+        while gpio.input(self.echo) == gpio.LOW:
+            if time.perf_counter() - start > timeout_s:
+                return None
+        pulse_start = time.perf_counter()
 
-        while GPIO.input(self.echo) == GPIO.HIGH:
-            if time.time() - pulse_start > timeout_s:
-                return float("inf")
-        pulse_end = time.time()
+        while gpio.input(self.echo) == gpio.HIGH:
+            if time.perf_counter() - pulse_start > timeout_s:
+                return None
+        return time.perf_counter() - pulse_start
 
-        pulse_duration = pulse_end - pulse_start
+    def ping_cm(self, timeout_s: float = 0.03) -> float:
+        """One ping; `inf` on timeout or out of range."""
+        if self._gpio is None:
+            return 0.0
+        self.measurements += 1
+        pulse = self._pulse_events(timeout_s) if self._events_on else self._pulse_polling(timeout_s)
+        if pulse is None:
+            self.timeouts += 1
+            return math.inf
         # brzina zvuka ~34300 cm/s, put je tamo+nazad
-        dist_cm = (pulse_duration * 34300) / 2
+        dist_cm = (pulse * SOUND_CM_PER_S) / 2
+        if dist_cm > self.max_range_cm:
+            self.out_of_range += 1
+            return math.inf
         return dist_cm
 
+    def measure_cm(self, timeout_s: float = 0.03) -> float:
+        """One reading: a single ping, or the filtered median of a burst."""
+        if self.burst == 1:
+            return self.ping_cm(timeout_s)
+        samples = []
+        for i in range(self.burst):
+            if i:
+                # let the previous ping's echoes die out
+                time.sleep(self.burst_gap_s)
+            samples.append(self.ping_cm(timeout_s))
+        return filter_burst(samples, self.max_dev_cm, min_valid=(self.burst + 1) // 2)
+
+    def stats(self) -> dict:
+        return {
+            "edge_timing": self._events_on,
+            "measurements": self.measurements,
+            "timeouts": self.timeouts,
+            "out_of_range": self.out_of_range,
+        }
+
+
 def run_ultrasonic_loop(sensor: UltrasonicSensor, poll_s: float, callback: Callable[[float, str], None], stop_event: threading.Event, code: str):
     sensor.setup()
-    while not stop_event.is_set():
-        dist = sensor.measure_cm()
-        callback(round(dist, 1) if dist != float("inf") else dist, code)
-        time.sleep(poll_s)
+    try:
+        while not stop_event.is_set():
+            dist = sensor.measure_cm()
+            callback(round(dist, 1) if math.isfinite(dist) else math.inf, code)
+            stop_event.wait(poll_s)
+    finally:
+        sensor.close()
@@ -2,12 +2,21 @@ import random, time
 from typing import Callable
 import threading
 
-def run_button_simulator(poll_s: float, callback: Callable[[bool, str], None], stop_event: threading.Event, code: str):
-    """Simulira door button: povremeno generiše 'pressed' događaj."""
+def button_simulator_step(callback: Callable[[bool, str], None], code: str) -> Callable[[], None]:
+    """Jedan korak simulacije door button-a (za scheduler režim)."""
     pressed = False
-    while not stop_event.is_set():
+
+    def step():
+        nonlocal pressed
         # Sa malom verovatnoćom promeni stanje (kao pritiskanje)
         if random.random() < 0.08:
             pressed = not pressed
             callback(pressed, code)
+    return step
+
+def run_button_simulator(poll_s: float, callback: Callable[[bool, str], None], stop_event: threading.Event, code: str):
+    """Simulira door button: povremeno generiše 'pressed' događaj."""
+    step = button_simulator_step(callback, code)
+    while not stop_event.is_set():
+        step()
         time.sleep(poll_s)
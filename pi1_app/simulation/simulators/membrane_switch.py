@@ -2,14 +2,20 @@ import random, time
 from typing import Callable, List
 import threading
 
-def run_membrane_switch_simulator(poll_s: float, keys: List[str], callback: Callable[[str, str], None], stop_event: threading.Event, code: str):
-    """Simulira pritiske tastera na membranskoj tastaturi."""
-    while not stop_event.is_set():
+def membrane_simulator_step(keys: List[str], callback: Callable[[str, str], None], code: str) -> Callable[[], None]:
+    """Jedan korak simulacije membranske tastature (za scheduler režim)."""
+    def step():
         if random.random() < 0.35:
             key = random.choice(keys or ["1","2","3"])
             callback(key, code)
+    return step
+
+def run_membrane_switch_simulator(poll_s: float, keys: List[str], callback: Callable[[str, str], None], stop_event: threading.Event, code: str):
+    """Simulira pritiske tastera na membranskoj tastaturi."""
+    step = membrane_simulator_step(keys, callback, code)
+    while not stop_event.is_set():
+        step()
         time.sleep(poll_s)
 
 # Backwards-compatible alias expected by components
 run_membrane_simulator = run_membrane_switch_simulator
-
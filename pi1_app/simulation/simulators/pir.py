@@ -2,14 +2,23 @@ import random, time
 from typing import Callable
 import threading
 
-def run_pir_simulator(poll_s: float, callback: Callable[[bool, str], None], stop_event: threading.Event, code: str):
-    """Simulira PIR: 'motion' se pojavi na kratko."""
+def pir_simulator_step(callback: Callable[[bool, str], None], code: str) -> Callable[[], None]:
+    """Jedan korak simulacije PIR-a (za scheduler režim)."""
     motion = False
-    while not stop_event.is_set():
+
+    def step():
+        nonlocal motion
         if not motion and random.random() < 0.15:
             motion = True
             callback(True, code)
         elif motion and random.random() < 0.4:
             motion = False
             callback(False, code)
+    return step
+
+def run_pir_simulator(poll_s: float, callback: Callable[[bool, str], None], stop_event: threading.Event, code: str):
+    """Simulira PIR: 'motion' se pojavi na kratko."""
+    step = pir_simulator_step(callback, code)
+    while not stop_event.is_set():
+        step()
         time.sleep(poll_s)
@@ -2,9 +2,16 @@ import random, time
 from typing import Callable
 import threading
 
+def ultrasonic_simulator_step(callback: Callable[[float, str], None], code: str) -> Callable[[], None]:
+    """Jedan korak simulacije udaljenosti (za scheduler režim)."""
+    def step():
+        dist = round(random.uniform(5.0, 200.0), 1)
+        callback(dist, code)
+    return step
+
 def run_ultrasonic_simulator(poll_s: float, callback: Callable[[float, str], None], stop_event: threading.Event, code: str):
     """Simulira udaljenost u cm."""
+    step = ultrasonic_simulator_step(callback, code)
     while not stop_event.is_set():
-        dist = round(random.uniform(5.0, 200.0), 1)
-        callback(dist, code)
+        step()
         time.sleep(poll_s)
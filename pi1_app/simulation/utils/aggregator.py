@@ -0,0 +1,109 @@
+import math
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from utils.report_filter import ReportFilter
+
+
+class WindowAggregator:
+    """Tumbling-window statistics for one high-rate numeric sensor.
+
+    Samples are folded into min/max/mean/count; when a sample arrives after
+    the window (`window_s`) has elapsed the finished window is returned and a
+    new one starts with that sample. Non-finite samples (e.g. an ultrasonic
+    `inf` when nothing is in range) are counted but left out of min/max/mean.
+
+    Raw samples are normally not sent (`keep_raw=False`). A sample at or above
+    `pass_above` / at or below `pass_below` is urgent and is always sent raw,
+    immediately, so threshold alarms (GSG tilt) are not delayed by a window.
+    """
+
+    def __init__(self, window_s: float, keep_raw: bool = False,
+                 pass_above: Optional[float] = None, pass_below: Optional[float] = None):
+        self._window = max(0.1, float(window_s))
+        self.keep_raw = bool(keep_raw)
+        self._above = None if pass_above is None else float(pass_above)
+        self._below = None if pass_below is None else float(pass_below)
+        self._start: Optional[float] = None
+        self._reset()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> Optional["WindowAggregator"]:
+        """Aggregator for a device's `aggregate` settings, or None if not configured."""
+        cfg = settings.get("aggregate")
+        if not cfg:
+            return None
+        if not cfg.get("keep_raw", False):
+            # without raw samples only urgent ones are sent, and those skip
+            # the report filter, so its keys would be silently ignored
+            dead = [k for k in ("deadband", "min_interval_s", "max_silence_s") if k in settings]
+            if dead:
+                print(f"[AGG] {settings.get('device_name', '?')}: {', '.join(dead)} "
+                      f"ignored with aggregate.keep_raw false")
+        return cls(
+            window_s=cfg.get("window_s", 10.0),
+            keep_raw=cfg.get("keep_raw", False),
+            pass_above=cfg.get("pass_above"),
+            pass_below=cfg.get("pass_below"),
+        )
+
+    def _reset(self) -> None:
+        self._count = 0
+        self._n = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._last: Any = None
+
+    def is_urgent(self, value: float) -> bool:
+        return (self._above is not None and value >= self._above) or \
+            (self._below is not None and value <= self._below)
+
+    def add(self, value: float, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Fold in one sample; returns the stats of a window that just closed."""
+        now = time.monotonic() if now is None else now
+        closed = None
+        if self._start is not None and now - self._start >= self._window:
+            closed = self._stats(now - self._start)
+            self._reset()
+            self._start = None
+        if self._start is None:
+            self._start = now
+
+        self._count += 1
+        if math.isfinite(value):
+            self._n += 1
+            self._sum += value
+            self._min = min(self._min, value)
+            self._max = max(self._max, value)
+        self._last = value
+        return closed
+
+    def _stats(self, span: float) -> Dict[str, Any]:
+        finite = self._n > 0
+        return {
+            "min": self._min if finite else None,
+            "max": self._max if finite else None,
+            "mean": round(self._sum / self._n, 3) if finite else None,
+            "count": self._count,
+            "last": self._last,
+            "window_s": round(span, 3),
+        }
+
+
+def route_sample(value: float, aggregator: Optional[WindowAggregator],
+                 report_filter: Optional[ReportFilter]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """(send the raw sample?, closed window stats or None) for one sample.
+
+    Urgent samples skip the report filter; other raw samples go through it.
+    """
+    window = None
+    if aggregator is not None:
+        window = aggregator.add(value)
+        if aggregator.is_urgent(value):
+            return True, window
+        if not aggregator.keep_raw:
+            return False, window
+    if report_filter is not None and not report_filter.should_send(value):
+        return False, window
+    return True, window
@@ -1,54 +1,291 @@
 import threading
 import time
 import queue
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Mapping, Optional
+
+from utils.wire import to_columnar
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+LANE_BULK = "bulk"
+LANE_CRITICAL = "critical"
+
+_WAKE = object()
+
+
+class _Lane:
+    """One queue + flush policy of a BatchSender (see BatchSender)."""
+
+    def __init__(self, name: str, mqtt_client, interval_sec: float, max_batch: int,
+                 columnar: bool, max_queue: int, overflow: str, stop_event: threading.Event,
+                 block_timeout_sec: Optional[float] = None):
+        overflow = str(overflow).lower().replace("-", "_")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {overflow}")
+
+        self.name = name
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._mqtt = mqtt_client
+        self._interval = max(0.0, float(interval_sec))
+        self._max_batch = max(1, int(max_batch))
+        self._columnar = bool(columnar)
+        self._overflow = overflow
+        self._stop_event = stop_event
+        self._block_timeout = None if block_timeout_sec is None else max(0.0, float(block_timeout_sec))
+
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._dropped = 0
+        self._block_timeouts = 0
+        self._published = 0
+        self._errors = 0
+        self._flushes = 0
+        self._flushed_items = 0
+        self._last_flush_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        # enqueue -> publish, per reading
+        self._lat_total_ms = 0.0
+        self._lat_last_ms = 0.0
+        self._lat_max_ms = 0.0
+
+    def enqueue(self, topic: str, payload: Dict[str, Any]) -> bool:
+        item = (topic, payload, time.monotonic())
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            if self._overflow == OVERFLOW_DROP_NEWEST:
+                with self._stats_lock:
+                    self._dropped += 1
+                return False
+            if self._overflow == OVERFLOW_DROP_OLDEST:
+                while True:
+                    try:
+                        self._q.get_nowait()
+                        with self._stats_lock:
+                            self._dropped += 1
+                    except queue.Empty:
+                        pass
+                    try:
+                        self._q.put_nowait(item)
+                        break
+                    except queue.Full:
+                        continue
+            elif self._block_timeout is not None:
+                # bounded backpressure: the caller must not stall (scheduler mode)
+                try:
+                    self._q.put(item, timeout=self._block_timeout)
+                except queue.Full:
+                    with self._stats_lock:
+                        self._dropped += 1
+                        self._block_timeouts += 1
+                    return False
+            else:
+                while True:
+                    try:
+                        self._q.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        if self._stop_event.is_set():
+                            with self._stats_lock:
+                                self._dropped += 1
+                            return False
+
+        with self._stats_lock:
+            self._enqueued += 1
+        return True
+
+    def wake(self) -> None:
+        try:
+            self._q.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            avg_ms = self._total_flush_ms / self._flushes if self._flushes else 0.0
+            avg_size = self._flushed_items / self._flushes if self._flushes else 0.0
+            lat_avg = self._lat_total_ms / self._flushed_items if self._flushed_items else 0.0
+            return {
+                "interval_sec": self._interval,
+                "queue_depth": self._q.qsize(),
+                "max_queue": self._q.maxsize,
+                "overflow": self._overflow,
+                "enqueued": self._enqueued,
+                "dropped": self._dropped,
+                "block_timeouts": self._block_timeouts,
+                "published": self._published,
+                "errors": self._errors,
+                "flushes": self._flushes,
+                "last_flush_size": self._last_flush_size,
+                "avg_flush_size": round(avg_size, 1),
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "avg_flush_ms": round(avg_ms, 2),
+                "max_flush_ms": round(self._max_flush_ms, 2),
+                "latency_last_ms": round(self._lat_last_ms, 2),
+                "latency_avg_ms": round(lat_avg, 2),
+                "latency_max_ms": round(self._lat_max_ms, 2),
+            }
+
+    def _flush(self, batch: List[tuple]) -> None:
+        started = time.monotonic()
+
+        # group by topic and publish list payload per topic
+        grouped = {}
+        for topic, payload, _ in batch:
+            grouped.setdefault(topic, []).append(payload)
+
+        published = errors = 0
+        for topic, payloads in grouped.items():
+            if self._columnar:
+                payloads = to_columnar(payloads)
+            try:
+                self._mqtt.publish(topic, payloads, critical=self.name == LANE_CRITICAL)
+                published += 1
+            except Exception as e:
+                # Do not crash the daemon; print and continue
+                errors += 1
+                print(f"[BATCH] publish error ({self.name}): {e}")
+
+        done = time.monotonic()
+        took_ms = (done - started) * 1000.0
+        lat_total = sum(done - queued_at for _, _, queued_at in batch) * 1000.0
+        lat_oldest = (done - batch[0][2]) * 1000.0
+        with self._stats_lock:
+            self._published += published
+            self._errors += errors
+            self._flushes += 1
+            self._flushed_items += len(batch)
+            self._last_flush_size = len(batch)
+            self._last_flush_ms = took_ms
+            self._total_flush_ms += took_ms
+            self._max_flush_ms = max(self._max_flush_ms, took_ms)
+            self._lat_total_ms += lat_total
+            self._lat_last_ms = lat_oldest
+            self._lat_max_ms = max(self._lat_max_ms, lat_oldest)
+
+    def _drain_into(self, buf: List[tuple]) -> None:
+        while len(buf) < self._max_batch:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _WAKE:
+                buf.append(item)
+
+    def run(self) -> None:
+        buf: List[tuple] = []
+        oldest = 0.0
+
+        while not self._stop_event.is_set():
+            if buf:
+                timeout = max(0.0, oldest + self._interval - time.monotonic())
+                try:
+                    item = self._q.get(timeout=timeout) if timeout > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    item = _WAKE
+            else:
+                # idle: sleep until the next reading (or stop)
+                item = self._q.get()
+
+            if item is not _WAKE:
+                if not buf:
+                    oldest = time.monotonic()
+                buf.append(item)
+                self._drain_into(buf)
+
+            if buf and (len(buf) >= self._max_batch or time.monotonic() - oldest >= self._interval):
+                self._flush(buf)
+                buf = []
+
+        # Shutdown: flush whatever is still buffered or queued
+        while True:
+            self._drain_into(buf)
+            if not buf:
+                break
+            self._flush(buf)
+            buf = []
+
 
 class BatchSender(threading.Thread):
-    """Daemon thread that periodically flushes queued MQTT messages.
+    """Daemon thread that flushes queued MQTT messages in batches.
 
     Uses queue.Queue which is thread-safe -> minimal locking and no deadlocks.
-    Each item is a dict: { "topic": str, "payload": dict }
+    Readings are routed to one of two lanes (_Lane, "bulk" and "critical"),
+    each with its own queue; bulk is flushed on this thread, critical on a
+    thread of its own (see Priority lanes below). A queued item is a tuple
+    (topic, payload, enqueued_at) where enqueued_at is time.monotonic() at
+    enqueue, used for the enqueue -> publish latency stats.
 
     Batch semantics (KT2):
-      - we flush every N seconds
+      - we flush when `max_batch` readings are buffered OR the oldest buffered
+        reading is `batch_interval_sec` old (whichever comes first); under load
+        the queue is drained in back-to-back full batches
       - we GROUP queued messages per topic
       - we publish ONE MQTT message per topic whose payload is a LIST of readings
+      - with columnar=True that list holds one block per device (shared header +
+        ts[]/value[] arrays, see wire.to_columnar) instead of repeated dicts
+
+    Priority lanes: readings of devices listed as "critical" in `priorities`
+    (device code -> "critical" | "bulk", from settings.json) go through a
+    separate lane that flushes after `critical_interval_sec` (a few ms
+    micro-batch, 0 = publish immediately) on its own thread, so door, PIR and
+    keypad events are not held back by the long telemetry interval. Each lane
+    keeps its own stats, including enqueue -> publish latency.
+
+    The bulk queue holds at most `max_queue` readings. When it is full:
+      - block:       enqueue() waits for space (backpressure to the sensor thread)
+      - drop_oldest: the oldest queued reading is discarded (default)
+      - drop_newest: the new reading is discarded
+    The critical lane always blocks rather than drop a reading.
+
+    With `block_timeout_sec` set, blocking (the critical lane, or a bulk lane
+    with overflow "block") waits at most that long and then drops the new
+    reading (counted in `dropped` and `block_timeouts`). The single-thread
+    sensor scheduler uses it: one blocked enqueue would stall every device.
     """
-    def __init__(self, mqtt_client, batch_interval_sec: float = 5.0, max_batch: int = 500):
+    def __init__(self, mqtt_client, batch_interval_sec: float = 5.0, max_batch: int = 500,
+                 columnar: bool = False, max_queue: int = 10000, overflow: str = OVERFLOW_DROP_OLDEST,
+                 priorities: Optional[Mapping[str, str]] = None, critical_interval_sec: float = 0.01,
+                 critical_max_batch: int = 50, block_timeout_sec: Optional[float] = None):
         super().__init__(daemon=True)
-        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue()
-        self._mqtt = mqtt_client
-        self._interval = float(batch_interval_sec)
-        self._max_batch = int(max_batch)
         self._stop_event = threading.Event()
+        self._bulk = _Lane(LANE_BULK, mqtt_client, max(0.01, float(batch_interval_sec)), max_batch,
+                           columnar, max_queue, overflow, self._stop_event, block_timeout_sec)
+        self._critical = _Lane(LANE_CRITICAL, mqtt_client, critical_interval_sec, critical_max_batch,
+                               columnar, max_queue, OVERFLOW_BLOCK, self._stop_event, block_timeout_sec)
+        self._critical_codes = frozenset(
+            str(code).upper() for code, prio in (priorities or {}).items() if str(prio).lower() == LANE_CRITICAL
+        )
+        self._critical_thread = threading.Thread(target=self._critical.run, name="batch-critical", daemon=True)
 
-    def enqueue(self, topic: str, payload: Dict[str, Any]) -> None:
-        self._q.put({"topic": topic, "payload": payload})
+    def enqueue(self, topic: str, payload: Dict[str, Any]) -> bool:
+        """Queue one reading. Returns False if the new reading was dropped."""
+        code = str(payload.get("code", "")).upper()
+        lane = self._critical if code in self._critical_codes else self._bulk
+        return lane.enqueue(topic, payload)
 
-    def stop(self) -> None:
-        self._stop_event.set()
+    def start(self) -> None:
+        self._critical_thread.start()
+        super().start()
 
-    def run(self) -> None:
-        while not self._stop_event.is_set():
-            batch = []
-            try:
-                # collect up to max_batch without blocking
-                while len(batch) < self._max_batch:
-                    batch.append(self._q.get_nowait())
-            except queue.Empty:
-                pass
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop right away; whatever is still queued is flushed first."""
+        self._stop_event.set()
+        self._bulk.wake()
+        self._critical.wake()
+        if threading.current_thread() not in (self, self._critical_thread):
+            if self.is_alive():
+                self.join(timeout=timeout)
+            if self._critical_thread.is_alive():
+                self._critical_thread.join(timeout=timeout)
 
-            if batch:
-                # group by topic and publish list payload per topic
-                grouped = {}
-                for item in batch:
-                    grouped.setdefault(item["topic"], []).append(item["payload"])
+    def stats(self) -> Dict[str, Any]:
+        return {LANE_BULK: self._bulk.stats(), LANE_CRITICAL: self._critical.stats()}
 
-                for topic, payloads in grouped.items():
-                    try:
-                        self._mqtt.publish(topic, payloads)
-                    except Exception as e:
-                        # Do not crash the daemon; print and continue
-                        print(f"[BATCH] publish error: {e}")
-
-            time.sleep(self._interval)
+    def run(self) -> None:
+        self._bulk.run()
@@ -0,0 +1,155 @@
+"""In-memory stand-in for the RPi.GPIO subset used by the sensors.
+
+Lets the sensor timing code run off the Pi (benchmarks, drills): pins keep a
+level, `add_event_detect` callbacks fire on level changes, an echo model
+can be attached to an ultrasonic trigger/echo pair and contacts (keypad
+keys) can connect an output pin to an input pin. Pass an instance as the
+`gpio` argument of a sensor instead of the real module.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+SOUND_CM_PER_S = 34300.0
+
+# distance in cm for the next ping, or None for no echo (nothing in range)
+DistanceFn = Callable[[], Optional[float]]
+
+
+class FakeGPIO:
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels: Dict[int, int] = {}
+        self._modes: Dict[int, int] = {}
+        self._callbacks: Dict[int, List[tuple]] = {}
+        self._echoes: Dict[int, tuple] = {}
+        self._pulls: Dict[int, int] = {}
+        self._contacts: Set[Tuple[int, int]] = set()
+        self.pings = 0
+        self.reads = 0
+        self.writes = 0
+
+    # --- RPi.GPIO API ---
+
+    def setwarnings(self, _flag: bool) -> None:
+        pass
+
+    def setmode(self, _mode: int) -> None:
+        pass
+
+    def setup(self, pin: int, mode: int, pull_up_down: int = PUD_OFF, initial: int = LOW) -> None:
+        with self._lock:
+            self._modes[pin] = mode
+            self._pulls[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+            self._levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else initial)
+
+    def input(self, pin: int) -> int:
+        self.reads += 1
+        return self._levels.get(pin, self.LOW)
+
+    def output(self, pin: int, value: int) -> None:
+        value = self.HIGH if value else self.LOW
+        prev = self._levels.get(pin, self.LOW)
+        self.writes += 1
+        self.set_level(pin, value)
+        for out_pin, in_pin in list(self._contacts):
+            if out_pin == pin:
+                self._refresh(in_pin)
+        echo = self._echoes.get(pin)
+        if echo is not None and prev == self.HIGH and value == self.LOW:
+            self.pings += 1
+            threading.Thread(target=self._echo, args=echo, daemon=True).start()
+
+    def add_event_detect(self, pin: int, edge: int, callback: Optional[Callable[[int], None]] = None,
+                         bouncetime: Optional[int] = None) -> None:
+        with self._lock:
+            if pin in self._callbacks:
+                raise RuntimeError(f"Conflicting edge detection already enabled for pin {pin}")
+            self._callbacks[pin] = [(edge, callback)] if callback else []
+
+    def add_event_callback(self, pin: int, callback: Callable[[int], None]) -> None:
+        with self._lock:
+            edges = self._callbacks.setdefault(pin, [])
+            edge = edges[0][0] if edges else self.BOTH
+            edges.append((edge, callback))
+
+    def remove_event_detect(self, pin: int) -> None:
+        with self._lock:
+            self._callbacks.pop(pin, None)
+
+    def cleanup(self, *_pins) -> None:
+        with self._lock:
+            self._levels.clear()
+            self._modes.clear()
+            self._callbacks.clear()
+
+    # --- test helpers ---
+
+    def set_level(self, pin: int, value: int) -> None:
+        """Drive a pin (as the outside world would) and fire its edge callbacks."""
+        with self._lock:
+            prev = self._levels.get(pin, self.LOW)
+            self._levels[pin] = value
+            callbacks = list(self._callbacks.get(pin, ()))
+        if prev == value:
+            return
+        rising = value == self.HIGH
+        for edge, cb in callbacks:
+            if edge == self.BOTH or (edge == self.RISING) == rising:
+                cb(pin)
+
+    def close_contact(self, out_pin: int, in_pin: int) -> None:
+        """Connect an output pin to an input pin (e.g. press a keypad key)."""
+        self._contacts.add((out_pin, in_pin))
+        self._refresh(in_pin)
+
+    def open_contact(self, out_pin: int, in_pin: int) -> None:
+        self._contacts.discard((out_pin, in_pin))
+        self._refresh(in_pin)
+
+    def _refresh(self, in_pin: int) -> None:
+        # an input follows any output driven HIGH through a closed contact,
+        # otherwise its pull resistor
+        driven = any(i == in_pin and self._levels.get(o) == self.HIGH for o, i in list(self._contacts))
+        self.set_level(in_pin, self.HIGH if driven else self._pulls.get(in_pin, self.LOW))
+
+    def attach_echo(self, trigger_pin: int, echo_pin: int, distance_fn: DistanceFn,
+                    latency_s: float = 0.0005) -> None:
+        """Answer every trigger pulse on `trigger_pin` with an echo pulse on
+        `echo_pin` as long as the round trip to `distance_fn()` cm."""
+        self._echoes[trigger_pin] = (echo_pin, distance_fn, latency_s)
+
+    def _echo(self, echo_pin: int, distance_fn: DistanceFn, latency_s: float) -> None:
+        dist = distance_fn()
+        if dist is None:
+            return
+        _sleep_until(time.perf_counter() + latency_s)
+        start = time.perf_counter()
+        self.set_level(echo_pin, self.HIGH)
+        _sleep_until(start + 2.0 * float(dist) / SOUND_CM_PER_S)
+        self.set_level(echo_pin, self.LOW)
+
+
+def _sleep_until(deadline: float) -> None:
+    # sleep() alone overshoots by a scheduler tick; spin the last stretch so
+    # the simulated pulse width is accurate to a few microseconds
+    while True:
+        left = deadline - time.perf_counter()
+        if left <= 0:
+            return
+        if left > 0.002:
+            time.sleep(left - 0.001)
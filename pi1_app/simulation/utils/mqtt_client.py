@@ -1,18 +1,62 @@
-import json
-from typing import Any, Callable, Dict
+import threading
+from typing import Any, Callable, Dict, Optional
 import paho.mqtt.client as mqtt
 
+from utils import wire
+from utils.codec import get_codec
+from utils.spool import SpoolForwarder
+
 MessageHandler = Callable[[str, Any], None]
 
+
+def _mark_replayed(payload: Any) -> Any:
+    """Copy of a reading / batch with every reading (or columnar block) flagged `replayed`."""
+    if isinstance(payload, list):
+        return [_mark_replayed(item) for item in payload]
+    if isinstance(payload, dict):
+        return {**payload, "replayed": True}
+    return payload
+
+
 class MQTTClient:
-    def __init__(self, broker: str, port: int = 1883, client_id: str = "pi1-app"):
+    def __init__(self, broker: str, port: int = 1883, client_id: str = "pi1-app", codec=None,
+                 batch_format: str = "json", compressor=None, spool=None, replay_rate: float = 20.0):
+        """`spool` (utils.spool.EdgeSpool) keeps messages that cannot be sent
+        while the broker is unreachable; they are replayed oldest first at
+        `replay_rate` messages/s after reconnect. Without it they are dropped.
+        Messages go out with QoS 1; spooled ones leave the spool only once
+        the broker acknowledged them (PUBACK).
+        """
+        self._codec = codec or get_codec()
+        self._format = batch_format
+        self._compressor = compressor
+        self._spool = spool
+        self._connected = threading.Event()
+        self._dropped = 0
+        self._stats_lock = threading.Lock()
+        self._published = 0
+        self._published_bytes = 0
         self._client = mqtt.Client(client_id=client_id)
-        self._client.connect(broker, int(port), 60)
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
         self._handlers = []  # list of (topic_prefix, handler)
 
+        def _on_connect(client, userdata, flags, rc):
+            if rc != 0:
+                print(f"[MQTT] connect failed rc={rc}")
+                return
+            self._connected.set()
+            # (re)subscribe after reconnect, the broker forgets a clean session
+            for prefix, _ in self._handlers:
+                client.subscribe(prefix + "/#")
+
+        def _on_disconnect(client, userdata, rc):
+            self._connected.clear()
+            if rc != 0:
+                print(f"[MQTT] disconnected rc={rc}, reconnecting...")
+
         def _on_message(client, userdata, msg):
             try:
-                payload = json.loads(msg.payload.decode("utf-8"))
+                payload = wire.decode(msg.payload, self._codec)
             except Exception:
                 payload = {"raw": msg.payload.decode("utf-8", errors="ignore")}
 
@@ -24,23 +68,94 @@ class MQTTClient:
                     except Exception as e:
                         print(f"[MQTT] handler error for {topic}: {e}")
 
+        self._client.on_connect = _on_connect
+        self._client.on_disconnect = _on_disconnect
         self._client.on_message = _on_message
+        # connect in the background: the edge keeps sampling (and spooling)
+        # even if the broker is down at start
+        self._client.connect_async(broker, int(port), 60)
         self._client.loop_start()
 
-    def publish(self, topic: str, payload: Any) -> None:
-        """Publish JSON-serializable payload.
+        self._forwarder = None
+        if spool is not None:
+            # replay hands back paho's message info: a segment is deleted from
+            # the spool only after the broker acknowledged all of it
+            self._forwarder = SpoolForwarder(spool, self._publish, self._connected, rate_per_sec=replay_rate)
+            self._forwarder.start()
 
-        For KT2 we often publish batches (lists) as well as single dict payloads.
+    def _publish(self, topic: str, data: bytes) -> Optional[mqtt.MQTTMessageInfo]:
+        # QoS 1: paho keeps the message until the broker's PUBACK and resends
+        # it after a reconnect, so a half-open link (not noticed until the
+        # keepalive runs out) does not silently lose it
+        if not self._connected.is_set():
+            return None
+        try:
+            info = self._client.publish(topic, data, qos=1, retain=False)
+        except Exception as e:
+            print(f"[MQTT] publish error: {e}")
+            return None
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            return None
+        with self._stats_lock:
+            self._published += 1
+            self._published_bytes += len(topic) + len(data)
+        return info
+
+    def _send(self, topic: str, data: bytes) -> bool:
+        return self._publish(topic, data) is not None
+
+    def publish(self, topic: str, payload: Any, critical: bool = False) -> None:
+        """Publish JSON-serializable payload (as JSON or the configured binary format).
+
+        For KT2 we often publish batches (lists) as well as single dict payloads;
+        large batches are compressed when a compressor is configured.
+        While the spool holds older messages new ones are queued behind them,
+        so the server always sees readings in order. `critical` messages
+        (alarm lane) only wait if their own topic has a backlog, so a door or
+        PIR event is never overtaken by an older one of the same device, but
+        does not wait for unrelated spooled telemetry.
+
+        Messages spooled because the broker is unreachable (or the send
+        failed) are marked `replayed`: the server stores them but does not run state rules on them (a door
+        "open" from an outage must not override a later live "close").
         """
-        self._client.publish(topic, json.dumps(payload), qos=0, retain=False)
+        data = wire.encode(payload, self._format, self._codec, self._compressor)
+        if self._spool is not None and self._connected.is_set() and \
+                (self._spool.pending_for(topic) if critical else self._spool.pending()):
+            # live, only waiting for the older messages to be replayed first
+            self._spool.append(topic, data)
+        elif not self._send(topic, data):
+            if self._spool is not None:
+                stale = wire.encode(_mark_replayed(payload), self._format, self._codec, self._compressor)
+                self._spool.append(topic, stale)
+            else:
+                with self._stats_lock:
+                    self._dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            published, published_bytes, dropped = self._published, self._published_bytes, self._dropped
+        return {
+            "connected": self._connected.is_set(),
+            "published": published,
+            "published_bytes": published_bytes,
+            "dropped": dropped,
+            "spool": self._spool.stats() if self._spool is not None else None,
+            "spool_resent_segments": self._forwarder.resent_segments if self._forwarder is not None else 0,
+        }
 
     def subscribe_prefix(self, topic_prefix: str, handler: MessageHandler) -> None:
         # subscribe wildcard under prefix
         wildcard = topic_prefix.rstrip("/") + "/#"
-        self._client.subscribe(wildcard)
         self._handlers.append((topic_prefix.rstrip("/"), handler))
+        if self._connected.is_set():
+            self._client.subscribe(wildcard)
 
     def stop(self) -> None:
+        if self._forwarder is not None:
+            self._forwarder.stop()
+        if self._spool is not None:
+            self._spool.close()
         try:
             self._client.loop_stop()
             self._client.disconnect()
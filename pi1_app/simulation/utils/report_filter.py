@@ -0,0 +1,81 @@
+import math
+import time
+from typing import Any, Dict, Optional, Union
+
+Deadband = Union[float, Dict[str, float]]
+
+
+class ReportFilter:
+    """Change-only reporting for one device (applied before batch_sender.enqueue).
+
+    A reading is sent when:
+      - it is the first one, or
+      - `max_silence_s` passed since the last sent reading (heartbeat), or
+      - it differs from the last sent reading by more than `deadband` and at
+        least `min_interval_s` passed since the last sent reading.
+
+    `deadband` is a number, or a dict per key for dict values such as DHT
+    ({"temperature_c": 0.2, "humidity_pct": 1.0}); a dict value counts as
+    changed if any of its keys changed. Non-numeric values are compared for
+    equality. Local state/console updates are not affected, only MQTT.
+    """
+
+    def __init__(self, deadband: Deadband = 0.0, min_interval_s: float = 0.0,
+                 max_silence_s: Optional[float] = None):
+        self._deadband = deadband
+        self._min_interval = max(0.0, float(min_interval_s))
+        self._max_silence = float(max_silence_s) if max_silence_s else None
+        self._last_value: Any = None
+        self._last_sent: Optional[float] = None
+        self.sent = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> Optional["ReportFilter"]:
+        """Filter for a device's settings, or None if none of the keys is set."""
+        if not any(k in settings for k in ("deadband", "min_interval_s", "max_silence_s")):
+            return None
+        return cls(
+            deadband=settings.get("deadband") or 0.0,
+            min_interval_s=settings.get("min_interval_s") or 0.0,
+            max_silence_s=settings.get("max_silence_s"),
+        )
+
+    @staticmethod
+    def _num_changed(old: Any, new: Any, band: float) -> bool:
+        if isinstance(old, bool) or isinstance(new, bool) or \
+                not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            return old != new
+        if old == new:
+            return False
+        if math.isnan(old) or math.isnan(new):
+            return not (math.isnan(old) and math.isnan(new))
+        # inf vs finite (or -inf vs inf) is always a change
+        return not (math.isfinite(old) and math.isfinite(new)) or abs(new - old) > band
+
+    def _changed(self, old: Any, new: Any) -> bool:
+        if isinstance(old, dict) and isinstance(new, dict):
+            if old.keys() != new.keys():
+                return True
+            bands = self._deadband if isinstance(self._deadband, dict) else {}
+            default = 0.0 if isinstance(self._deadband, dict) else float(self._deadband)
+            return any(self._num_changed(old[k], new[k], float(bands.get(k, default))) for k in new)
+        band = 0.0 if isinstance(self._deadband, dict) else float(self._deadband)
+        return self._num_changed(old, new, band)
+
+    def should_send(self, value: Any, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        last = self._last_sent
+
+        if last is None or (self._max_silence is not None and now - last >= self._max_silence):
+            send = True
+        else:
+            send = now - last >= self._min_interval and self._changed(self._last_value, value)
+
+        if send:
+            self._last_value = value
+            self._last_sent = now
+            self.sent += 1
+        else:
+            self.suppressed += 1
+        return send
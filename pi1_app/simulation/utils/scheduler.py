@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+MODE_THREADS = "threads"
+MODE_SCHEDULER = "scheduler"
+SENSOR_MODES = (MODE_THREADS, MODE_SCHEDULER)
+
+# spreads the first tick of jobs over their period so equal periods do not
+# all fire in the same instant
+_GOLDEN = 0.6180339887
+
+_WAKE = object()
+
+# ticks due within this much of each other run on the same wakeup (timer
+# coalescing); with hundreds of staggered devices it saves most wakeups
+_SLACK_S = 0.001
+
+
+class _Job:
+    __slots__ = ("name", "period", "fn", "due", "runs", "missed", "errors",
+                 "lat_last", "lat_total", "lat_max", "run_total", "run_max")
+
+    def __init__(self, name: str, period: float, fn: Callable[[], Any], due: float):
+        self.name = name
+        self.period = period
+        self.fn = fn
+        self.due = due
+        self.runs = 0
+        self.missed = 0
+        self.errors = 0
+        self.lat_last = 0.0
+        self.lat_total = 0.0
+        self.lat_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        runs = self.runs or 1
+        return {
+            "period_s": self.period,
+            "runs": self.runs,
+            "missed": self.missed,
+            "errors": self.errors,
+            "jitter_last_ms": round(self.lat_last * 1000.0, 3),
+            "jitter_avg_ms": round(self.lat_total * 1000.0 / runs, 3),
+            "jitter_max_ms": round(self.lat_max * 1000.0, 3),
+            "run_avg_ms": round(self.run_total * 1000.0 / runs, 3),
+            "run_max_ms": round(self.run_max * 1000.0, 3),
+        }
+
+
+class SensorScheduler(threading.Thread):
+    """One thread that drives every polled device (sensor_mode "scheduler").
+
+    Instead of a thread per device sleeping `poll_s` after each reading,
+    devices register a step function with `every()`. Ticks are fixed-rate:
+    the next one is due exactly `period` after the previous due time, no
+    matter how long the step took, so the rate does not drift. If the loop
+    falls more than a period behind, the missed ticks are skipped (and
+    counted) rather than run back to back.
+
+    `post()` hands work to the loop from another thread; GPIO edge callbacks
+    use it so device callbacks still run one at a time on the scheduler
+    thread. Per device it keeps jitter (start - due time) and run time
+    stats. stop() returns as soon as the current step finishes.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True, name="sensor-scheduler")
+        # every(), post() and stop() only put into the inbox, so the heap is
+        # touched by the scheduler thread alone and needs no lock
+        self._inbox: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._heap: List[Tuple[float, int, _Job]] = []
+        self._jobs: Dict[str, _Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._stopping = False
+
+        self._posted_runs = 0
+        self._posted_errors = 0
+        self._post_lat_total = 0.0
+        self._post_lat_max = 0.0
+
+    def every(self, name: str, period_s: float, fn: Callable[[], Any]) -> None:
+        """Run `fn()` every `period_s` seconds on the scheduler thread."""
+        period = max(0.001, float(period_s))
+        with self._jobs_lock:
+            if name in self._jobs:
+                raise ValueError(f"job already scheduled: {name}")
+            seq = next(self._seq)
+            # first tick is set when the loop picks the job up (see _handle)
+            job = _Job(name, period, fn, (seq * _GOLDEN % 1.0) * period)
+            self._jobs[name] = job
+        self._inbox.put((seq, job))
+
+    def post(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Run `fn(*args)` on the scheduler thread as soon as possible (thread-safe)."""
+        self._inbox.put((fn, args, time.monotonic()))
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stopping = True
+        self._inbox.put(_WAKE)
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._jobs_lock:
+            devices = {name: job.stats() for name, job in self._jobs.items()}
+        runs = self._posted_runs or 1
+        return {
+            "jobs": len(devices),
+            "posted": self._posted_runs,
+            "posted_errors": self._posted_errors,
+            "inbox": self._inbox.qsize(),
+            "post_latency_avg_ms": round(self._post_lat_total * 1000.0 / runs, 3),
+            "post_latency_max_ms": round(self._post_lat_max * 1000.0, 3),
+            "devices": devices,
+        }
+
+    def _handle(self, item: Any) -> None:
+        if item is _WAKE:
+            return
+        if len(item) == 2:
+            seq, job = item
+            job.due += time.monotonic()
+            heapq.heappush(self._heap, (job.due, seq, job))
+            return
+
+        fn, args, queued_at = item
+        started = time.monotonic()
+        try:
+            fn(*args)
+        except Exception as e:
+            self._posted_errors += 1
+            print(f"[SCHED] event error: {e}")
+        lat = started - queued_at
+        self._posted_runs += 1
+        self._post_lat_total += lat
+        self._post_lat_max = max(self._post_lat_max, lat)
+
+    def _run_job(self, job: _Job) -> None:
+        started = time.monotonic()
+        try:
+            job.fn()
+        except Exception as e:
+            job.errors += 1
+            print(f"[SCHED] {job.name} error: {e}")
+        done = time.monotonic()
+
+        lat = started - job.due
+        job.runs += 1
+        job.lat_last = lat
+        job.lat_total += lat
+        job.lat_max = max(job.lat_max, lat)
+        took = done - started
+        job.run_total += took
+        job.run_max = max(job.run_max, took)
+
+        # fixed rate: next tick is one period after this one was due
+        nxt = job.due + job.period
+        if nxt <= done:
+            skipped = int((done - job.due) // job.period)
+            job.missed += skipped
+            nxt = job.due + (skipped + 1) * job.period
+        job.due = nxt
+
+    def run(self) -> None:
+        inbox = self._inbox
+        heap = self._heap
+        while not self._stopping:
+            wait = (heap[0][0] - time.monotonic()) if heap else None
+            if wait is None or wait > _SLACK_S:
+                try:
+                    self._handle(inbox.get(timeout=wait))
+                except queue.Empty:
+                    pass
+            # posted (edge) events go before the due ticks
+            while not inbox.empty() and not self._stopping:
+                self._handle(inbox.get_nowait())
+
+            now = time.monotonic() + _SLACK_S
+            while heap and heap[0][0] <= now and inbox.empty() and not self._stopping:
+                _, seq, job = heapq.heappop(heap)
+                self._run_job(job)
+                heapq.heappush(heap, (job.due, seq, job))
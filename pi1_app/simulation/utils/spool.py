@@ -0,0 +1,278 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# record: topic length (u16), payload length (u32), topic, payload
+_REC = struct.Struct("<HI")
+_SUFFIX = ".spool"
+
+# Returns a falsy value if the message could not be sent; otherwise True, or
+# a delivery receipt with is_published() (paho MQTTMessageInfo) when the
+# message counts as delivered only once the broker acknowledged it.
+SendFn = Callable[[str, bytes], Any]
+
+
+class EdgeSpool:
+    """Bounded on-disk store-and-forward queue for encoded MQTT messages.
+
+    Messages that could not be sent are appended to the current segment
+    file (`<seq>.spool`); a segment is closed at `segment_bytes`. When the
+    spool exceeds `max_bytes` the oldest closed segments are deleted and
+    counted as evicted, so a long outage keeps the newest data. Segments
+    from a previous run are picked up on start. Closed segments are read
+    back through mmap, so replay does not load a whole segment into memory.
+    A segment is deleted only once all of it was sent; after a restart in
+    the middle of one it is sent again from the start. Per-topic message
+    counts are kept so a sender can tell whether a topic has a backlog.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 512 * 1024, max_bytes: int = 32 * 1024 * 1024):
+        self._dir = directory
+        self._segment_bytes = max(1024, int(segment_bytes))
+        self._max_bytes = max(self._segment_bytes, int(max_bytes))
+        os.makedirs(self._dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._closed: List[int] = []
+        self._sizes: Dict[int, int] = {}
+        self._counts: Dict[int, int] = {}
+        self._seg_topics: Dict[int, Dict[str, int]] = {}
+        for name in os.listdir(self._dir):
+            if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit():
+                seq = int(name[:-len(_SUFFIX)])
+                size = os.path.getsize(self._path(seq))
+                if size:
+                    self._closed.append(seq)
+                    self._sizes[seq] = size
+                    topics: Dict[str, int] = {}
+                    for topic, _ in self.read(seq):
+                        topics[topic] = topics.get(topic, 0) + 1
+                    self._counts[seq] = sum(topics.values())
+                    self._seg_topics[seq] = topics
+                else:
+                    os.remove(self._path(seq))
+        self._closed.sort()
+        self._seq = (self._closed[-1] + 1) if self._closed else 0
+        self._file = None
+        self._file_size = 0
+        self._file_count = 0
+        self._file_topics: Dict[str, int] = {}
+        self._total = sum(self._sizes.values())
+        self._messages = sum(self._counts.values())
+        self._topics: Dict[str, int] = {}
+        for topics in self._seg_topics.values():
+            for topic, n in topics.items():
+                self._topics[topic] = self._topics.get(topic, 0) + n
+
+        self._spooled = 0
+        self._replayed = 0
+        self._evicted_segments = 0
+        self._evicted_messages = 0
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self._dir, f"{seq:010d}{_SUFFIX}")
+
+    def append(self, topic: str, payload: bytes) -> None:
+        t = topic.encode("utf-8")
+        record = _REC.pack(len(t), len(payload)) + t + payload
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path(self._seq), "ab")
+                self._file_size = 0
+                self._file_count = 0
+                self._file_topics = {}
+            self._file.write(record)
+            self._file.flush()
+            self._file_size += len(record)
+            self._file_count += 1
+            self._file_topics[topic] = self._file_topics.get(topic, 0) + 1
+            self._topics[topic] = self._topics.get(topic, 0) + 1
+            self._total += len(record)
+            self._messages += 1
+            self._spooled += 1
+            if self._file_size >= self._segment_bytes:
+                self._rotate_locked()
+            self._evict_locked()
+
+    def _rotate_locked(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._closed.append(self._seq)
+        self._sizes[self._seq] = self._file_size
+        self._counts[self._seq] = self._file_count
+        self._seg_topics[self._seq] = self._file_topics
+        self._file_topics = {}
+        self._seq += 1
+
+    def _forget_topics_locked(self, seq: int) -> None:
+        for topic, n in self._seg_topics.pop(seq, {}).items():
+            left = self._topics.get(topic, 0) - n
+            if left > 0:
+                self._topics[topic] = left
+            else:
+                self._topics.pop(topic, None)
+
+    def _evict_locked(self) -> None:
+        while self._total > self._max_bytes and self._closed:
+            seq = self._closed.pop(0)
+            self._total -= self._sizes.pop(seq, 0)
+            count = self._counts.pop(seq, 0)
+            self._messages -= count
+            self._forget_topics_locked(seq)
+            self._evicted_segments += 1
+            self._evicted_messages += count
+            try:
+                os.remove(self._path(seq))
+            except OSError:
+                pass
+            print(f"[SPOOL] full, evicted segment {seq} ({count} messages)")
+
+    def pending(self) -> bool:
+        with self._lock:
+            return self._total > 0
+
+    def pending_for(self, topic: str) -> bool:
+        """True while messages of `topic` are waiting in the spool."""
+        with self._lock:
+            return topic in self._topics
+
+    def next_segment(self) -> Optional[int]:
+        """Oldest segment to replay (closes the current one if it is the only one)."""
+        with self._lock:
+            if not self._closed and self._file is not None:
+                self._rotate_locked()
+            return self._closed[0] if self._closed else None
+
+    def read(self, seq: int) -> Iterator[Tuple[str, bytes]]:
+        """Yield (topic, payload) records of a segment; stops at a torn tail record."""
+        try:
+            f = open(self._path(seq), "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = 0
+                while pos + _REC.size <= size:
+                    tlen, plen = _REC.unpack_from(mm, pos)
+                    end = pos + _REC.size + tlen + plen
+                    if end > size:
+                        break
+                    body = pos + _REC.size
+                    yield mm[body:body + tlen].decode("utf-8"), mm[body + tlen:end]
+                    pos = end
+
+    def commit(self, seq: int) -> None:
+        """Segment `seq` was fully sent; delete it."""
+        with self._lock:
+            if seq in self._sizes:
+                self._closed.remove(seq)
+                self._total -= self._sizes.pop(seq)
+                count = self._counts.pop(seq, 0)
+                self._messages -= count
+                self._replayed += count
+                self._forget_topics_locked(seq)
+        try:
+            os.remove(self._path(seq))
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._rotate_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "segments": len(self._closed) + (1 if self._file is not None else 0),
+                "messages": self._messages,
+                "bytes": self._total,
+                "max_bytes": self._max_bytes,
+                "spooled": self._spooled,
+                "replayed": self._replayed,
+                "evicted_segments": self._evicted_segments,
+                "evicted_messages": self._evicted_messages,
+            }
+
+
+class SpoolForwarder(threading.Thread):
+    """Daemon thread that replays an EdgeSpool, oldest first, while connected.
+
+    Messages are sent at most `rate_per_sec` per second so a reconnect after
+    a long outage does not flood the broker or the uplink. A message that
+    fails to send is retried after the next reconnect.
+
+    A segment is committed (deleted) only when every receipt returned by
+    `send_fn` reports the message published, i.e. the broker acknowledged
+    it. If that does not happen within `ack_timeout_sec` (e.g. the link went
+    half-open), the whole segment is sent again: delivery is at least once.
+    """
+
+    def __init__(self, spool: EdgeSpool, send_fn: SendFn, connected: threading.Event,
+                 rate_per_sec: float = 20.0, idle_sec: float = 1.0, ack_timeout_sec: float = 90.0):
+        super().__init__(daemon=True)
+        self._spool = spool
+        self._send = send_fn
+        self._connected = connected
+        self._gap = 1.0 / max(0.1, float(rate_per_sec))
+        self._idle = max(0.05, float(idle_sec))
+        self._ack_timeout = max(1.0, float(ack_timeout_sec))
+        self._stop_event = threading.Event()
+        self.resent_segments = 0
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def _wait_connected(self) -> bool:
+        while not self._connected.is_set():
+            if self._stop_event.wait(self._idle):
+                return False
+        return True
+
+    def _wait_acked(self, receipts: List[Any]) -> bool:
+        deadline = time.monotonic() + self._ack_timeout
+        for receipt in receipts:
+            while not receipt.is_published():
+                if time.monotonic() >= deadline or self._stop_event.wait(min(self._gap, 0.05)):
+                    return False
+        return True
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            seq = self._spool.next_segment()
+            if seq is None:
+                self._stop_event.wait(self._idle)
+                continue
+
+            done = True
+            receipts: List[Any] = []
+            for topic, payload in self._spool.read(seq):
+                while True:
+                    if not self._wait_connected():
+                        return
+                    receipt = self._send(topic, payload)
+                    if receipt:
+                        if receipt is not True:
+                            receipts.append(receipt)
+                        break
+                    self._stop_event.wait(self._idle)
+                if self._stop_event.wait(self._gap):
+                    done = False
+                    break
+            if done and not self._wait_acked(receipts):
+                if self._stop_event.is_set():
+                    return
+                self.resent_segments += 1
+                print(f"[SPOOL] segment {seq} not acknowledged, sending it again")
+                continue
+            if done:
+                self._spool.commit(seq)
@@ -0,0 +1,202 @@
+"""MQTT payload framing: plain JSON or a binary batch format.
+
+Plain JSON payloads are sent as-is (what every server understands).
+Binary payloads start with a 4-byte header so the receiver can tell them
+apart from JSON without guessing:
+
+    b"\\x00SH" + format byte
+
+    format byte: low nibble = encoding (0x00 JSON, 0x01 MessagePack)
+                 bits 4-5   = compression (0x10 zlib, 0x20 zstd)
+
+A JSON document can never start with a NUL byte, so the server can accept
+both forms on the same topic and edges can be migrated one at a time.
+
+Compression (Compressor) is applied only to payloads of at least
+`min_bytes` and only when it actually makes them smaller, so small single
+readings go out unchanged. zlib is stdlib; zstd needs the optional
+`zstandard` package. Config: global.mqtt.compression ("off" | "zlib" | "zstd",
+env MQTT_COMPRESSION overrides), compression_level, compression_min_bytes.
+
+Batches can also use a columnar layout (to_columnar): readings of the
+same device share one header and carry parallel ts[] / value[] arrays:
+
+    {"layout": "columnar", "pi": .., "code": .., "device_name": .., "simulated": ..,
+     "kind": .., "unit": .., "ts": [..], "value": [..]}
+
+Readings with fields outside that header (e.g. buzzer "beep" events) stay
+plain dicts in the same list. Order is kept per device, not across devices.
+
+Selection: env MQTT_BATCH_FORMAT overrides settings.json global.mqtt.batch_format;
+values are "json" (default) or "msgpack". msgpack is optional; if it is
+not installed the edge falls back to JSON.
+
+The edge (simulation/utils/wire.py) and the server (server/wire.py, deployed
+on its own) each ship a copy of this module; the two files must stay
+identical (checked by tests/test_mirrors.py).
+"""
+import os
+import zlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    msgpack = None  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore
+
+MAGIC = b"\x00SH"
+HEADER_LEN = 4
+
+ENC_JSON = 0x00
+ENC_MSGPACK = 0x01
+COMP_ZLIB = 0x10
+COMP_ZSTD = 0x20
+_ENC_MASK = 0x0F
+_COMP_MASK = 0x30
+
+FORMATS = ("json", "msgpack")
+COMPRESSIONS = ("off", "zlib", "zstd")
+
+# refuse to inflate a single MQTT payload beyond this
+MAX_DECOMPRESSED = 16 * 1024 * 1024
+
+LAYOUT_COLUMNAR = "columnar"
+HEADER_KEYS = ("pi", "code", "device_name", "simulated", "kind", "unit")
+_COLUMNAR_KEYS = frozenset(HEADER_KEYS + ("value", "ts"))
+
+
+def resolve_format(name: Optional[str] = None) -> str:
+    """Pick the outgoing format (see module docstring)."""
+    fmt = (os.getenv("MQTT_BATCH_FORMAT") or name or "json").strip().lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown batch format: {fmt}")
+    if fmt == "msgpack" and msgpack is None:
+        print("[MQTT] msgpack nije instaliran - batch format ostaje json")
+        return "json"
+    return fmt
+
+
+class Compressor:
+    """Threshold-based payload compression for outgoing batches."""
+
+    def __init__(self, algo: str = "zlib", level: Optional[int] = None, min_bytes: int = 1024):
+        if algo == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstd compression requested but zstandard is not installed")
+            self.flag = COMP_ZSTD
+            self._zstd = zstandard.ZstdCompressor(level=3 if level is None else int(level))
+        elif algo == "zlib":
+            self.flag = COMP_ZLIB
+            self._level = 6 if level is None else int(level)
+        else:
+            raise ValueError(f"unknown compression: {algo}")
+        self.algo = algo
+        self.min_bytes = max(0, int(min_bytes))
+
+    def compress(self, body: bytes) -> Optional[bytes]:
+        """Compressed body, or None when it is below the threshold or would not shrink."""
+        if len(body) < self.min_bytes:
+            return None
+        if self.flag == COMP_ZSTD:
+            out = self._zstd.compress(body)
+        else:
+            out = zlib.compress(body, self._level)
+        return out if len(out) < len(body) else None
+
+
+def resolve_compression(cfg: Optional[Dict[str, Any]] = None) -> Optional[Compressor]:
+    """Build a Compressor from global.mqtt settings (see module docstring), or None."""
+    cfg = cfg or {}
+    algo = (os.getenv("MQTT_COMPRESSION") or cfg.get("compression") or "off").strip().lower()
+    if algo not in COMPRESSIONS:
+        raise ValueError(f"unknown compression: {algo}")
+    if algo == "off":
+        return None
+    level = cfg.get("compression_level")
+    if algo == "zstd" and zstandard is None:
+        print("[MQTT] zstandard nije instaliran - kompresija ostaje zlib")
+        algo, level = "zlib", None
+    return Compressor(algo, level=level, min_bytes=cfg.get("compression_min_bytes", 1024))
+
+
+def encode(obj: Any, fmt: str, json_codec, compressor: Optional[Compressor] = None) -> bytes:
+    if fmt == "msgpack":
+        enc, body = ENC_MSGPACK, msgpack.packb(obj, use_bin_type=True)
+    else:
+        enc, body = ENC_JSON, json_codec.dumps(obj)
+
+    if compressor is not None:
+        packed = compressor.compress(body)
+        if packed is not None:
+            return MAGIC + bytes([enc | compressor.flag]) + packed
+    if enc == ENC_JSON:
+        return body
+    return MAGIC + bytes([enc]) + body
+
+
+def _decompress(flag: int, body: bytes) -> bytes:
+    if flag == COMP_ZLIB:
+        d = zlib.decompressobj()
+        out = d.decompress(body, MAX_DECOMPRESSED)
+        if d.unconsumed_tail:
+            raise ValueError("decompressed payload too large")
+        return out
+    if flag == COMP_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd payload received but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=MAX_DECOMPRESSED)
+    raise ValueError(f"unknown compression flag 0x{flag:02x}")
+
+
+def decode(data: bytes, json_codec) -> Any:
+    if data[:3] != MAGIC:
+        return json_codec.loads(data)
+
+    if len(data) < HEADER_LEN:
+        raise ValueError("truncated payload header")
+    fmt = data[3]
+    body = data[HEADER_LEN:]
+    if fmt & _COMP_MASK:
+        body = _decompress(fmt & _COMP_MASK, body)
+
+    enc = fmt & _ENC_MASK
+    if enc == ENC_JSON:
+        return json_codec.loads(body)
+    if enc == ENC_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack payload received but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False)
+    raise ValueError(f"unknown payload format 0x{fmt:02x}")
+
+
+def is_columnar(item: Dict[str, Any]) -> bool:
+    return item.get("layout") == LAYOUT_COLUMNAR
+
+
+def to_columnar(readings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group readings into columnar blocks, one per distinct header."""
+    out: List[Dict[str, Any]] = []
+    blocks: Dict[tuple, Dict[str, Any]] = {}
+    for reading in readings:
+        if not _COLUMNAR_KEYS.issuperset(reading):
+            out.append(reading)
+            continue
+        key = tuple(reading.get(k) for k in HEADER_KEYS)
+        block = blocks.get(key)
+        if block is None:
+            block = {"layout": LAYOUT_COLUMNAR}
+            for k in HEADER_KEYS:
+                if k in reading:
+                    block[k] = reading[k]
+            block["ts"] = []
+            block["value"] = []
+            blocks[key] = block
+            out.append(block)
+        block["ts"].append(reading.get("ts"))
+        block["value"].append(reading.get("value"))
+    return out
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The server (flat modules) and the edge simulation (`utils`, `sensors`, ...)
+# are run from their own directories; tests import them the same way.
+_ROOT = os.path.join(os.path.dirname(__file__), "..")
+for _sub in ("server", "simulation"):
+    _path = os.path.abspath(os.path.join(_ROOT, _sub))
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
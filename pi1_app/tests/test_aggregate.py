@@ -0,0 +1,55 @@
+import pytest
+
+from sensor_registry import DEFAULT_ROUTES, SensorRegistry
+from system_state import SystemState
+from utils.aggregator import WindowAggregator
+from utils.device_payload import build_payload
+
+
+def _summary(code: str, samples: list, extra: dict) -> dict:
+    agg = WindowAggregator(window_s=1.0)
+    window = None
+    for i, v in enumerate(samples + [samples[-1]]):
+        window = agg.add(v, now=i * 0.5) or window
+    stats = {k: v for k, v in window.items() if k != "last"}
+    return build_payload("PI2", code, code, window["last"], True, extra={**extra, "agg": stats})
+
+
+@pytest.fixture
+def state():
+    return SystemState()
+
+
+@pytest.fixture
+def registry(state):
+    handlers = {
+        "gsg": lambda code, value, reading: state.handle_gsg(value),
+        "distance": lambda code, value, reading: state.update_distance(code, value, reading.get("ts")),
+    }
+    routes = {k: v for k, v in DEFAULT_ROUTES.items() if v in handlers}
+    return SensorRegistry.from_config(routes, handlers)
+
+
+def test_gsg_summary_does_not_raise_the_alarm(state, registry):
+    frame = _summary("GSG", [1.0, 45.0], {"unit": "deg", "kind": "gyro"})
+    assert frame["agg"]["max"] == 45.0
+    assert not registry.dispatch(frame)
+    assert not state.alarm_active
+
+
+def test_dus_summary_does_not_feed_the_distance_history(state, registry):
+    frame = _summary("DUS1", [120.0, 30.0], {"unit": "cm", "kind": "ultrasonic"})
+    assert not registry.dispatch(frame)
+    assert not state._distance_history["DUS1"]
+
+
+def test_live_gsg_reading_raises_the_alarm(state, registry):
+    live = build_payload("PI2", "GSG", "GSG", 45.0, True, extra={"unit": "deg", "kind": "gyro"})
+    assert registry.dispatch(live)
+    assert state.alarm_active
+
+
+def test_replayed_reading_is_storage_only(state, registry):
+    live = build_payload("PI2", "GSG", "GSG", 45.0, True, extra={"unit": "deg", "kind": "gyro"})
+    assert not registry.dispatch({**live, "replayed": True})
+    assert not state.alarm_active
@@ -0,0 +1,48 @@
+import time
+
+from utils.batch_sender import LANE_BULK, LANE_CRITICAL, BatchSender
+
+
+class RecordingClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, critical=False):
+        self.published.append((topic, payload, critical))
+
+
+def _reading(code: str, value=1) -> dict:
+    return {"code": code, "value": value, "ts": time.time()}
+
+
+def test_full_critical_lane_drops_after_block_timeout():
+    # not started: nothing drains the queues
+    sender = BatchSender(RecordingClient(), max_queue=1, priorities={"DS1": "critical"},
+                         block_timeout_sec=0.01)
+    assert sender.enqueue("door", _reading("DS1"))
+    started = time.monotonic()
+    assert not sender.enqueue("door", _reading("DS1"))
+    assert time.monotonic() - started < 0.5
+    stats = sender.stats()[LANE_CRITICAL]
+    assert stats["dropped"] == 1 and stats["block_timeouts"] == 1
+
+
+def test_zero_block_timeout_never_waits():
+    sender = BatchSender(RecordingClient(), max_queue=1, overflow="block", block_timeout_sec=0)
+    assert sender.enqueue("dht", _reading("DHT1"))
+    assert not sender.enqueue("dht", _reading("DHT1"))
+    assert sender.stats()[LANE_BULK]["block_timeouts"] == 1
+
+
+def test_lanes_publish_with_their_priority():
+    client = RecordingClient()
+    sender = BatchSender(client, batch_interval_sec=0.05, priorities={"DS1": "critical"},
+                         critical_interval_sec=0.0)
+    sender.start()
+    try:
+        sender.enqueue("door", _reading("DS1"))
+        sender.enqueue("dht", _reading("DHT1"))
+    finally:
+        sender.stop()
+    by_topic = {topic: critical for topic, _, critical in client.published}
+    assert by_topic == {"door": True, "dht": False}
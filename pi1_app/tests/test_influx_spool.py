@@ -0,0 +1,177 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import SYNCHRONOUS
+
+from influx_spool import InfluxSpool, SpoolReplayer, is_rejected
+from influx_writer import InfluxBatchWriter
+from line_protocol import LineProtocolEncoder
+
+BASE_TS = 1_700_000_000.0
+HEADER = {"pi": "PI1", "device_name": "Door Ultrasonic Sensor", "simulated": True}
+
+
+class StubInflux:
+    """Local stand-in for POST /api/v2/write: 503 while down, 422 for any
+    request holding a line with b"bad", otherwise 204 (the lines are kept)."""
+
+    def __init__(self):
+        self.up = True
+        self.lines = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    if not stub.up:
+                        status = 503
+                    elif b"bad" in body:
+                        status = 422
+                    else:
+                        status = 204
+                        stub.lines.extend(line for line in body.split(b"\n") if line)
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.lines)
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _wait(cond, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return cond()
+
+
+@pytest.fixture
+def stub():
+    stub = StubInflux()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def write_lines(stub):
+    client = InfluxDBClient(url=stub.url, token="test", org="iot", timeout=2000)
+    write_api = client.write_api(write_options=SYNCHRONOUS)
+
+    def write(lines):
+        write_api.write(bucket="smart_home", org="iot", record=b"\n".join(lines), write_precision=WritePrecision.NS)
+
+    yield write
+    client.close()
+
+
+def _lines(start: int, end: int):
+    enc = LineProtocolEncoder()
+    return [enc.sensor_line("home/pi1/distance", "DUS1", HEADER, float(i % 200), BASE_TS + i * 0.01)
+            for i in range(start, end)]
+
+
+def _bad_line() -> bytes:
+    return b"distance,code=bad value=1 1700000000000000000"
+
+
+def test_is_rejected_only_for_permanent_4xx():
+    class Err(Exception):
+        def __init__(self, status):
+            self.status = status
+
+    assert is_rejected(Err(400))
+    assert is_rejected(Err(422))
+    assert not is_rejected(Err(429))
+    assert not is_rejected(Err(401))
+    assert not is_rejected(Err(503))
+    assert not is_rejected(Exception("connection refused"))
+
+
+def test_outage_loses_no_points_and_keeps_timestamps(stub, write_lines, tmp_path):
+    spool = InfluxSpool(str(tmp_path), segment_bytes=64 * 1024)
+    replayer = SpoolReplayer(spool, write_lines, batch_size=1000, idle_sec=0.05, max_backoff_sec=0.2)
+    writer = InfluxBatchWriter(write_lines, batch_size=200, flush_interval_sec=0.05, spool=spool)
+    replayer.start()
+    writer.start()
+    expected = _lines(0, 3000)
+    try:
+        for line in expected[:1000]:
+            writer.submit(line)
+        assert _wait(lambda: stub.count() >= 1000)
+
+        stub.up = False
+        for line in expected[1000:2000]:
+            writer.submit(line)
+        assert _wait(lambda: writer.stats()["spooled"] >= 1000)
+        assert stub.count() == 1000
+
+        stub.up = True
+        for line in expected[2000:]:
+            writer.submit(line)
+        assert _wait(lambda: stub.count() >= len(expected) and not spool.pending())
+    finally:
+        writer.stop()
+        replayer.stop()
+
+    assert sorted(stub.lines) == sorted(expected)
+    # points submitted while the backlog drains queue behind it on disk
+    assert spool.stats()["replayed"] >= 1000
+    assert writer.stats()["failed"] == 0
+
+
+def test_writer_quarantines_a_rejected_batch_and_moves_on(stub, write_lines, tmp_path):
+    spool = InfluxSpool(str(tmp_path))
+    writer = InfluxBatchWriter(write_lines, batch_size=10, flush_interval_sec=0.05, spool=spool)
+    writer.start()
+    good = _lines(0, 5)
+    try:
+        writer.submit(_bad_line())
+        assert _wait(lambda: writer.stats()["rejected"] == 1)
+        for line in good:
+            writer.submit(line)
+        assert _wait(lambda: stub.count() >= len(good))
+    finally:
+        writer.stop()
+
+    assert stub.lines == good
+    assert not spool.pending()
+    assert spool.stats()["rejected"] == 1
+    assert (tmp_path / "rejected.lp").read_bytes() == _bad_line() + b"\n"
+
+
+def test_replayer_quarantines_a_rejected_chunk_and_commits_the_rest(stub, write_lines, tmp_path):
+    spool = InfluxSpool(str(tmp_path))
+    good = _lines(0, 4)
+    spool.append(good[:2] + [_bad_line()] + good[2:])
+    spool.close()
+    replayer = SpoolReplayer(spool, write_lines, batch_size=1, idle_sec=0.05)
+    replayer.start()
+    try:
+        assert _wait(lambda: not spool.pending())
+    finally:
+        replayer.stop()
+
+    assert stub.lines == good
+    assert replayer.stats()["rejected"] == 1
+    assert spool.stats()["replayed"] == len(good)
+    assert (tmp_path / "rejected.lp").read_bytes() == _bad_line() + b"\n"
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from sensors.membrane_switch import MembraneKeypad, run_membrane_switch_loop
+from utils.fake_gpio import FakeGPIO
+
+ROWS = [5, 6, 13, 19]
+COLS = [12, 16, 20, 21]
+KEYMAP = [["1", "2", "3", "A"], ["4", "5", "6", "B"], ["7", "8", "9", "C"], ["*", "0", "#", "D"]]
+
+
+@pytest.fixture
+def gpio():
+    return FakeGPIO()
+
+
+@pytest.fixture
+def keypad(gpio):
+    keypad = MembraneKeypad(ROWS, COLS, KEYMAP, gpio=gpio, debounce_ms=30, settle_s=0.0)
+    keypad.setup()
+    return keypad
+
+
+def _press(gpio, *keys):
+    for r, c in keys:
+        gpio.close_contact(ROWS[r], COLS[c])
+
+
+def _release(gpio, *keys):
+    for r, c in keys:
+        gpio.open_contact(ROWS[r], COLS[c])
+
+
+def test_scan_reads_held_keys(gpio, keypad):
+    _press(gpio, (0, 0), (2, 3))
+    assert keypad.scan() == {(0, 0), (2, 3)}
+    # scanning leaves every row LOW
+    assert not keypad.any_column_high()
+
+
+def test_release_bounce_within_debounce_is_not_a_new_press(gpio, keypad):
+    _press(gpio, (0, 0))
+    assert keypad.update(keypad.scan(), now=0.000) == ["1"]
+
+    # contact chatter on release: open, closed again, open
+    _release(gpio, (0, 0))
+    assert keypad.update(keypad.scan(), now=0.010) == []
+    _press(gpio, (0, 0))
+    assert keypad.update(keypad.scan(), now=0.015) == []
+    _release(gpio, (0, 0))
+    assert keypad.update(keypad.scan(), now=0.020) == []
+    # released for less than debounce_ms since the last bounce: still held
+    assert keypad.update(keypad.scan(), now=0.045) == []
+    assert not keypad.idle()
+
+    assert keypad.update(keypad.scan(), now=0.051) == []
+    assert keypad.idle()
+    _press(gpio, (0, 0))
+    assert keypad.update(keypad.scan(), now=0.060) == ["1"]
+    assert keypad.stats()["presses"] == 2
+
+
+def test_chord_reports_each_key_once(gpio, keypad):
+    _press(gpio, (0, 0), (1, 2))
+    assert keypad.update(keypad.scan(), now=0.0) == ["1", "6"]
+    assert keypad.update(keypad.scan(), now=0.01) == []
+
+
+def test_ghosted_scan_ignores_new_presses_until_it_clears(gpio, keypad):
+    _press(gpio, (0, 0))
+    assert keypad.update(keypad.scan(), now=0.0) == ["1"]
+
+    # (0,0), (0,1), (1,0) held: without diodes (1,1) reads as pressed too
+    _press(gpio, (0, 1), (1, 0), (1, 1))
+    assert keypad.update(keypad.scan(), now=0.01) == []
+    assert keypad.stats()["ghosted_scans"] == 1
+
+    _release(gpio, (1, 0), (1, 1))
+    assert keypad.update(keypad.scan(), now=0.02) == ["2"]
+    assert keypad.stats()["presses"] == 2
+
+
+def test_edge_detect_is_all_or_nothing(gpio, keypad):
+    gpio.add_event_detect(COLS[2], gpio.RISING)
+    with pytest.raises(RuntimeError):
+        keypad.enable_edge_detect(lambda _ch: None)
+    # the columns armed before the failure were released again
+    gpio.remove_event_detect(COLS[2])
+    keypad.enable_edge_detect(lambda _ch: None)
+    keypad.disable_edge_detect()
+
+
+def test_idle_rows_let_a_press_raise_its_column(gpio, keypad):
+    edges = []
+    keypad.enable_edge_detect(edges.append)
+    keypad.idle_rows()
+    _press(gpio, (3, 1))
+    assert edges == [COLS[1]]
+    assert keypad.any_column_high()
+    keypad.disable_edge_detect()
+
+
+def _wait(cond, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    return cond()
+
+
+@pytest.mark.parametrize("use_events", [True, False])
+def test_loop_reports_each_press_once(gpio, use_events):
+    seen = []
+    stop = threading.Event()
+    t = threading.Thread(target=run_membrane_switch_loop,
+                         args=(ROWS, COLS, KEYMAP, 0.005, lambda key, code: seen.append((key, code)), stop, "DMS"),
+                         kwargs={"debounce_ms": 10, "use_events": use_events, "scan_ms": 1, "gpio": gpio},
+                         daemon=True)
+    t.start()
+    try:
+        time.sleep(0.05)
+        for key, (r, c) in (("5", (1, 1)), ("#", (3, 2))):
+            _press(gpio, (r, c))
+            assert _wait(lambda: (key, "DMS") in seen)
+            _release(gpio, (r, c))
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        t.join(timeout=2.0)
+
+    assert seen == [("5", "DMS"), ("#", "DMS")]
+    # edge detection is released on exit: the columns can be armed again
+    for c in COLS:
+        gpio.add_event_detect(c, gpio.RISING)
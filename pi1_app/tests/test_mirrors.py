@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+_ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# modules the edge and the server both need; the server image is built from
+# server/ alone, so each side ships its own copy
+MIRRORS = ["codec.py", "wire.py"]
+
+
+@pytest.mark.parametrize("name", MIRRORS)
+def test_server_copy_matches_the_edge_module(name):
+    with open(os.path.join(_ROOT, "server", name), "rb") as f:
+        server = f.read()
+    with open(os.path.join(_ROOT, "simulation", "utils", name), "rb") as f:
+        edge = f.read()
+    assert server == edge, f"server/{name} and simulation/utils/{name} differ; copy one over the other"
+
+
+def test_edge_frames_decode_on_the_server():
+    import codec as server_codec
+    import wire as server_wire
+    from utils import codec as edge_codec
+    from utils import wire as edge_wire
+
+    batch = [{"code": "DUS1", "value": 12.5, "ts": 1.0}, {"code": "DUS1", "value": 13.0, "ts": 2.0}]
+    comp = edge_wire.Compressor("zlib", min_bytes=0)
+    data = edge_wire.encode(edge_wire.to_columnar(batch), "json", edge_codec.get_codec("json"), comp)
+    assert server_wire.decode(data, server_codec.get_codec("json")) == edge_wire.to_columnar(batch)
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from utils import scheduler as sched_mod
+from utils.scheduler import SensorScheduler, _Job
+
+
+class Clock:
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(sched_mod.time, "monotonic", c)
+    return c
+
+
+def _job(clock: Clock, period: float, durations: list) -> _Job:
+    # each run "takes" the next duration on the fake clock
+    steps = iter(durations)
+
+    def step():
+        clock.now += next(steps)
+
+    return _Job("J", period, step, due=clock.now)
+
+
+def _tick(sched: SensorScheduler, job: _Job, clock: Clock) -> None:
+    # the loop starts a job when it is due (or later, if it was busy)
+    clock.now = max(clock.now, job.due)
+    sched._run_job(job)
+
+
+def test_fixed_rate_does_not_drift_with_step_time(clock):
+    sched = SensorScheduler()
+    job = _job(clock, 1.0, [0.3] * 5)
+    start = job.due
+    for _ in range(5):
+        _tick(sched, job, clock)
+    # next tick is exactly 5 periods after the first, not 5 * (1.0 + 0.3)
+    assert job.due == pytest.approx(start + 5.0)
+    assert job.missed == 0
+    assert job.runs == 5
+
+
+def test_overrun_skips_and_counts_missed_ticks(clock):
+    sched = SensorScheduler()
+    job = _job(clock, 1.0, [2.5, 0.1, 0.1])
+    start = job.due
+    _tick(sched, job, clock)
+    # ticks at +1 and +2 passed during the 2.5 s step: skipped, not run back to back
+    assert job.missed == 2
+    assert job.due == pytest.approx(start + 3.0)
+    _tick(sched, job, clock)
+    _tick(sched, job, clock)
+    # back on the original grid
+    assert job.due == pytest.approx(start + 5.0)
+    assert job.missed == 2
+    assert job.runs == 3
+
+
+def test_late_start_is_reported_as_jitter(clock):
+    sched = SensorScheduler()
+    job = _job(clock, 1.0, [0.0])
+    start = job.due
+    clock.now = start + 0.25
+    sched._run_job(job)
+    assert job.lat_last == pytest.approx(0.25)
+    assert job.due == pytest.approx(start + 1.0)
+
+
+def test_scheduler_thread_runs_jobs_and_posts():
+    sched = SensorScheduler()
+    ticks = []
+    posted = threading.Event()
+    sched.every("A", 0.01, lambda: ticks.append(time.monotonic()))
+    sched.start()
+    try:
+        sched.post(posted.set)
+        assert posted.wait(1.0)
+        deadline = time.monotonic() + 2.0
+        while len(ticks) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        sched.stop()
+    assert len(ticks) >= 5
+    stats = sched.stats()
+    assert stats["jobs"] == 1 and stats["posted"] == 1
+    assert stats["devices"]["A"]["runs"] == len(ticks)
+    assert not sched.is_alive()
+
+
+def test_duplicate_job_name_is_rejected():
+    sched = SensorScheduler()
+    sched.every("A", 1.0, lambda: None)
+    with pytest.raises(ValueError):
+        sched.every("A", 1.0, lambda: None)
@@ -0,0 +1,130 @@
+import math
+import time
+
+import pytest
+
+from sensors.ultrasonic import SOUND_CM_PER_S, UltrasonicSensor, filter_burst
+from utils.fake_gpio import FakeGPIO
+
+TRIG, ECHO = 23, 24
+
+
+class ScriptedEcho(FakeGPIO):
+    """FakeGPIO whose echo edges are played synchronously at the end of each
+    trigger pulse, at exact times of a fake perf_counter, so the edge timing
+    logic can be checked without thread scheduling noise."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.script = []  # per ping: [(t, level), ...]
+
+    def output(self, pin, value):
+        falling = self.input(pin) == self.HIGH and not value
+        super().output(pin, value)
+        if pin == TRIG and falling and self.script:
+            for t, level in self.script.pop(0):
+                self.clock.now = t
+                self.set_level(ECHO, level)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _echo(start: float, cm: float):
+    return [(start, FakeGPIO.HIGH), (start + 2.0 * cm / SOUND_CM_PER_S, FakeGPIO.LOW)]
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "perf_counter", clock)
+    return ScriptedEcho(clock)
+
+
+def _sensor(gpio, **kwargs) -> UltrasonicSensor:
+    sensor = UltrasonicSensor(TRIG, ECHO, gpio=gpio, **kwargs)
+    sensor.setup()
+    return sensor
+
+
+def test_filter_burst_median_without_outliers():
+    assert filter_burst([100.0, 101.0, 160.0], max_dev_cm=5.0) == pytest.approx(100.5)
+
+
+def test_filter_burst_drops_timeouts():
+    assert filter_burst([math.inf, 50.0, math.nan, 52.0]) == pytest.approx(51.0)
+
+
+def test_filter_burst_too_few_valid_is_out_of_range():
+    assert filter_burst([math.inf, math.inf, 50.0], min_valid=2) == math.inf
+    assert filter_burst([]) == math.inf
+
+
+def test_edge_timing_uses_rise_and_fall(scripted):
+    scripted.script.append(_echo(1.0, 100.0))
+    sensor = _sensor(scripted)
+    assert sensor.stats()["edge_timing"]
+    assert sensor.ping_cm() == pytest.approx(100.0)
+
+
+def test_stale_falling_edge_is_not_taken_as_echo_start(scripted):
+    # the previous echo is still HIGH at the trigger and ends only after it
+    sensor = _sensor(scripted)
+    scripted.set_level(ECHO, FakeGPIO.HIGH)
+    scripted.script.append([(0.5, FakeGPIO.LOW)] + _echo(1.0, 100.0))
+    assert sensor.ping_cm() == pytest.approx(100.0)
+
+
+def test_edges_after_a_timeout_do_not_leak_into_the_next_ping(scripted):
+    sensor = _sensor(scripted)
+    # only the rising edge shows up: the ping times out
+    scripted.script.append(_echo(1.0, 50.0)[:1])
+    assert sensor.ping_cm(timeout_s=0.005) == math.inf
+    # ...and its falling edge arrives late, before the next echo
+    scripted.script.append([(2.0, FakeGPIO.LOW)] + _echo(3.0, 70.0))
+    assert sensor.ping_cm() == pytest.approx(70.0)
+    assert sensor.stats()["timeouts"] == 1
+
+
+def test_no_echo_times_out_as_inf(scripted):
+    sensor = _sensor(scripted)
+    assert sensor.ping_cm(timeout_s=0.005) == math.inf
+    assert sensor.stats()["timeouts"] == 1
+
+
+def test_polling_without_echo_times_out_as_inf():
+    sensor = _sensor(FakeGPIO(), use_events=False)
+    assert not sensor.stats()["edge_timing"]
+    assert sensor.ping_cm(timeout_s=0.005) == math.inf
+
+
+def test_out_of_range_echo_is_inf(scripted):
+    scripted.script.append(_echo(1.0, 250.0))
+    sensor = _sensor(scripted, max_range_cm=200.0)
+    assert sensor.ping_cm() == math.inf
+    assert sensor.stats()["out_of_range"] == 1
+
+
+def test_burst_rejects_a_single_outlier(scripted):
+    scripted.script.extend([_echo(1.0, 60.0), _echo(2.0, 150.0), _echo(3.0, 61.0)])
+    sensor = _sensor(scripted, burst=3, burst_gap_s=0.0, max_dev_cm=5.0)
+    assert sensor.measure_cm() == pytest.approx(60.5)
+    assert sensor.stats()["measurements"] == 3
+
+
+def test_echo_thread_end_to_end():
+    # real FakeGPIO echo model (a thread per ping); timing is only as
+    # accurate as the host scheduler, hence the wide tolerance
+    gpio = FakeGPIO()
+    gpio.attach_echo(TRIG, ECHO, lambda: 150.0)
+    sensor = _sensor(gpio)
+    try:
+        assert sensor.ping_cm() == pytest.approx(150.0, abs=50.0)
+    finally:
+        sensor.close()
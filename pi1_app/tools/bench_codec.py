@@ -0,0 +1,104 @@
+"""Micro-benchmark: MQTT batch payload encode/decode per JSON codec and wire format.
+
+Usage (from pi1_app/):
+    py tools/bench_codec.py [--readings 500] [--rounds 200] [--columnar] [--compression zlib]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "simulation"))
+
+from utils.codec import OrjsonCodec, StdlibJsonCodec, orjson  # noqa: E402
+from utils.device_payload import build_payload  # noqa: E402
+from utils import wire  # noqa: E402
+
+
+def _sample_batch(n: int) -> list:
+    batch = []
+    for i in range(n):
+        if i % 3 == 0:
+            value = {"temperature_c": 21.0 + (i % 50) / 10.0, "humidity_pct": 40.0 + (i % 20)}
+            batch.append(build_payload("PI2", "DHT3", "Kitchen DHT", value, True, extra={"kind": "dht"}))
+        elif i % 3 == 1:
+            batch.append(build_payload("PI2", "GSG", "Gyroscope", round(i * 0.37 % 55, 2), True,
+                                       extra={"unit": "deg", "kind": "gyro"}))
+        else:
+            batch.append(build_payload("PI1", "DUS1", "Door Ultrasonic Sensor", float(i % 200), True,
+                                       extra={"unit": "cm", "kind": "ultrasonic"}))
+    return batch
+
+
+def _bench(codec, batch: list, readings: int, rounds: int) -> dict:
+    data = codec.dumps(batch)
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        codec.dumps(batch)
+    enc = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        codec.loads(data)
+    dec = time.perf_counter() - t0
+
+    return {
+        "bytes": len(data),
+        "enc_us": enc / rounds * 1e6,
+        "dec_us": dec / rounds * 1e6,
+        "readings_per_s": readings * rounds / (enc + dec),
+    }
+
+
+class _Wire:
+    """Adapter so wire formats / compression go through the same _bench()."""
+
+    def __init__(self, json_codec, fmt: str, compressor=None):
+        self._json = json_codec
+        self._fmt = fmt
+        self._compressor = compressor
+        self.name = json_codec.name if fmt == "json" else fmt
+
+    def dumps(self, obj):
+        return wire.encode(obj, self._fmt, self._json, self._compressor)
+
+    def loads(self, data):
+        return wire.decode(data, self._json)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--columnar", action="store_true", help="columnar batch layout (wire.to_columnar)")
+    parser.add_argument("--compression", choices=wire.COMPRESSIONS, default="off")
+    parser.add_argument("--level", type=int, default=None)
+    args = parser.parse_args()
+
+    compressor = wire.resolve_compression({"compression": args.compression, "compression_level": args.level})
+
+    batch = _sample_batch(args.readings)
+    if args.columnar:
+        batch = wire.to_columnar(batch)
+    codecs = [_Wire(StdlibJsonCodec(), "json", compressor)]
+    if orjson is not None:
+        codecs.append(_Wire(OrjsonCodec(), "json", compressor))
+    else:
+        print("(orjson nije instaliran - meri se samo stdlib json)")
+    if wire.msgpack is not None:
+        codecs.append(_Wire(StdlibJsonCodec(), "msgpack", compressor))
+    else:
+        print("(msgpack nije instaliran - binarni format se ne meri)")
+
+    layout = "columnar" if args.columnar else "rows"
+    comp = compressor.algo if compressor is not None else "off"
+    print(f"batch={args.readings} readings ({layout}), compression={comp}, rounds={args.rounds}")
+    print(f"{'codec':<8} {'bytes':>8} {'encode us':>10} {'decode us':>10} {'readings/s':>12}")
+    for codec in codecs:
+        r = _bench(codec, batch, args.readings, args.rounds)
+        print(f"{codec.name:<8} {r['bytes']:>8} {r['enc_us']:>10.1f} {r['dec_us']:>10.1f} {r['readings_per_s']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
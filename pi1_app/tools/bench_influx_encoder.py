@@ -0,0 +1,141 @@
+"""Micro-benchmark: Influx line-protocol encoding, Point builder vs LineProtocolEncoder.
+
+The "point" column is the per-reading Point builder the server used before
+(rebuilds tags and the DMS key map for every reading); "encoder" is
+server/line_protocol.py. Both outputs are compared line by line first.
+
+Usage (from pi1_app/):
+    py tools/bench_influx_encoder.py [--readings 2000] [--rounds 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from influxdb_client import Point, WritePrecision  # noqa: E402
+
+from line_protocol import LineProtocolEncoder  # noqa: E402
+
+
+def _point_line(topic: str, payload: dict) -> str:
+    code = payload.get("code") or topic.split("/")[-1]
+    p = Point(f"sensor_{code}".lower())
+    p = p.tag("pi", str(payload.get("pi", "")))
+    p = p.tag("code", str(code))
+    p = p.tag("device_name", str(payload.get("device_name", "")))
+    p = p.tag("simulated", str(payload.get("simulated", False)).lower())
+    p = p.tag("topic", topic)
+
+    val = payload.get("value")
+    if isinstance(val, (int, float, bool)):
+        p = p.field("value", val)
+    elif isinstance(val, str):
+        if str(code).upper() == "DMS":
+            key_map = {
+                "0": 0, "1": 1, "2": 2, "3": 3, "4": 4,
+                "5": 5, "6": 6, "7": 7, "8": 8, "9": 9,
+                "*": 10, "#": 11, "A": 12, "B": 13, "C": 14, "D": 15,
+            }
+            mapped = key_map.get(val.upper())
+            if mapped is not None:
+                p = p.field("value_num", mapped)
+            p = p.field("value_str", val)
+        else:
+            p = p.field("value", val)
+    elif isinstance(val, dict):
+        for key, conv in (("temperature_c", float), ("humidity_pct", float)):
+            if key in val:
+                try:
+                    p = p.field(key, conv(val.get(key)))
+                except Exception:
+                    pass
+        for key in ("display", "text", "color", "action"):
+            if key in val:
+                p = p.field(key, str(val.get(key)))
+        for key in ("blink", "state"):
+            if key in val:
+                p = p.field(key, bool(val.get(key)))
+        for key in ("ms", "count", "gap_ms"):
+            if key in val:
+                try:
+                    p = p.field(key, int(val.get(key)))
+                except Exception:
+                    pass
+        p = p.field("value_str", json.dumps(val))
+    else:
+        p = p.field("value_str", json.dumps(val))
+
+    ts = payload.get("ts")
+    if ts:
+        p = p.time(int(float(ts) * 1_000_000_000), WritePrecision.NS)
+    return p.to_line_protocol()
+
+
+def _sample(n: int) -> list:
+    keys = "0123456789*#ABCD"
+    out = []
+    ts = 1_700_000_000.0
+    for i in range(n):
+        ts += 0.013
+        kind = i % 5
+        if kind == 0:
+            out.append(("home/pi1/distance", {"pi": "PI1", "code": "DUS1", "device_name": "Door Ultrasonic Sensor",
+                                              "value": float(i % 200) + 0.25, "simulated": True, "ts": ts}))
+        elif kind == 1:
+            out.append(("home/pi2/gyro", {"pi": "PI2", "code": "GSG", "device_name": "Gyroscope",
+                                          "value": round(i * 0.37 % 55, 2), "simulated": True, "ts": ts}))
+        elif kind == 2:
+            out.append(("home/pi3/dht", {"pi": "PI3", "code": f"DHT{1 + i % 3}", "device_name": "Room DHT",
+                                         "value": {"temperature_c": 21.5, "humidity_pct": 40.0 + i % 20},
+                                         "simulated": True, "ts": ts}))
+        elif kind == 3:
+            out.append(("home/pi1/keypad", {"pi": "PI1", "code": "DMS", "device_name": "Door Membrane Switch",
+                                            "value": keys[i % len(keys)], "simulated": True, "ts": ts}))
+        else:
+            out.append(("home/pi1/motion", {"pi": "PI1", "code": "DPIR1", "device_name": "Door Motion Sensor",
+                                            "value": bool(i % 2), "simulated": True, "ts": ts}))
+    return out
+
+
+def _time(fn, sample: list, rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for topic, payload in sample:
+            fn(topic, payload)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    sample = _sample(args.readings)
+    enc = LineProtocolEncoder()
+
+    def encoder_line(topic: str, payload: dict):
+        code = payload.get("code") or topic.split("/")[-1]
+        return enc.sensor_line(topic, code, payload, payload.get("value"), payload.get("ts"))
+
+    for topic, payload in sample:
+        expected = _point_line(topic, payload).encode("utf-8")
+        got = encoder_line(topic, payload)
+        if got != expected:
+            raise SystemExit(f"mismatch:\n  point:   {expected!r}\n  encoder: {got!r}")
+
+    total = args.readings * args.rounds
+    t_point = _time(_point_line, sample, args.rounds)
+    t_enc = _time(encoder_line, sample, args.rounds)
+    print(f"readings={args.readings}, rounds={args.rounds} (outputs identical)")
+    print(f"{'encoder':<8} {'points/s':>12} {'us/point':>10}")
+    print(f"{'point':<8} {total / t_point:>12.0f} {t_point / total * 1e6:>10.2f}")
+    print(f"{'encoder':<8} {total / t_enc:>12.0f} {t_enc / total * 1e6:>10.2f}")
+    print(f"speedup x{t_point / t_enc:.1f}")
+
+
+if __name__ == "__main__":
+    main()
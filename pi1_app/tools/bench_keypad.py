@@ -0,0 +1,109 @@
+"""Off-device benchmark of the membrane keypad loop on FakeGPIO.
+
+Runs run_membrane_switch_loop in edge-detect (idle) mode and in polling
+mode against a simulated 4x4 matrix. Reports idle CPU and GPIO traffic,
+then presses keys with contact bounce (plus a two-key chord) and reports
+press -> callback latency and whether every press was seen exactly once.
+
+Usage (from pi1_app/):
+    py tools/bench_keypad.py [--idle-sec 2] [--presses 40] [--poll-s 0.15]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "simulation"))
+
+from sensors.membrane_switch import run_membrane_switch_loop  # noqa: E402
+from utils.fake_gpio import FakeGPIO  # noqa: E402
+
+ROWS = [5, 6, 13, 19]
+COLS = [12, 16, 20, 21]
+KEYMAP = [["1", "2", "3", "A"], ["4", "5", "6", "B"], ["7", "8", "9", "C"], ["*", "0", "#", "D"]]
+
+
+def _bounce(gpio: FakeGPIO, row: int, col: int, close: bool, rng: random.Random) -> None:
+    # a few fast chatters before the contact settles
+    for _ in range(rng.randint(1, 4)):
+        (gpio.open_contact if close else gpio.close_contact)(row, col)
+        time.sleep(0.0005)
+        (gpio.close_contact if close else gpio.open_contact)(row, col)
+        time.sleep(0.0005)
+
+
+def _run(use_events: bool, args) -> dict:
+    gpio = FakeGPIO()
+    rng = random.Random(args.seed)
+    seen = []
+    seen_lock = threading.Lock()
+
+    def callback(key: str, _code: str) -> None:
+        with seen_lock:
+            seen.append((key, time.perf_counter()))
+
+    stop = threading.Event()
+    t = threading.Thread(target=run_membrane_switch_loop,
+                         args=(ROWS, COLS, KEYMAP, args.poll_s, callback, stop, "DMS"),
+                         kwargs={"use_events": use_events, "gpio": gpio}, daemon=True)
+    t.start()
+    time.sleep(0.1)
+
+    reads0, writes0, cpu0 = gpio.reads, gpio.writes, time.process_time()
+    time.sleep(args.idle_sec)
+    idle_cpu = time.process_time() - cpu0
+    idle_io = (gpio.reads - reads0) + (gpio.writes - writes0)
+
+    latencies = []
+    expected = []
+    for i in range(args.presses):
+        chord = i % 10 == 9
+        keys = rng.sample([(r, c) for r in range(4) for c in range(4)], 2 if chord else 1)
+        with seen_lock:
+            before = len(seen)
+        pressed_at = time.perf_counter()
+        for r, c in keys:
+            gpio.close_contact(ROWS[r], COLS[c])
+            _bounce(gpio, ROWS[r], COLS[c], True, rng)
+            expected.append(KEYMAP[r][c])
+        time.sleep(rng.uniform(0.08, 0.2))
+        for r, c in keys:
+            _bounce(gpio, ROWS[r], COLS[c], False, rng)
+            gpio.open_contact(ROWS[r], COLS[c])
+        time.sleep(max(0.1, args.poll_s if not use_events else 0.1))
+        with seen_lock:
+            latencies.extend(ts - pressed_at for _, ts in seen[before:])
+
+    stop.set()
+    t.join(timeout=2)
+    got = [k for k, _ in seen]
+    return {
+        "idle_cpu_pct": 100.0 * idle_cpu / args.idle_sec,
+        "idle_gpio_ops_per_s": idle_io / args.idle_sec,
+        "latency_med_ms": statistics.median(latencies) * 1000.0 if latencies else float("nan"),
+        "latency_max_ms": max(latencies) * 1000.0 if latencies else float("nan"),
+        "exact": sorted(got) == sorted(expected),
+        "presses": f"{len(got)}/{len(expected)}",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idle-sec", type=float, default=2.0)
+    parser.add_argument("--presses", type=int, default=40)
+    parser.add_argument("--poll-s", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'idle cpu %':>10} {'idle io/s':>10} {'lat med ms':>11} {'lat max ms':>11} {'presses':>9}  exact")
+    for name, use_events in (("events", True), ("polling", False)):
+        r = _run(use_events, args)
+        print(f"{name:<8} {r['idle_cpu_pct']:>10.2f} {r['idle_gpio_ops_per_s']:>10.0f} "
+              f"{r['latency_med_ms']:>11.2f} {r['latency_max_ms']:>11.2f} {r['presses']:>9}  {r['exact']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark: thread-per-device polling vs the single SensorScheduler thread.
+
+Runs N simulated devices (periods cycling through --periods) for
+--seconds, each step building a payload and updating SharedState like a
+real device callback (console printing left out). Reports achieved vs
+nominal tick rate (drift), start jitter, CPU, threads and shutdown time.
+
+Usage (from pi1_app/):
+    py tools/bench_scheduler.py [--devices 300] [--seconds 5] [--periods 0.1,0.2,0.5,1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "simulation"))
+
+from utils.device_payload import build_payload  # noqa: E402
+from utils.scheduler import SensorScheduler  # noqa: E402
+from utils.state import SharedState  # noqa: E402
+
+
+def _make_step(code: str, state: SharedState, ticks: list):
+    def step():
+        ticks.append(time.monotonic())
+        payload = build_payload("PI9", code, "Bench Sensor", 21.5, True, extra={"kind": "bench"})
+        state.set(code, payload)
+    return step
+
+
+def _jitter(ticks: list, period: float) -> list:
+    # lateness of each tick against an ideal fixed-rate grid from the first one
+    t0 = ticks[0]
+    return [t - (t0 + i * period) for i, t in enumerate(ticks)]
+
+
+def _run(mode: str, periods: list, seconds: float) -> dict:
+    state = SharedState()
+    stop_event = threading.Event()
+    ticks = {f"B{i}": [] for i in range(len(periods))}
+    threads = []
+    scheduler = SensorScheduler() if mode == "scheduler" else None
+    threads_before = threading.active_count()
+
+    cpu0 = time.process_time()
+    for (code, tl), period in zip(ticks.items(), periods):
+        step = _make_step(code, state, tl)
+        if scheduler is not None:
+            scheduler.every(code, period, step)
+        else:
+            def loop(step=step, period=period):
+                while not stop_event.is_set():
+                    step()
+                    time.sleep(period)
+            t = threading.Thread(target=loop, daemon=True)
+            t.start()
+            threads.append(t)
+    if scheduler is not None:
+        scheduler.start()
+    n_threads = threading.active_count() - threads_before
+
+    time.sleep(seconds)
+    stop_event.set()
+    t_stop = time.monotonic()
+    if scheduler is not None:
+        scheduler.stop()
+    for t in threads:
+        t.join(timeout=1.0)
+    shutdown = time.monotonic() - t_stop
+    cpu = time.process_time() - cpu0
+
+    rates, jit = [], []
+    for (code, tl), period in zip(ticks.items(), periods):
+        if len(tl) < 2:
+            continue
+        rates.append((len(tl) - 1) * period / (tl[-1] - tl[0]))
+        jit.extend(_jitter(tl, period))
+    jit_ms = sorted(abs(j) * 1000.0 for j in jit)
+    return {
+        "threads": n_threads,
+        "rate_pct": 100.0 * statistics.mean(rates),
+        "jitter_med_ms": jit_ms[len(jit_ms) // 2],
+        "jitter_p99_ms": jit_ms[int(len(jit_ms) * 0.99)],
+        "cpu_pct": 100.0 * cpu / seconds,
+        "shutdown_ms": shutdown * 1000.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--periods", default="0.1,0.2,0.5,1")
+    args = parser.parse_args()
+
+    cycle = [float(p) for p in args.periods.split(",")]
+    periods = [cycle[i % len(cycle)] for i in range(args.devices)]
+
+    print(f"{args.devices} devices, {args.seconds}s, periods {cycle}")
+    print(f"{'mode':<10} {'threads':>7} {'rate %':>7} {'jit med ms':>10} {'jit p99 ms':>10} {'cpu %':>6} {'stop ms':>8}")
+    for mode in ("threads", "scheduler"):
+        r = _run(mode, periods, args.seconds)
+        print(f"{mode:<10} {r['threads']:>7} {r['rate_pct']:>7.2f} {r['jitter_med_ms']:>10.2f} "
+              f"{r['jitter_p99_ms']:>10.2f} {r['cpu_pct']:>6.1f} {r['shutdown_ms']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
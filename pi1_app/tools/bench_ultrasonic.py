@@ -0,0 +1,93 @@
+"""Off-device benchmark of the ultrasonic measurement engine on FakeGPIO.
+
+Compares edge-callback timing with the polling fallback: CPU time of the
+measuring thread per reading and error against the simulated distance.
+`--noise` adds that fraction of wild echoes (multipath) and `--missing`
+that fraction of lost echoes, to show what burst filtering rejects.
+
+Usage (from pi1_app/):
+    py tools/bench_ultrasonic.py [--readings 50] [--burst 5] [--noise 0.2] [--missing 0.1]
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "simulation"))
+
+from sensors.ultrasonic import UltrasonicSensor  # noqa: E402
+from utils.fake_gpio import FakeGPIO  # noqa: E402
+
+TRIG, ECHO = 23, 24
+
+
+def _run(use_events: bool, args, rng: random.Random) -> dict:
+    gpio = FakeGPIO()
+    true_cm = [0.0]
+
+    def distance():
+        r = rng.random()
+        if r < args.missing:
+            return None
+        if r < args.missing + args.noise:
+            return rng.uniform(2.0, 350.0)
+        return true_cm[0]
+
+    gpio.attach_echo(TRIG, ECHO, distance)
+    sensor = UltrasonicSensor(TRIG, ECHO, gpio=gpio, use_events=use_events, burst=args.burst,
+                              burst_gap_s=args.gap, max_dev_cm=args.max_dev)
+    sensor.setup()
+
+    errors = []
+    misses = 0
+    cpu0 = time.thread_time()
+    wall0 = time.perf_counter()
+    for _ in range(args.readings):
+        true_cm[0] = rng.uniform(10.0, 200.0)
+        dist = sensor.measure_cm()
+        if math.isfinite(dist):
+            errors.append(abs(dist - true_cm[0]))
+        else:
+            misses += 1
+    wall = time.perf_counter() - wall0
+    cpu = time.thread_time() - cpu0
+    sensor.close()
+
+    return {
+        "cpu_ms_per_reading": cpu * 1000.0 / args.readings,
+        "cpu_pct": 100.0 * cpu / wall if wall else 0.0,
+        "err_median_cm": statistics.median(errors) if errors else math.nan,
+        "err_max_cm": max(errors) if errors else math.nan,
+        "inf": misses,
+        "stats": sensor.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--gap", type=float, default=0.01)
+    parser.add_argument("--max-dev", type=float, default=5.0)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--missing", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # the fake echo and the polling loop are both Python threads; a short GIL
+    # switch interval keeps the fake echo from being starved by the poller
+    sys.setswitchinterval(0.0001)
+
+    print(f"{args.readings} readings, burst={args.burst}, noise={args.noise}, missing={args.missing}")
+    print(f"{'mode':<8} {'cpu ms/rd':>10} {'cpu %':>7} {'err med':>8} {'err max':>8} {'inf':>5}")
+    for name, use_events in (("events", True), ("polling", False)):
+        r = _run(use_events, args, random.Random(args.seed))
+        print(f"{name:<8} {r['cpu_ms_per_reading']:>10.3f} {r['cpu_pct']:>7.1f} "
+              f"{r['err_median_cm']:>8.2f} {r['err_max_cm']:>8.2f} {r['inf']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Multi-home synthetic load generator for capacity planning of broker + server.
+
+Starts `--homes` virtual homes (pi ids H0001, H0002, ...) with `--devices`
+devices each, cycling through the device profile below (or a JSON file via
+`--profile`). Readings go through the real edge path: build_payload ->
+BatchSender -> MQTTClient -> wire format, so batching, layout, codec and
+compression behave as on a Pi. Each home gets its own BatchSender; homes
+share `--clients` MQTT connections (default: one per home).
+
+Values are pre-generated in chunks per device type (vectorized with NumPy
+when it is installed, stdlib `random` otherwise), so producing readings is
+cheap next to building and sending them. Devices of a type tick at
+`rate_hz` each, evenly staggered; the scale-out knobs are --homes,
+--devices and --rate-scale.
+
+`--seed` makes the value stream reproducible (for the same NumPy / random
+backend); with `--start-ts` the timestamps are virtual too (start + tick /
+rate), so two runs produce the same readings. The final line prints a digest
+of the generated values (device, home, value) to compare runs.
+
+Readings use the real device codes, so the server runs its handlers (and
+alarms) on them; `--code-prefix L` turns DS1 into LDS1 etc., which is only
+stored in Influx. `--dry-run` needs no broker: batches are encoded and
+counted but not sent.
+
+Profile entry (value "dist": uniform | normal | spike | bernoulli | choice):
+    {"code": "DHT", "device_name": "Room DHT", "topic": "room/dht", "kind": "dht",
+     "rate_hz": 0.5, "priority": "bulk",
+     "fields": {"temperature_c": {"dist": "normal", "mean": 22, "std": 2, "round": 1},
+                "humidity_pct": {"dist": "uniform", "low": 30, "high": 65, "round": 1}}}
+Single-value devices use "value": {...} instead of "fields", and may set "unit".
+
+Usage (from pi1_app/):
+    py tools/loadgen.py --homes 50 --devices 12 --seconds 60 [--broker 127.0.0.1] [--seed 42]
+    py tools/loadgen.py --homes 500 --devices 20 --seconds 10 --dry-run --seed 1 --start-ts 1700000000
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "simulation"))
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+from utils import wire  # noqa: E402
+from utils.batch_sender import BatchSender  # noqa: E402
+from utils.codec import get_codec  # noqa: E402
+from utils.device_payload import build_payload  # noqa: E402
+
+DEFAULT_PROFILE: List[Dict[str, Any]] = [
+    {"code": "DS", "device_name": "Door Sensor", "topic": "door/button", "kind": "button",
+     "rate_hz": 0.2, "priority": "critical", "value": {"dist": "bernoulli", "p": 0.5}},
+    {"code": "DPIR", "device_name": "Motion Sensor", "topic": "door/motion", "kind": "pir",
+     "rate_hz": 0.5, "priority": "critical", "value": {"dist": "bernoulli", "p": 0.2}},
+    {"code": "DUS", "device_name": "Door Ultrasonic Sensor", "topic": "door/distance", "kind": "ultrasonic",
+     "unit": "cm", "rate_hz": 1.0, "value": {"dist": "uniform", "low": 5.0, "high": 200.0, "round": 1}},
+    {"code": "DHT", "device_name": "Room DHT", "topic": "room/dht", "kind": "dht", "rate_hz": 0.5,
+     "fields": {"temperature_c": {"dist": "normal", "mean": 22.0, "std": 2.0, "round": 1},
+                "humidity_pct": {"dist": "uniform", "low": 30.0, "high": 65.0, "round": 1}}},
+    {"code": "GSG", "device_name": "Gyroscope", "topic": "kitchen/gyroscope", "kind": "gyro", "unit": "deg",
+     "rate_hz": 2.0, "value": {"dist": "spike", "low": 0.0, "high": 2.5, "p": 0.08,
+                               "spike_low": 20.0, "spike_high": 55.0, "round": 2}},
+]
+
+CHUNK = 8192
+
+
+class ValueSource:
+    """Pre-generated values for one distribution, refilled a chunk at a time."""
+
+    def __init__(self, spec: Dict[str, Any], seed: Optional[int]):
+        self._spec = spec
+        self._dist = str(spec.get("dist", "uniform")).lower()
+        if self._dist not in ("uniform", "normal", "spike", "bernoulli", "choice"):
+            raise ValueError(f"unknown value dist: {self._dist}")
+        self._rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+        self._buf: List[Any] = []
+        self._pos = 0
+
+    def take(self, n: int) -> List[Any]:
+        out: List[Any] = []
+        while len(out) < n:
+            if self._pos >= len(self._buf):
+                # fixed chunk size: the stream for a seed must not depend on n
+                self._buf = self._generate(CHUNK)
+                self._pos = 0
+            k = min(n - len(out), len(self._buf) - self._pos)
+            out.extend(self._buf[self._pos:self._pos + k])
+            self._pos += k
+        return out
+
+    def _generate(self, n: int) -> List[Any]:
+        return self._generate_np(n) if np is not None else self._generate_py(n)
+
+    def _generate_np(self, n: int) -> List[Any]:
+        s, rng = self._spec, self._rng
+        if self._dist == "bernoulli":
+            return (rng.random(n) < float(s.get("p", 0.5))).tolist()
+        if self._dist == "choice":
+            choices = list(s["values"])
+            weights = s.get("weights")
+            p = np.asarray(weights, dtype=float) / float(sum(weights)) if weights else None
+            return [choices[i] for i in rng.choice(len(choices), size=n, p=p).tolist()]
+        if self._dist == "normal":
+            arr = rng.normal(float(s.get("mean", 0.0)), float(s.get("std", 1.0)), n)
+        else:
+            arr = rng.uniform(float(s.get("low", 0.0)), float(s.get("high", 1.0)), n)
+            if self._dist == "spike":
+                spikes = rng.random(n) < float(s.get("p", 0.05))
+                arr = np.where(spikes, rng.uniform(float(s.get("spike_low", 0.0)),
+                                                   float(s.get("spike_high", 1.0)), n), arr)
+        if "min" in s or "max" in s:
+            arr = np.clip(arr, s.get("min", -np.inf), s.get("max", np.inf))
+        if s.get("round") is not None:
+            arr = np.round(arr, int(s["round"]))
+        return arr.tolist()
+
+    def _generate_py(self, n: int) -> List[Any]:
+        s, rng = self._spec, self._rng
+        if self._dist == "bernoulli":
+            p = float(s.get("p", 0.5))
+            return [rng.random() < p for _ in range(n)]
+        if self._dist == "choice":
+            return rng.choices(list(s["values"]), weights=s.get("weights"), k=n)
+        if self._dist == "normal":
+            mean, std = float(s.get("mean", 0.0)), float(s.get("std", 1.0))
+            values = [rng.gauss(mean, std) for _ in range(n)]
+        else:
+            low, high = float(s.get("low", 0.0)), float(s.get("high", 1.0))
+            values = [rng.uniform(low, high) for _ in range(n)]
+            if self._dist == "spike":
+                p = float(s.get("p", 0.05))
+                sl, sh = float(s.get("spike_low", 0.0)), float(s.get("spike_high", 1.0))
+                values = [rng.uniform(sl, sh) if rng.random() < p else v for v in values]
+        lo, hi = s.get("min"), s.get("max")
+        if lo is not None or hi is not None:
+            lo = -math.inf if lo is None else float(lo)
+            hi = math.inf if hi is None else float(hi)
+            values = [min(max(v, lo), hi) for v in values]
+        if s.get("round") is not None:
+            values = [round(v, int(s["round"])) for v in values]
+        return values
+
+
+class DeviceGroup:
+    """All devices of one profile entry across all homes.
+
+    Device i of n ticks at rate_hz with phase i / n, so the group emits
+    rate_hz * n readings per second evenly spread, in a fixed device order.
+    """
+
+    def __init__(self, spec: Dict[str, Any], devices: List[Dict[str, Any]], rate_scale: float,
+                 seed: Optional[int], index: int):
+        self.spec = spec
+        self.devices = devices
+        self.rate = float(spec.get("rate_hz", 1.0)) * rate_scale
+        self.extra = {"kind": spec.get("kind", "sensor")}
+        if spec.get("unit"):
+            self.extra["unit"] = spec["unit"]
+        sub = None if seed is None else seed * 1000 + index * 10
+        fields = spec.get("fields")
+        if fields:
+            self.fields = list(fields)
+            self.sources = [ValueSource(fields[k], None if sub is None else sub + i) for i, k in enumerate(self.fields)]
+        else:
+            self.fields = None
+            self.sources = [ValueSource(spec.get("value") or {}, sub)]
+        self.sent = 0
+        # per group, so the digest does not depend on how groups interleave
+        self.digest = hashlib.sha256()
+
+    def due(self, elapsed: float) -> int:
+        return int(elapsed * self.rate * len(self.devices)) - self.sent
+
+    def values(self, n: int) -> List[Any]:
+        if self.fields is None:
+            return self.sources[0].take(n)
+        cols = [src.take(n) for src in self.sources]
+        return [dict(zip(self.fields, row)) for row in zip(*cols)]
+
+
+class NullClient:
+    """MQTTClient stand-in for --dry-run: encodes like the real one, sends nothing."""
+
+    def __init__(self, codec, batch_format: str, compressor):
+        self._codec = codec
+        self._format = batch_format
+        self._compressor = compressor
+        self._lock = threading.Lock()
+        self._published = 0
+        self._published_bytes = 0
+
+    def publish(self, topic: str, payload: Any, critical: bool = False) -> None:
+        data = wire.encode(payload, self._format, self._codec, self._compressor)
+        with self._lock:
+            self._published += 1
+            self._published_bytes += len(topic) + len(data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"published": self._published, "published_bytes": self._published_bytes, "dropped": 0}
+
+    def stop(self) -> None:
+        pass
+
+
+def _load_profile(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path:
+        return DEFAULT_PROFILE
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["devices"] if isinstance(data, dict) else data
+
+
+def _build_groups(profile: List[Dict[str, Any]], homes: int, per_home: int, prefix: str,
+                  rate_scale: float, seed: Optional[int]) -> List[DeviceGroup]:
+    members: List[List[Dict[str, Any]]] = [[] for _ in profile]
+    for h in range(1, homes + 1):
+        pi_id = f"H{h:04d}"
+        numbers = [0] * len(profile)
+        for d in range(per_home):
+            t = d % len(profile)
+            numbers[t] += 1
+            spec = profile[t]
+            members[t].append({
+                "pi": pi_id,
+                "home": h - 1,
+                "code": f"{prefix}{spec['code']}{numbers[t]}",
+                "topic": f"home/{pi_id.lower()}/{spec.get('topic', spec['code'].lower())}",
+                "device_name": spec.get("device_name", spec["code"]),
+            })
+    return [DeviceGroup(spec, devs, rate_scale, seed, i) for i, (spec, devs) in enumerate(zip(profile, members)) if devs]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--homes", type=int, default=10)
+    parser.add_argument("--devices", type=int, default=10, help="devices per home")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--rate-scale", type=float, default=1.0, help="multiplies every profile rate_hz")
+    parser.add_argument("--profile", default=None, help="JSON list (or {\"devices\": [...]}) of device types")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--start-ts", type=float, default=None, help="virtual timestamps from this epoch")
+    parser.add_argument("--code-prefix", default="")
+    parser.add_argument("--broker", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--clients", type=int, default=0, help="MQTT connections (0 = one per home)")
+    parser.add_argument("--dry-run", action="store_true", help="encode batches but do not connect/send")
+    parser.add_argument("--batch-interval", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=500)
+    parser.add_argument("--max-queue", type=int, default=10000)
+    parser.add_argument("--layout", choices=("rows", "columnar"), default="rows")
+    parser.add_argument("--format", default=None, help="json | msgpack (env MQTT_BATCH_FORMAT overrides)")
+    parser.add_argument("--compression", default="off")
+    parser.add_argument("--json-codec", default=None)
+    parser.add_argument("--tick-ms", type=float, default=20.0)
+    parser.add_argument("--report-sec", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if np is None:
+        print("[LOADGEN] numpy nije instaliran, vrednosti se generišu preko random modula (sporije)")
+
+    profile = _load_profile(args.profile)
+    groups = _build_groups(profile, args.homes, args.devices, args.code_prefix, args.rate_scale, args.seed)
+    codec = get_codec(args.json_codec)
+    batch_format = wire.resolve_format(args.format)
+    compressor = wire.resolve_compression({"compression": args.compression})
+
+    n_clients = args.homes if args.clients <= 0 else min(args.clients, args.homes)
+    clients = []
+    for i in range(n_clients):
+        if args.dry_run:
+            clients.append(NullClient(codec, batch_format, compressor))
+        else:
+            from utils.mqtt_client import MQTTClient
+            client = MQTTClient(args.broker, port=args.port, client_id=f"loadgen-{os.getpid()}-{i}", codec=codec,
+                                batch_format=batch_format, compressor=compressor)
+            clients.append(client)
+
+    priorities = {dev["code"]: g.spec.get("priority", "bulk") for g in groups for dev in g.devices}
+    senders = []
+    for h in range(args.homes):
+        sender = BatchSender(clients[h % n_clients], batch_interval_sec=args.batch_interval,
+                             max_batch=args.max_batch, columnar=(args.layout == "columnar"),
+                             max_queue=args.max_queue, priorities=priorities)
+        sender.start()
+        senders.append(sender)
+
+    target = sum(g.rate * len(g.devices) for g in groups)
+    print(f"[LOADGEN] {args.homes} homes x {args.devices} devices, target {target:.0f} readings/s, "
+          f"numpy={'on' if np is not None else 'off'} seed={args.seed} format={batch_format} "
+          f"layout={args.layout} compression={compressor.algo if compressor else 'off'} "
+          f"clients={n_clients}{' (dry-run)' if args.dry_run else ''}")
+
+    generated = 0
+    tick = max(0.001, args.tick_ms / 1000.0)
+    started = time.monotonic()
+    last_report = started
+    last_generated = 0
+    try:
+        while True:
+            now = time.monotonic()
+            elapsed = min(now - started, args.seconds)
+            for g in groups:
+                n = g.due(elapsed)
+                if n <= 0:
+                    continue
+                values = g.values(n)
+                ndev = len(g.devices)
+                for j, value in zip(range(g.sent, g.sent + n), values):
+                    dev = g.devices[j % ndev]
+                    payload = build_payload(dev["pi"], dev["code"], dev["device_name"], value, True, extra=g.extra)
+                    if args.start_ts is not None:
+                        payload["ts"] = args.start_ts + (j // ndev + (j % ndev) / ndev) / g.rate
+                    if args.seed is not None:
+                        g.digest.update(f"{dev['code']}@{dev['pi']}={value!r};".encode("utf-8"))
+                    senders[dev["home"]].enqueue(dev["topic"], payload)
+                g.sent += n
+                generated += n
+
+            if now - last_report >= args.report_sec:
+                rate = (generated - last_generated) / (now - last_report)
+                dropped = sum(s.stats()["bulk"]["dropped"] for s in senders)
+                print(f"[LOADGEN] t={now - started:5.1f}s generated={generated} ({rate:.0f}/s) "
+                      f"messages={sum(c.stats()['published'] for c in clients)} dropped={dropped}")
+                last_report, last_generated = now, generated
+
+            if now - started >= args.seconds:
+                break
+            time.sleep(max(0.0, tick - (time.monotonic() - now)))
+    except KeyboardInterrupt:
+        print("[LOADGEN] interrupted")
+
+    gen_time = time.monotonic() - started
+    for s in senders:
+        s.stop()
+    for c in clients:
+        c.stop()
+
+    client_stats = [c.stats() for c in clients]
+    messages = sum(c["published"] for c in client_stats)
+    sent_bytes = sum(c["published_bytes"] for c in client_stats)
+    unsent = sum(c["dropped"] for c in client_stats)
+    bulk = [s.stats()["bulk"] for s in senders]
+    crit = [s.stats()["critical"] for s in senders]
+    print(f"[LOADGEN] done: {generated} readings in {gen_time:.1f}s ({generated / gen_time:.0f}/s, "
+          f"target {target:.0f}/s), {messages} MQTT messages, {sent_bytes / 1024 / 1024:.2f} MiB "
+          f"({sent_bytes / max(1, generated):.1f} B/reading), {unsent} MQTT messages not sent")
+    print(f"[LOADGEN] dropped bulk={sum(b['dropped'] for b in bulk)} critical={sum(c['dropped'] for c in crit)}, "
+          f"latency max bulk={max(b['latency_max_ms'] for b in bulk):.0f}ms "
+          f"critical={max(c['latency_max_ms'] for c in crit):.0f}ms")
+    if args.seed is not None:
+        digest = hashlib.sha256(b"".join(g.digest.digest() for g in groups)).hexdigest()
+        print(f"[LOADGEN] readings digest: {digest[:16]}")
+
+
+if __name__ == "__main__":
+    main()